@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Agregados NPS - Contagens por (loja, vendedor, mês, nota)
+Permite calcular as métricas do dashboard lote a lote, sem manter a planilha inteira em memória,
+e persistir o cubo de contagens para recortes e re-renderizações sem reler as linhas
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Dimensões das contagens (colunas esperadas nos dados)
+DIMENSOES = ('Loja', 'Vendedor', 'Mes')
+
+# Cubos das planilhas do Google Sheets (arquivos locais guardam o cubo ao lado)
+PASTA_CUBOS = os.environ.get('CUBOS_DIR', os.path.join('cache', 'cubos'))
+
+
+def nps_de_contagens(contagens, total):
+    """Calcula NPS detalhado a partir de contagens por nota
+
+    Mesmo resultado de CalculadoraMetricas._calcular_nps_detalhado: `total`
+    inclui linhas sem nota, como len(avaliacoes) na versão por linhas.
+
+    Args:
+        contagens: Series indexada pela nota com a quantidade de avaliações
+        total: número de linhas do grupo
+    """
+    if total == 0:
+        return {
+            'nps_score': 0,
+            'promotores': 0,
+            'neutros': 0,
+            'detratores': 0,
+            'pct_promotores': 0,
+            'pct_neutros': 0,
+            'pct_detratores': 0
+        }
+
+    notas = contagens.index.to_numpy(dtype=float)
+    valores = contagens.to_numpy()
+
+    promotores = int(valores[(notas >= 9) & (notas <= 10)].sum())
+    neutros = int(valores[(notas >= 7) & (notas <= 8)].sum())
+    detratores = int(valores[(notas >= 0) & (notas <= 6)].sum())
+
+    pct_promotores = (promotores / total) * 100
+    pct_neutros = (neutros / total) * 100
+    pct_detratores = (detratores / total) * 100
+
+    return {
+        'nps_score': pct_promotores - pct_detratores,
+        'promotores': promotores,
+        'neutros': neutros,
+        'detratores': detratores,
+        'pct_promotores': pct_promotores,
+        'pct_neutros': pct_neutros,
+        'pct_detratores': pct_detratores
+    }
+
+
+def _media_ponderada(contagens):
+    """Nota média a partir de contagens por nota (ignora notas ausentes)"""
+    validas = contagens[contagens.index.notna()]
+    quantidade = validas.sum()
+    if quantidade == 0:
+        return np.nan
+    return float((validas.index.to_numpy(dtype=float) * validas.to_numpy()).sum() / quantidade)
+
+
+def _rotulos_mes(datas):
+    """'AAAA-MM' de cada data (NaN sem data); formata só os meses distintos"""
+    meses = datas.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+    codigos, unicos = pd.factorize(meses)
+    rotulos = np.array([str(mes) for mes in unicos] + [np.nan], dtype=object)
+    return rotulos[codigos]
+
+
+class AcumuladorNPS:
+    """Acumula contagens NPS a partir de lotes de linhas (ex.: páginas da planilha)"""
+
+    def __init__(self):
+        self._parciais = []
+        self._contagens = None
+        self.total_linhas = 0
+        self.colunas = set()
+
+    def adicionar_lote(self, dados):
+        """Conta as linhas de um lote; o lote pode ser descartado em seguida"""
+        if dados is None or len(dados) == 0:
+            return
+
+        self.colunas.update(dados.columns)
+        self.total_linhas += len(dados)
+
+        chaves = pd.DataFrame(index=dados.index)
+        chaves['Loja'] = dados['Loja'] if 'Loja' in dados.columns else None
+        chaves['Vendedor'] = dados['Vendedor'] if 'Vendedor' in dados.columns else None
+        chaves['Mes'] = None
+        if 'Data' in dados.columns:
+            chaves['Mes'] = _rotulos_mes(pd.to_datetime(dados['Data'], errors='coerce'))
+        chaves['Nota'] = np.nan
+        if 'Avaliacao' in dados.columns:
+            chaves['Nota'] = pd.to_numeric(dados['Avaliacao'], errors='coerce')
+
+        # Ordem de aparição das chaves: empates nos rankings seguem as linhas
+        parcial = chaves.groupby(list(DIMENSOES) + ['Nota'], dropna=False, sort=False).size()
+        self._parciais.append(parcial)
+        self._contagens = None
+
+    @property
+    def contagens(self):
+        """Series com a quantidade de linhas por (Loja, Vendedor, Mes, Nota)"""
+        if self._contagens is None:
+            if not self._parciais:
+                indice = pd.MultiIndex.from_arrays([[]] * 4, names=list(DIMENSOES) + ['Nota'])
+                self._contagens = pd.Series([], index=indice, dtype='int64')
+            else:
+                self._contagens = pd.concat(self._parciais).groupby(
+                    level=list(range(4)), dropna=False, sort=False).sum()
+                self._parciais = [self._contagens]
+        return self._contagens
+
+    def _por_nota(self, contagens):
+        """Soma contagens por nota"""
+        return contagens.groupby(level='Nota', dropna=False).sum()
+
+    def calcular_metricas(self):
+        """Retorna as métricas que não dependem das linhas individuais
+
+        Mesmas chaves e formatos de CalculadoraMetricas: gerais,
+        ranking_lojas, ranking_vendedores, distribuicao_notas, notas_altas e
+        percentuais_nps.
+        """
+        metricas = {'gerais': self.metricas_gerais()}
+
+        if 'Avaliacao' in self.colunas:
+            metricas['ranking_lojas'] = self.ranking('Loja') if 'Loja' in self.colunas else []
+            metricas['ranking_vendedores'] = self.ranking('Vendedor') if 'Vendedor' in self.colunas else []
+
+            distribuicao = self.distribuicao_notas()
+            metricas['distribuicao_notas'] = distribuicao
+            metricas['notas_altas'] = {nota: distribuicao[nota] for nota in (8, 9, 10)}
+            metricas['percentuais_nps'] = self.percentuais_nps()
+
+        return metricas
+
+    def metricas_gerais(self):
+        """Total de vendedores, total de avaliações e nota média"""
+        contagens = self.contagens
+
+        total_vendedores = 0
+        if 'Vendedor' in self.colunas:
+            total_vendedores = contagens.index.get_level_values('Vendedor').dropna().nunique()
+
+        return {
+            'total_vendedores': total_vendedores,
+            'total_avaliacoes': self.total_linhas,
+            'nota_media': _media_ponderada(self._por_nota(contagens)) if 'Avaliacao' in self.colunas else 0
+        }
+
+    def distribuicao_notas(self):
+        """Quantidade e porcentagem de cada nota de 0 a 10"""
+        por_nota = self._por_nota(self.contagens)
+        distribuicao = {}
+        for nota in range(0, 11):
+            count = int(por_nota.get(float(nota), 0))
+            distribuicao[nota] = {
+                'count': count,
+                'porcentagem': (count / self.total_linhas) * 100 if self.total_linhas > 0 else 0
+            }
+        return distribuicao
+
+    def percentuais_nps(self):
+        """NPS e % de promotores/neutros/detratores"""
+        return nps_de_contagens(self._por_nota(self.contagens), self.total_linhas)
+
+    def ranking(self, dimensao):
+        """Ranking por 'Loja' ou 'Vendedor', ordenado por NPS"""
+        return self._ranking(dimensao, dimensao.lower())
+
+    def _ranking(self, dimensao, chave):
+        """Ranking por loja ou vendedor, ordenado por NPS"""
+        contagens = self.contagens
+        contagens = contagens[contagens.index.get_level_values(dimensao).notna()]
+
+        lojas_vendedor = None
+        if dimensao == 'Vendedor' and 'Loja' in self.colunas:
+            # Loja mais comum do vendedor (empate: menor nome, como Series.mode)
+            por_loja = contagens.groupby(level=['Vendedor', 'Loja']).sum().reset_index(name='n')
+            por_loja = por_loja.sort_values(['Vendedor', 'n', 'Loja'], ascending=[True, False, True])
+            lojas_vendedor = por_loja.drop_duplicates('Vendedor').set_index('Vendedor')['Loja']
+
+        # Matriz (valor da dimensão × nota), na ordem de aparição nas linhas
+        # (a ordenação estável por NPS mantém essa ordem nos empates)
+        ordem = pd.unique(contagens.index.get_level_values(dimensao))
+        tabela = contagens.groupby(level=[dimensao, 'Nota'], dropna=False).sum()
+        tabela = tabela.unstack('Nota', fill_value=0).reindex(ordem)
+        notas = tabela.columns.to_numpy(dtype=float)
+        matriz = tabela.to_numpy()
+
+        totais = matriz.sum(axis=1)
+        promotores = matriz[:, (notas >= 9) & (notas <= 10)].sum(axis=1)
+        neutros = matriz[:, (notas >= 7) & (notas <= 8)].sum(axis=1)
+        detratores = matriz[:, (notas >= 0) & (notas <= 6)].sum(axis=1)
+
+        validas = ~np.isnan(notas)
+        com_nota = matriz[:, validas].sum(axis=1)
+        soma_notas = (matriz[:, validas] * notas[validas]).sum(axis=1)
+
+        ranking = []
+        for i, valor in enumerate(tabela.index):
+            total = int(totais[i])
+            pct_promotores = (int(promotores[i]) / total) * 100
+            pct_neutros = (int(neutros[i]) / total) * 100
+            pct_detratores = (int(detratores[i]) / total) * 100
+
+            item = {chave: valor}
+            if dimensao == 'Vendedor':
+                item['loja'] = lojas_vendedor.get(valor, "N/A") if lojas_vendedor is not None else "N/A"
+            item.update({
+                'total_avaliacoes': total,
+                'nota_media': float(soma_notas[i] / com_nota[i]) if com_nota[i] else np.nan,
+                'nps_score': pct_promotores - pct_detratores,
+                'promotores': int(promotores[i]),
+                'neutros': int(neutros[i]),
+                'detratores': int(detratores[i]),
+                'pct_promotores': pct_promotores,
+                'pct_neutros': pct_neutros,
+                'pct_detratores': pct_detratores
+            })
+            ranking.append(item)
+
+        return sorted(ranking, key=lambda x: x['nps_score'], reverse=True)
+
+
+class CuboNPS(AcumuladorNPS):
+    """Cubo de contagens (loja × vendedor × mês × nota) persistível
+
+    Construído uma vez a partir das linhas; todas as métricas de contagem
+    do CalculadoraMetricas (rankings, distribuição, percentuais, evolução
+    mensal e comparação com o mês anterior) saem dele sem voltar às linhas.
+    """
+
+    VERSAO = 2
+
+    def __init__(self):
+        super().__init__()
+        self._rankings = {}
+
+    def adicionar_lote(self, dados):
+        super().adicionar_lote(dados)
+        self._rankings = {}
+
+    def ranking(self, dimensao):
+        """Ranking por 'Loja' ou 'Vendedor' (memoizado até o próximo lote)"""
+        if dimensao not in self._rankings:
+            self._rankings[dimensao] = super().ranking(dimensao)
+        return list(self._rankings[dimensao])
+
+    @classmethod
+    def de_dados(cls, dados):
+        """Cubo a partir do DataFrame completo"""
+        cubo = cls()
+        cubo.adicionar_lote(dados)
+        return cubo
+
+    @classmethod
+    def _de_contagens(cls, contagens, colunas):
+        cubo = cls()
+        cubo._contagens = contagens
+        cubo._parciais = [contagens]
+        cubo.total_linhas = int(contagens.sum())
+        cubo.colunas = set(colunas)
+        return cubo
+
+    def fatiar(self, lojas=None, vendedores=None, meses=None):
+        """Novo cubo restrito às lojas/vendedores/meses informados
+
+        Args:
+            lojas, vendedores, meses: listas de valores aceitos (None = todos);
+                meses no formato 'AAAA-MM'
+        """
+        contagens = self.contagens
+        mascara = np.ones(len(contagens), dtype=bool)
+        for nivel, valores in (('Loja', lojas), ('Vendedor', vendedores), ('Mes', meses)):
+            if valores is not None:
+                mascara &= contagens.index.get_level_values(nivel).isin(list(valores))
+        return self._de_contagens(contagens[mascara], self.colunas)
+
+    def _por_mes(self):
+        """Contagens por (Mes, Nota), só meses válidos"""
+        contagens = self.contagens
+        contagens = contagens[contagens.index.get_level_values('Mes').notna()]
+        return contagens.groupby(level=['Mes', 'Nota'], dropna=False).sum()
+
+    def evolucao_mensal(self):
+        """NPS, total e nota média por mês, em ordem cronológica"""
+        evolucao = []
+        for mes, grupo in self._por_mes().groupby(level='Mes', sort=True):
+            por_nota = grupo.droplevel('Mes')
+            total = int(grupo.sum())
+            evolucao.append({
+                'periodo': mes,
+                'nps_score': nps_de_contagens(por_nota, total)['nps_score'],
+                'total_avaliacoes': total,
+                'nota_media': _media_ponderada(por_nota)
+            })
+        return evolucao
+
+    def comparacao_mensal(self):
+        """NPS do mês mais recente contra o mês anterior (None sem dados)"""
+        por_mes = self._por_mes()
+        if len(por_mes) == 0:
+            return None
+
+        meses = por_mes.index.get_level_values('Mes')
+        mes_atual = meses.max()
+        mes_anterior = str(pd.Period(mes_atual, freq='M') - 1)
+        if mes_anterior not in set(meses):
+            return None
+
+        atual = por_mes.xs(mes_atual, level='Mes')
+        anterior = por_mes.xs(mes_anterior, level='Mes')
+        total_atual = int(atual.sum())
+        total_anterior = int(anterior.sum())
+
+        nps_atual = nps_de_contagens(atual, total_atual)['nps_score']
+        nps_anterior = nps_de_contagens(anterior, total_anterior)['nps_score']
+        diferenca = nps_atual - nps_anterior
+
+        return {
+            'nps_mes_atual': nps_atual,
+            'nps_mes_anterior': nps_anterior,
+            'diferenca': diferenca,
+            'tendencia': 'subida' if diferenca > 0 else 'queda' if diferenca < 0 else 'estável',
+            'avaliacoes_mes_atual': total_atual,
+            'avaliacoes_mes_anterior': total_anterior
+        }
+
+    def salvar(self, caminho):
+        """Grava o cubo em JSON (escrita atômica)"""
+        contagens = self.contagens
+        linhas = []
+        for (loja, vendedor, mes, nota), quantidade in contagens.items():
+            linhas.append([
+                None if pd.isna(loja) else loja,
+                None if pd.isna(vendedor) else vendedor,
+                None if pd.isna(mes) else mes,
+                None if pd.isna(nota) else float(nota),
+                int(quantidade)
+            ])
+
+        conteudo = {
+            'versao': self.VERSAO,
+            'total_linhas': self.total_linhas,
+            'colunas': sorted(self.colunas),
+            'contagens': linhas
+        }
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(conteudo, f, ensure_ascii=False, separators=(',', ':'), default=str)
+        os.replace(temporario, caminho)
+        return caminho
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê um cubo salvo (None se não existir ou for de outra versão)"""
+        try:
+            with open(caminho, encoding='utf-8') as f:
+                conteudo = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if conteudo.get('versao') != cls.VERSAO:
+            return None
+
+        linhas = conteudo['contagens']
+        colunas = list(zip(*linhas)) if linhas else [[]] * 5
+        indice = pd.MultiIndex.from_arrays(
+            [list(colunas[0]), list(colunas[1]), list(colunas[2]),
+             np.array(colunas[3], dtype=float)],
+            names=list(DIMENSOES) + ['Nota']
+        )
+        contagens = pd.Series(np.array(colunas[4], dtype='int64'), index=indice)
+        cubo = cls._de_contagens(contagens, conteudo.get('colunas', []))
+        cubo.total_linhas = conteudo.get('total_linhas', cubo.total_linhas)
+        return cubo
+
+
+def caminho_cubo(origem):
+    """Onde o cubo de um dataset é persistido
+
+    Arquivo local: ao lado dele (<arquivo>.cubo.json). Planilha do Google
+    Sheets (ID): PASTA_CUBOS/<id>.cubo.json. Só para chamadas internas: a
+    API de consultas valida a origem e resolve o ID em PASTA_CUBOS.
+    """
+    if os.path.isfile(origem):
+        return f'{origem}.cubo.json'
+    nome = re.sub(r'[^0-9A-Za-z_-]+', '_', str(origem))
+    return os.path.join(PASTA_CUBOS, f'{nome}.cubo.json')
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+API de consultas do dashboard (somente leitura)
+KPIs, rankings, distribuição de notas e série temporal respondidos a partir
+dos cubos NPS já salvos, sem extração, IA ou PDF. Independente do servidor
+web: os frontends (Flask e socketserver) só repassam rota e parâmetros.
+"""
+
+import glob
+import logging
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from agregados_nps import PASTA_CUBOS, CuboNPS
+
+logger = logging.getLogger(__name__)
+
+
+CONSULTAS = ('kpis', 'ranking', 'distribuicao', 'serie')
+DIMENSOES_RANKING = {'loja': 'Loja', 'vendedor': 'Vendedor'}
+TOP_PADRAO = 10
+TOP_MAXIMO = 100
+MAX_RESPOSTAS_CACHE = 512
+# Origens aceitas da query string: ID de planilha (opcionalmente com _gid<n>)
+PADRAO_ORIGEM = re.compile(r'[0-9A-Za-z_-]{1,200}')
+
+_lock = threading.Lock()
+_cubos = {}
+_respostas = OrderedDict()
+
+
+class ErroConsulta(ValueError):
+    """Parâmetro inválido ou dataset inexistente (status HTTP em `status`)"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _arquivo_do_cubo(origem):
+    """Arquivo do cubo pedido; sem origem, o último dataset extraído
+
+    A origem vem da query string: só IDs de planilha, sempre resolvidos
+    dentro de PASTA_CUBOS (cubos ao lado de arquivos locais não são
+    expostos pela API).
+    """
+    if origem:
+        if not PADRAO_ORIGEM.fullmatch(origem):
+            raise ErroConsulta("Parâmetro 'origem' deve ser o ID da planilha")
+        return os.path.join(PASTA_CUBOS, f'{origem}.cubo.json')
+
+    arquivos = glob.glob(os.path.join(PASTA_CUBOS, '*.cubo.json'))
+    if not arquivos:
+        raise ErroConsulta('Nenhum dataset analisado ainda', status=404)
+    return max(arquivos, key=os.path.getmtime)
+
+
+def obter_cubo(origem=None):
+    """(cubo, versão) do dataset; recarrega só quando o arquivo muda"""
+    caminho = _arquivo_do_cubo(origem)
+    try:
+        versao = os.stat(caminho).st_mtime_ns
+    except OSError:
+        raise ErroConsulta(f'Dataset não encontrado: {origem}', status=404)
+
+    with _lock:
+        em_memoria = _cubos.get(caminho)
+        if em_memoria and em_memoria[1] == versao:
+            return em_memoria[0], (caminho, versao)
+
+    cubo = CuboNPS.carregar(caminho)
+    if cubo is None:
+        raise ErroConsulta(f'Dataset não encontrado: {origem}', status=404)
+
+    # Rankings completos são as consultas mais caras; ficam prontos no cubo
+    for dimensao in DIMENSOES_RANKING.values():
+        if dimensao in cubo.colunas and 'Avaliacao' in cubo.colunas:
+            cubo.ranking(dimensao)
+
+    with _lock:
+        _cubos[caminho] = (cubo, versao)
+    logger.debug("📦 Cubo carregado: %s (%s linhas)", caminho, cubo.total_linhas)
+    return cubo, (caminho, versao)
+
+
+def _lista(valor):
+    """'a,b' ou ['a', 'b'] -> lista (None se vazio)"""
+    if not valor:
+        return None
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    itens = [item.strip() for item in valor if item and item.strip()]
+    return itens or None
+
+
+def _inteiro(parametros, nome, padrao, minimo, maximo):
+    try:
+        valor = int(parametros.get(nome) or padrao)
+    except (TypeError, ValueError):
+        raise ErroConsulta(f"Parâmetro '{nome}' deve ser inteiro")
+    return max(minimo, min(valor, maximo))
+
+
+def _aplicar_filtros(cubo, parametros):
+    """Recorte por loja, vendedor e intervalo de meses (de/ate em AAAA-MM)"""
+    lojas = _lista(parametros.get('loja'))
+    vendedores = _lista(parametros.get('vendedor'))
+    de = parametros.get('de')
+    ate = parametros.get('ate')
+
+    meses = None
+    if de or ate:
+        todos = cubo.contagens.index.get_level_values('Mes').dropna().unique()
+        meses = [mes for mes in todos if (not de or mes >= de) and (not ate or mes <= ate)]
+
+    if lojas is None and vendedores is None and meses is None:
+        return cubo
+    return cubo.fatiar(lojas=lojas, vendedores=vendedores, meses=meses)
+
+
+def _limpar(valor):
+    """NaN/numpy -> tipos JSON"""
+    if isinstance(valor, dict):
+        return {str(chave): _limpar(item) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_limpar(item) for item in valor]
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def _kpis(cubo, parametros):
+    gerais = cubo.metricas_gerais()
+    resposta = {
+        'total_avaliacoes': gerais['total_avaliacoes'],
+        'total_vendedores': gerais['total_vendedores'],
+        'nota_media': gerais['nota_media']
+    }
+    if 'Avaliacao' in cubo.colunas:
+        resposta.update(cubo.percentuais_nps())
+    if 'Data' in cubo.colunas:
+        resposta['comparacao_mensal'] = cubo.comparacao_mensal()
+    return resposta
+
+
+def _ranking(cubo, parametros):
+    dimensao = DIMENSOES_RANKING.get((parametros.get('dimensao') or 'loja').lower())
+    if dimensao is None:
+        raise ErroConsulta("Parâmetro 'dimensao' deve ser 'loja' ou 'vendedor'")
+    if dimensao not in cubo.colunas or 'Avaliacao' not in cubo.colunas:
+        return {'dimensao': dimensao.lower(), 'total': 0, 'pagina': 1, 'paginas': 0, 'itens': []}
+
+    top = _inteiro(parametros, 'top', TOP_PADRAO, 1, TOP_MAXIMO)
+    pagina = _inteiro(parametros, 'pagina', 1, 1, 10 ** 6)
+
+    ranking = cubo.ranking(dimensao)
+    if (parametros.get('ordem') or 'desc').lower() == 'asc':
+        ranking = ranking[::-1]
+
+    inicio = (pagina - 1) * top
+    return {
+        'dimensao': dimensao.lower(),
+        'total': len(ranking),
+        'pagina': pagina,
+        'paginas': math.ceil(len(ranking) / top),
+        'itens': [dict(item, posicao=inicio + i + 1) for i, item in enumerate(ranking[inicio:inicio + top])]
+    }
+
+
+def _distribuicao(cubo, parametros):
+    if 'Avaliacao' not in cubo.colunas:
+        return {'total_avaliacoes': cubo.total_linhas, 'notas': {}}
+    return {'total_avaliacoes': cubo.total_linhas, 'notas': cubo.distribuicao_notas()}
+
+
+def _serie(cubo, parametros):
+    if 'Data' not in cubo.colunas:
+        return {'serie': []}
+    return {'serie': cubo.evolucao_mensal()}
+
+
+_EXECUTORES = {
+    'kpis': _kpis,
+    'ranking': _ranking,
+    'distribuicao': _distribuicao,
+    'serie': _serie
+}
+
+
+def consultar(consulta, parametros):
+    """Executa uma consulta sobre o cubo do dataset
+
+    Args:
+        consulta: 'kpis', 'ranking', 'distribuicao' ou 'serie'
+        parametros: dict da query string; filtros comuns: origem, loja,
+            vendedor (lista separada por vírgula), de, ate (AAAA-MM);
+            ranking: dimensao, top, pagina, ordem
+
+    Returns:
+        tuple: (status HTTP, dict da resposta)
+    """
+    if consulta not in _EXECUTORES:
+        return 404, {'success': False, 'error': f'Consulta desconhecida: {consulta}'}
+
+    try:
+        cubo, versao = obter_cubo(parametros.get('origem'))
+
+        # Mesmos parâmetros sobre o mesmo cubo -> mesma resposta
+        chave = (consulta, versao, tuple(sorted((k, str(v)) for k, v in parametros.items())))
+        with _lock:
+            resposta = _respostas.get(chave)
+            if resposta is not None:
+                _respostas.move_to_end(chave)
+                return 200, resposta
+
+        recorte = _aplicar_filtros(cubo, parametros)
+        resposta = _limpar(_EXECUTORES[consulta](recorte, parametros))
+        resposta['success'] = True
+
+        with _lock:
+            _respostas[chave] = resposta
+            while len(_respostas) > MAX_RESPOSTAS_CACHE:
+                _respostas.popitem(last=False)
+        return 200, resposta
+
+    except ErroConsulta as e:
+        return e.status, {'success': False, 'error': str(e)}
+    except Exception as e:
+        logger.exception("❌ Erro na consulta %s: %s", consulta, e)
+        return 500, {'success': False, 'error': f'Erro interno: {str(e)}'}
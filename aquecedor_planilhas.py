@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Aquecimento periódico das planilhas conhecidas
+Mantém um registro das URLs analisadas e, em segundo plano, re-extrai cada
+planilha, guarda o snapshot dos dados limpos e monta/salva o cubo NPS.
+O /api/analyze usa o snapshot ainda válido em vez de buscar a planilha.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from agregados_nps import CuboNPS, caminho_cubo
+from instrumentacao import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+
+# Intervalo entre rodadas (s; 0 desativa), variação aleatória (s) e planilhas simultâneas
+AQUECER_INTERVALO = int(os.environ.get('AQUECER_INTERVALO', '900'))
+AQUECER_JITTER = int(os.environ.get('AQUECER_JITTER', '60'))
+AQUECER_CONCORRENCIA = int(os.environ.get('AQUECER_CONCORRENCIA', '2'))
+# Idade máxima do snapshot usado pelo /api/analyze (s)
+AQUECER_VALIDADE = int(os.environ.get('AQUECER_VALIDADE', str(2 * AQUECER_INTERVALO)))
+# URLs fixas (separadas por vírgula) e registro das URLs analisadas
+AQUECER_PLANILHAS = os.environ.get('AQUECER_PLANILHAS', '')
+ARQUIVO_REGISTRO = os.environ.get('AQUECER_REGISTRO', os.path.join('cache', 'planilhas_registradas.json'))
+MAX_PLANILHAS = int(os.environ.get('AQUECER_MAX_PLANILHAS', '50'))
+
+_lock = threading.Lock()
+_registro = None
+_snapshots = {}
+_thread = None
+_parar = threading.Event()
+
+
+def _sheet_id(url):
+    encontrado = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
+    return encontrado.group(1) if encontrado else None
+
+
+# ---------- Registro de planilhas ----------
+
+def _carregar_registro():
+    """URLs registradas (chamar com _lock)"""
+    global _registro
+
+    if _registro is not None:
+        return _registro
+
+    registro = OrderedDict()
+    for url in AQUECER_PLANILHAS.split(','):
+        if url.strip():
+            registro[url.strip()] = None
+
+    if ARQUIVO_REGISTRO:
+        try:
+            with open(ARQUIVO_REGISTRO, encoding='utf-8') as f:
+                for url in json.load(f):
+                    registro.setdefault(url, None)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("⚠️ Registro de planilhas ignorado: %s", e)
+
+    _registro = registro
+    return _registro
+
+
+def _salvar_registro():
+    if not ARQUIVO_REGISTRO:
+        return
+    try:
+        pasta = os.path.dirname(ARQUIVO_REGISTRO)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f'{ARQUIVO_REGISTRO}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(list(_registro), f, ensure_ascii=False, indent=2)
+        os.replace(temporario, ARQUIVO_REGISTRO)
+    except OSError as e:
+        logger.warning("⚠️ Erro ao salvar registro de planilhas: %s", e)
+
+
+def registrar(url):
+    """Inclui a URL no aquecimento (as mais antigas saem acima de MAX_PLANILHAS)"""
+    if not url or not _sheet_id(url):
+        return
+
+    with _lock:
+        registro = _carregar_registro()
+        if url in registro:
+            registro.move_to_end(url)
+            return
+        registro[url] = None
+        while len(registro) > MAX_PLANILHAS:
+            antiga, _ = registro.popitem(last=False)
+            _snapshots.pop(antiga, None)
+        _salvar_registro()
+
+    logger.debug("📌 Planilha registrada para aquecimento: %s", url)
+
+
+def planilhas_registradas():
+    with _lock:
+        return list(_carregar_registro())
+
+
+# ---------- Snapshots ----------
+
+def atualizar(url):
+    """Re-extrai a planilha, monta/salva o cubo e guarda o snapshot
+
+    Returns:
+        bool: True se o snapshot foi atualizado
+    """
+    from nps_extractor import NPSExtractor
+
+    inicio = time.perf_counter()
+    try:
+        with medir_etapa('aquecimento'):
+            extractor = NPSExtractor()
+            if not extractor.conectar_sheets(url):
+                logger.warning("⚠️ Aquecimento: falha ao conectar %s", url)
+                return False
+            dados = extractor.extrair_avaliacoes()
+            if dados is None or len(dados) == 0:
+                logger.warning("⚠️ Aquecimento: nenhum dado em %s", url)
+                return False
+
+            # Cubo salvo para a API de consultas e rankings já calculados
+            cubo = CuboNPS.de_dados(dados)
+            sheet_id = _sheet_id(url)
+            try:
+                cubo.salvar(caminho_cubo(sheet_id))
+            except OSError as e:
+                logger.warning("⚠️ Erro ao salvar cubo NPS: %s", e)
+            cubo.calcular_metricas()
+
+        with _lock:
+            _snapshots[url] = {
+                'dados': dados,
+                'cubo': cubo,
+                'sheet_id': sheet_id,
+                'atualizado_em': time.time()
+            }
+
+        logger.info("🔥 Planilha aquecida: %s registros em %.1fs (%s)",
+                    len(dados), time.perf_counter() - inicio, sheet_id)
+        return True
+
+    except Exception as e:
+        logger.error("❌ Erro no aquecimento de %s: %s", url, e)
+        return False
+
+
+def obter_aquecida(url, validade=None):
+    """Snapshot ainda válido da planilha ({dados, cubo, sheet_id, atualizado_em}) ou None
+
+    Os dados são compartilhados entre requisições: não altere o DataFrame.
+    """
+    validade = AQUECER_VALIDADE if validade is None else validade
+    with _lock:
+        snapshot = _snapshots.get(url)
+    if snapshot is None or time.time() - snapshot['atualizado_em'] > validade:
+        return None
+    return snapshot
+
+
+def estado():
+    """Resumo dos snapshots (para logs e diagnósticos)"""
+    with _lock:
+        return {
+            url: datetime.fromtimestamp(snapshot['atualizado_em']).isoformat(timespec='seconds')
+            for url, snapshot in _snapshots.items()
+        }
+
+
+# ---------- Agendador ----------
+
+def aquecer_todas():
+    """Uma rodada: atualiza as planilhas registradas com concorrência limitada"""
+    urls = planilhas_registradas()
+    if not urls:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(AQUECER_CONCORRENCIA, len(urls)))) as executor:
+        atualizadas = sum(executor.map(atualizar, urls))
+
+    logger.info("🔥 Aquecimento: %s/%s planilha(s) atualizada(s)", atualizadas, len(urls))
+    return atualizadas
+
+
+def _laco():
+    while not _parar.is_set():
+        aquecer_todas()
+        espera = max(1, AQUECER_INTERVALO + random.uniform(-AQUECER_JITTER, AQUECER_JITTER))
+        _parar.wait(espera)
+
+
+def iniciar_aquecedor():
+    """Sobe o agendador em thread daemon (uma vez por processo)"""
+    global _thread
+
+    if AQUECER_INTERVALO <= 0:
+        return
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _parar.clear()
+        _thread = threading.Thread(target=_laco, name='aquecedor-planilhas', daemon=True)
+        _thread.start()
+
+    logger.info("🔥 Aquecedor de planilhas: a cada %ss (±%ss), %s simultânea(s)",
+                AQUECER_INTERVALO, AQUECER_JITTER, AQUECER_CONCORRENCIA)
+
+
+def parar_aquecedor():
+    _parar.set()
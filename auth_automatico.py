@@ -7,10 +7,79 @@ Data: 11/07/2025
 
 import gspread
 import json
+import logging
 import os
-import requests
+import threading
+import time
+from datetime import datetime, timezone
+from sessao_http import obter_sessao, TIMEOUT_PADRAO
 from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+from google.auth.exceptions import RefreshError
+
+logger = logging.getLogger(__name__)
+
+# Endpoint de token OAuth2
+TOKEN_URI = os.environ.get('GOOGLE_TOKEN_URI', 'https://oauth2.googleapis.com/token')
+
+# Renova o access token quando faltar menos que isso para expirar (segundos)
+MARGEM_RENOVACAO = int(os.environ.get('TOKEN_MARGEM_RENOVACAO', '300'))
+
+# Espera (s) antes de tentar de novo uma renovação em segundo plano que
+# falhou; dobra a cada falha até o máximo
+ESPERA_RENOVACAO_INICIAL = 5
+ESPERA_RENOVACAO_MAXIMA = 300
+
+
+class _CacheToken:
+    """Access token compartilhado por todas as instâncias do processo"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token_data = None
+        self.expira_em = 0.0
+        self.timer = None
+        self.falhas = 0
+    
+    def valido(self, margem=0):
+        """True se há token que não expira nos próximos `margem` segundos"""
+        return self.token_data is not None and time.time() < self.expira_em - margem
+    
+    def definir(self, token_data):
+        """Guarda o token e calcula a expiração a partir de expires_at/expires_in"""
+        self.token_data = token_data
+        self.expira_em = float(token_data.get('expires_at', 0))
+    
+    def limpar(self):
+        """Descarta o token em memória e cancela renovação agendada"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.token_data = None
+        self.expira_em = 0.0
+        self.falhas = 0
+    
+    def expiracao_utc(self):
+        """Expiração no formato do google-auth (datetime UTC sem timezone)"""
+        return datetime.fromtimestamp(self.expira_em, timezone.utc).replace(tzinfo=None)
+
+
+_cache_token = _CacheToken()
+
+
+class _CredenciaisDoCache(Credentials):
+    """Credentials que renovam pelo cache do processo
+    
+    Os clientes gspread do pool (pool_clientes) usam estas credenciais:
+    quando o token vence, pegam o que o timer já renovou em vez de fazer
+    o próprio POST de token.
+    """
+    
+    def refresh(self, request):
+        if not AuthAutomatico().gerar_access_token():
+            raise RefreshError('Não foi possível renovar o token automático')
+        self.token = _cache_token.token_data.get('access_token')
+        self.expiry = _cache_token.expiracao_utc()
+
 
 class AuthAutomatico:
     """Classe para autenticação automática com suas credenciais"""
@@ -34,44 +103,117 @@ class AuthAutomatico:
         self.gc = None
     
     def gerar_access_token(self):
-        """Gera access token automaticamente"""
+        """Garante um access token válido no cache do processo
+        
+        Só chama o endpoint OAuth quando o token em memória (ou o salvo em
+        disco) está perto de expirar. O lock evita que várias threads
+        renovem ao mesmo tempo.
+        """
         try:
-            # Se já temos um token salvo, tenta usar
-            if os.path.exists(self.token_file):
-                with open(self.token_file, 'r') as f:
-                    token_data = json.load(f)
+            if _cache_token.valido(MARGEM_RENOVACAO):
+                return True
+            
+            with _cache_token.lock:
+                # Outra thread pode ter renovado enquanto esperávamos o lock
+                if _cache_token.valido(MARGEM_RENOVACAO):
+                    return True
                 
-                if 'refresh_token' in token_data:
-                    # Usa refresh token para gerar novo access token
-                    data = {
-                        'client_id': self.client_id,
-                        'client_secret': self.client_secret,
-                        'refresh_token': token_data['refresh_token'],
-                        'grant_type': 'refresh_token'
-                    }
-                    
-                    response = requests.post('https://oauth2.googleapis.com/token', data=data)
-                    
-                    if response.status_code == 200:
-                        new_token = response.json()
-                        # Mantém refresh token
-                        new_token['refresh_token'] = token_data['refresh_token']
-                        
-                        # Salva token atualizado
-                        with open(self.token_file, 'w') as f:
-                            json.dump(new_token, f, indent=2)
-                        
-                        print("✅ Token renovado automaticamente!")
-                        return True
-            
-            # Se não tem token, precisa configurar uma vez
-            print("❌ Token não encontrado")
-            return False
+                token_data = _cache_token.token_data or self._carregar_token()
+                if not token_data or 'refresh_token' not in token_data:
+                    # Se não tem token, precisa configurar uma vez
+                    logger.error("❌ Token não encontrado")
+                    return False
+                
+                # Token salvo em disco ainda válido (ex.: renovado por outro processo)
+                _cache_token.definir(token_data)
+                if _cache_token.valido(MARGEM_RENOVACAO):
+                    self._agendar_renovacao()
+                    return True
+                
+                if self._renovar_token(token_data):
+                    logger.info("✅ Token renovado automaticamente!")
+                    return True
+                
+                # Falha na renovação: usa o token atual enquanto não expirar
+                return _cache_token.valido()
             
         except Exception as e:
-            print(f"❌ Erro ao gerar token: {str(e)}")
+            logger.error("❌ Erro ao gerar token: %s", e)
             return False
     
+    def _carregar_token(self):
+        """Lê o token salvo em disco (None se não existir)"""
+        if not os.path.exists(self.token_file):
+            return None
+        
+        with open(self.token_file, 'r') as f:
+            return json.load(f)
+    
+    def _salvar_token(self, token_data):
+        """Salva token em disco"""
+        os.makedirs(os.path.dirname(self.token_file), exist_ok=True)
+        with open(self.token_file, 'w') as f:
+            json.dump(token_data, f, indent=2)
+    
+    def _renovar_token(self, token_data):
+        """Usa o refresh token para gerar novo access token (chamar com o lock)"""
+        data = {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'refresh_token': token_data['refresh_token'],
+            'grant_type': 'refresh_token'
+        }
+        
+        response = obter_sessao().post(TOKEN_URI, data=data, timeout=TIMEOUT_PADRAO)
+        
+        if response.status_code != 200:
+            logger.warning("⚠️ Falha ao renovar token: %s", response.status_code)
+            return False
+        
+        new_token = response.json()
+        # Mantém refresh token
+        new_token['refresh_token'] = token_data['refresh_token']
+        new_token['expires_at'] = time.time() + int(new_token.get('expires_in', 3600))
+        
+        # Persiste apenas quando o token mudou
+        if new_token.get('access_token') != token_data.get('access_token'):
+            self._salvar_token(new_token)
+        
+        _cache_token.definir(new_token)
+        _cache_token.falhas = 0
+        self._agendar_renovacao()
+        return True
+    
+    def _agendar_renovacao(self, atraso=None):
+        """Agenda renovação em segundo plano (padrão: antes do token expirar)"""
+        if _cache_token.timer is not None:
+            _cache_token.timer.cancel()
+        
+        if atraso is None:
+            atraso = max(_cache_token.expira_em - MARGEM_RENOVACAO - time.time(), 1)
+        _cache_token.timer = threading.Timer(atraso, self._renovar_em_segundo_plano)
+        _cache_token.timer.daemon = True
+        _cache_token.timer.start()
+    
+    def _renovar_em_segundo_plano(self):
+        """Renovação proativa disparada pelo timer (falha: nova tentativa com espera crescente)"""
+        with _cache_token.lock:
+            # Token descartado ou já renovado por outra thread (que reagendou)
+            if not _cache_token.token_data or _cache_token.valido(MARGEM_RENOVACAO):
+                return
+            
+            try:
+                if self._renovar_token(_cache_token.token_data):
+                    return
+            except Exception as e:
+                logger.warning("⚠️ Erro na renovação automática do token: %s", e)
+            
+            _cache_token.falhas += 1
+            atraso = min(ESPERA_RENOVACAO_INICIAL * 2 ** (_cache_token.falhas - 1), ESPERA_RENOVACAO_MAXIMA)
+            logger.warning("⚠️ Renovação automática do token falhou (%s); nova tentativa em %ss",
+                           _cache_token.falhas, atraso)
+            self._agendar_renovacao(atraso)
+    
     def configurar_token_inicial(self, codigo_auth):
         """Configura token inicial com código de autorização"""
         try:
@@ -85,15 +227,18 @@ class AuthAutomatico:
                 'redirect_uri': 'http://localhost:8080'
             }
             
-            response = requests.post('https://oauth2.googleapis.com/token', data=data)
+            response = obter_sessao().post(TOKEN_URI, data=data, timeout=TIMEOUT_PADRAO)
             
             if response.status_code == 200:
                 token_data = response.json()
+                token_data['expires_at'] = time.time() + int(token_data.get('expires_in', 3600))
                 
                 # Salva token
-                os.makedirs('credentials', exist_ok=True)
-                with open(self.token_file, 'w') as f:
-                    json.dump(token_data, f, indent=2)
+                self._salvar_token(token_data)
+                
+                with _cache_token.lock:
+                    _cache_token.limpar()
+                    _cache_token.definir(token_data)
                 
                 print("✅ Token inicial configurado!")
                 print("🚀 Agora o sistema funcionará automaticamente!")
@@ -110,31 +255,30 @@ class AuthAutomatico:
     def conectar_automatico(self):
         """Conecta automaticamente usando token"""
         try:
-            # Tenta gerar/renovar token
+            # Garante token válido (cache do processo, sem ir ao disco)
             if not self.gerar_access_token():
                 return False
             
-            # Carrega token
-            with open(self.token_file, 'r') as f:
-                token_data = json.load(f)
+            token_data = _cache_token.token_data
             
-            # Cria credenciais
-            creds = Credentials(
+            # Credenciais renovadas pelo cache do processo (sem POST de token próprio)
+            creds = _CredenciaisDoCache(
                 token=token_data.get('access_token'),
                 refresh_token=token_data.get('refresh_token'),
-                token_uri='https://oauth2.googleapis.com/token',
+                token_uri=TOKEN_URI,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
-                scopes=self.scopes
+                scopes=self.scopes,
+                expiry=_cache_token.expiracao_utc()
             )
             
             # Autoriza gspread
             self.gc = gspread.authorize(creds)
-            print("✅ Conectado automaticamente!")
+            logger.info("✅ Conectado automaticamente!")
             return True
             
         except Exception as e:
-            print(f"❌ Erro na conexão automática: {str(e)}")
+            logger.error("❌ Erro na conexão automática: %s", e)
             return False
     
     def testar_planilha(self, sheet_id="EXAMPLE_SHEET_ID"):
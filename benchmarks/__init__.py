@@ -0,0 +1,4 @@
+"""
+Benchmarks do sistema NPS
+Gerador de planilhas sintéticas e medições de limpeza, métricas e pipeline completo
+"""
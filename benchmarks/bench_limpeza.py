@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark da limpeza de dados do NPSExtractor
+Compara a limpeza antiga (completa + básica) com a etapa única atual
+
+Uso: python benchmarks/bench_limpeza.py [linhas]
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nps_extractor import NPSExtractor
+from benchmarks.dados_sinteticos import gerar_dataset
+
+
+def limpeza_legada(df):
+    """Cópia da limpeza anterior (_limpar_dados_completos + _limpar_dados_basicos)"""
+    df = df.dropna(how='all')
+    df.columns = df.columns.str.strip()
+    df.columns = df.columns.str.replace('\n', ' ')
+    df.columns = df.columns.str.replace('\r', ' ')
+    df = df.rename(columns={col: ' '.join(col.split()) for col in df.columns})
+    
+    for col in df.columns:
+        if any(palavra in col.lower() for palavra in ['data', 'date', 'timestamp', 'hora']):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        df[col] = df[col].astype(str).str.strip()
+        if col.lower() in ['nome', 'cliente', 'vendedor']:
+            df = df[df[col] != '']
+    
+    # extrair_avaliacoes repetia a limpeza básica
+    df = df.copy().dropna(how='all')
+    for col in [c for c in df.columns if any(p in c.lower() for p in ['data', 'date', 'timestamp'])]:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        df[col] = df[col].astype(str).str.strip()
+    
+    return df
+
+
+def cronometrar(funcao, repeticoes=3):
+    """Retorna o melhor tempo (s) entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    
+    print(f"📊 Gerando planilha sintética com {linhas} linhas...")
+    planilha = gerar_dataset(linhas, lojas=60, vendedores=400, com_looker=False, sujo=True)
+    
+    extractor = NPSExtractor(auth_method='public')
+    
+    def limpeza_atual():
+        extractor.dados = extractor._limpar_dados_completos(planilha.copy())
+        return extractor.extrair_avaliacoes()
+    
+    tempo_legado = cronometrar(lambda: limpeza_legada(planilha.copy()))
+    tempo_atual = cronometrar(limpeza_atual)
+    
+    print()
+    print(f"Limpeza anterior: {tempo_legado:.2f}s")
+    print(f"Limpeza atual:    {tempo_atual:.2f}s")
+    print(f"Speed-up:         {tempo_legado / tempo_atual:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
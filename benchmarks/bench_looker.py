@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark e paridade do motor_looker com o LookerFormulas
+Compara NPS geral, NPS por loja/vendedor, interações e avaliações do
+motor compilado com aplicar_todas_formulas + analisar_por_dimensao.
+Sem looker_formulas instalado, mede só o motor (a paridade com o
+comportamento atual fica em tests/test_motor_looker.py).
+
+Uso: python benchmarks/bench_looker.py [--linhas 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor_looker import MotorLooker
+from benchmarks.dados_sinteticos import gerar_dataset
+
+try:
+    from looker_formulas import LookerFormulas
+except ImportError:
+    LookerFormulas = None
+
+
+# Percentuais arredondados em 1 casa podem divergir na última casa
+TOLERANCIA = 0.1 + 1e-9
+
+
+def cronometrar(funcao, repeticoes=3):
+    """(melhor tempo em s, resultado da última execução)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def via_formulas(dados):
+    """Caminho anterior da CalculadoraMetricas"""
+    enriquecidos = LookerFormulas.aplicar_todas_formulas(dados)
+    return {
+        'geral': LookerFormulas.calcular_nps_looker(enriquecidos),
+        'dimensoes': {
+            dimensao: LookerFormulas.analisar_por_dimensao(enriquecidos, dimensao)
+            for dimensao in ('Loja', 'Vendedor')
+        },
+        'interacoes': {
+            'd1_d30_positivas': int((enriquecidos['Looker_Interacao_D1_D30'] == 'Sim').sum()),
+            'outros_periodos_positivas': int((enriquecidos['Looker_Interacao_Outros'] == 'Sim').sum())
+        },
+        'avaliacoes': {'avaliou': int((enriquecidos['Looker_Avaliou'] == 'Avaliou').sum())}
+    }
+
+
+def divergencias(antigo, novo):
+    """Lista de diferenças entre os dois resultados"""
+    erros = []
+
+    for chave in ('nps_final', 'total_avaliacoes', 'promotores_count', 'detratores_count'):
+        if chave in antigo['geral'] and abs(antigo['geral'][chave] - novo['geral'][chave]) > TOLERANCIA:
+            erros.append(f"geral.{chave}: {antigo['geral'][chave]} != {novo['geral'][chave]}")
+
+    for dimensao, itens in antigo['dimensoes'].items():
+        campo = dimensao.lower()
+        novos = {item[campo]: item for item in novo['dimensoes'][dimensao]}
+        if len(novos) != len(itens):
+            erros.append(f"{dimensao}: {len(itens)} grupos != {len(novos)}")
+        for item in itens:
+            outro = novos.get(item[campo])
+            if outro is None:
+                erros.append(f"{dimensao} {item[campo]}: ausente")
+            elif (abs(item['nps_looker'] - outro['nps_looker']) > TOLERANCIA
+                  or item['total_avaliacoes'] != outro['total_avaliacoes']):
+                erros.append(f"{dimensao} {item[campo]}: {item} != {outro}")
+
+    for grupo in ('interacoes', 'avaliacoes'):
+        for chave, valor in antigo[grupo].items():
+            if valor != novo[grupo][chave]:
+                erros.append(f"{grupo}.{chave}: {valor} != {novo[grupo][chave]}")
+
+    return erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do motor Looker')
+    parser.add_argument('--linhas', type=int, default=200_000)
+    args = parser.parse_args()
+
+    dados = gerar_dataset(linhas=args.linhas, lojas=20, vendedores=400)
+    dados['Avaliacao'] = pd.to_numeric(dados['Avaliacao'], errors='coerce')
+    dados['Data'] = pd.to_datetime(dados['Data'], format='%d/%m/%Y %H:%M:%S')
+
+    tempo_motor, novo = cronometrar(lambda: MotorLooker(dados).calcular(dimensoes=('Loja', 'Vendedor')))
+    print(f"🔍 {args.linhas} linhas")
+    print(f"  motor_looker:   {tempo_motor * 1000:8.1f} ms")
+
+    if LookerFormulas is None:
+        print("  looker_formulas indisponível: paridade coberta por tests/test_motor_looker.py")
+        return
+
+    tempo_formulas, antigo = cronometrar(lambda: via_formulas(dados))
+    print(f"  LookerFormulas: {tempo_formulas * 1000:8.1f} ms ({tempo_formulas / tempo_motor:.1f}x)")
+
+    erros = divergencias(antigo, novo)
+    if erros:
+        print(f"❌ {len(erros)} divergência(s):")
+        for erro in erros[:20]:
+            print(f"  {erro}")
+        sys.exit(1)
+    print("✅ Paridade: NPS geral, lojas, vendedores, interações e avaliações")
+
+
+if __name__ == "__main__":
+    main()
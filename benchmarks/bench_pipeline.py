@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline NPS
+Mede a limpeza do NPSExtractor, cada método calcular_* da
+CalculadoraMetricas e o run_analysis completo (IA e PDF substituídos por
+stubs). Os resultados são salvos em benchmarks/resultados/<versao>.json e
+comparados com a execução anterior.
+
+Uso: python benchmarks/bench_pipeline.py [--linhas 50000] [--versao nome]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime
+from unittest import mock
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'frontend'))
+
+from configuracao_log import configurar_logging
+
+# Silencia o pipeline durante as medições
+configurar_logging(nivel=os.environ.get('LOG_LEVEL', 'WARNING'))
+
+import pandas as pd
+
+import nps_extractor
+import pool_renderizacao
+from nps_extractor import NPSExtractor
+from calculadora_metricas import CalculadoraMetricas
+from instrumentacao import coletar_etapas
+from benchmarks.dados_sinteticos import gerar_dataset, para_csv
+
+
+PASTA_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+# Na ordem de calcular_todas_metricas (alguns usam métricas anteriores)
+METODOS_CALCULO = (
+    'calcular_metricas_gerais',
+    'calcular_nps_por_loja',
+    'calcular_nps_por_vendedor',
+    'calcular_distribuicao_notas',
+    'calcular_percentuais_nps',
+    'calcular_resumo_executivo',
+    'analisar_vendedores',
+    'calcular_evolucao_temporal',
+    'gerar_insights_automaticos',
+    'calcular_metricas_looker',
+    'calcular_todas_metricas'
+)
+
+URL_SINTETICA = 'https://docs.google.com/spreadsheets/d/benchmark-sintetico/edit'
+
+
+class _RespostaLocal:
+    """Resposta HTTP em memória com o CSV sintético"""
+
+    def __init__(self, conteudo):
+        self.status_code = 200
+        self.content = conteudo
+
+
+class _SessaoLocal:
+    """Substitui a sessão HTTP: todo export devolve o mesmo CSV"""
+
+    def __init__(self, conteudo):
+        self.conteudo = conteudo
+
+    def get(self, url, **kwargs):
+        return _RespostaLocal(self.conteudo)
+
+
+class _GeradorPDFStub:
+    """Substitui GeradorPDFExecutivoSimples sem renderizar"""
+
+    def gerar_pdf_executivo_simples(self, dados_pdf, loja_nome):
+        return os.path.join('relatorios', 'benchmark.pdf')
+
+
+def _analise_ia_stub(self, resultados_looker):
+    """Substitui a chamada à OpenAI"""
+    return 'Relatório IA (stub de benchmark)'
+
+
+def cronometrar(funcao, repeticoes=3):
+    """Executa `funcao` e retorna melhor tempo e mediana (s)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {'melhor_s': round(min(tempos), 6), 'mediana_s': round(statistics.median(tempos), 6)}
+
+
+def _stubs_pipeline(conteudo_csv):
+    """Patches ativos durante as medições: rede, OpenAI e PDF"""
+    modulo_pdf = types.ModuleType('gerador_pdf_executivo_simples')
+    modulo_pdf.GeradorPDFExecutivoSimples = _GeradorPDFStub
+    return [
+        mock.patch.object(nps_extractor, 'obter_sessao', lambda: _SessaoLocal(conteudo_csv)),
+        mock.patch.object(nps_extractor, 'obter_cliente', lambda metodo: None),
+        mock.patch.object(CalculadoraMetricas, 'gerar_analise_ia_socialzap', _analise_ia_stub),
+        mock.patch.dict(sys.modules, {'gerador_pdf_executivo_simples': modulo_pdf}),
+        # PDF no próprio processo, onde o stub está registrado
+        mock.patch.object(pool_renderizacao, 'PDF_WORKERS', 0)
+    ]
+
+
+def medir_limpeza(planilha, repeticoes):
+    """Limpeza completa + extrair_avaliacoes sobre a planilha crua"""
+    extractor = NPSExtractor(auth_method='public')
+
+    def limpar():
+        extractor.dados = extractor._limpar_dados_completos(planilha.copy())
+        return extractor.extrair_avaliacoes()
+
+    return cronometrar(limpar, repeticoes)
+
+
+def medir_calculos(dados, repeticoes):
+    """Tempo de cada calcular_* (mesma instância, na ordem do pipeline)"""
+    resultados = {metodo: [] for metodo in METODOS_CALCULO}
+
+    for _ in range(repeticoes):
+        calculadora = CalculadoraMetricas(dados)
+        for metodo in METODOS_CALCULO:
+            inicio = time.perf_counter()
+            getattr(calculadora, metodo)()
+            resultados[metodo].append(time.perf_counter() - inicio)
+
+    return {
+        metodo: {'melhor_s': round(min(tempos), 6), 'mediana_s': round(statistics.median(tempos), 6)}
+        for metodo, tempos in resultados.items()
+    }
+
+
+def medir_run_analysis(repeticoes):
+    """run_analysis de ponta a ponta e tempo por etapa da última execução"""
+    from server_flask import run_analysis
+
+    etapas_execucao = []
+
+    def executar():
+        with coletar_etapas() as etapas:
+            resultado = run_analysis(URL_SINTETICA, 'Benchmark')
+        if not resultado.get('success'):
+            raise RuntimeError(f"run_analysis falhou: {resultado.get('error')}")
+        etapas_execucao[:] = etapas
+
+    tempos = cronometrar(executar, repeticoes)
+
+    por_etapa = {}
+    for etapa in etapas_execucao:
+        por_etapa[etapa['etapa']] = round(por_etapa.get(etapa['etapa'], 0) + etapa['duracao_s'], 6)
+    tempos['etapas'] = por_etapa
+    return tempos
+
+
+def versao_atual():
+    """Identifica a versão do código (git describe; data se não for repositório)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=RAIZ, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def salvar_resultados(resultados, versao):
+    """Grava resultados/<versao>.json e retorna o caminho"""
+    os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+    caminho = os.path.join(PASTA_RESULTADOS, f'{versao}.json')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def carregar_anterior(versao, parametros):
+    """Resultado salvo mais recente de outra versão com os mesmos parâmetros"""
+    if not os.path.isdir(PASTA_RESULTADOS):
+        return None
+
+    candidatos = []
+    for nome in os.listdir(PASTA_RESULTADOS):
+        if not nome.endswith('.json') or nome == f'{versao}.json':
+            continue
+        try:
+            with open(os.path.join(PASTA_RESULTADOS, nome), encoding='utf-8') as f:
+                resultado = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if resultado.get('parametros') == parametros:
+            candidatos.append(resultado)
+
+    return max(candidatos, key=lambda r: r['executado_em']) if candidatos else None
+
+
+def _linhas_medicao(resultados):
+    """Achata os resultados em (nome, melhor_s)"""
+    yield 'limpeza', resultados['limpeza']['melhor_s']
+    for metodo, tempos in resultados['calculos'].items():
+        yield metodo, tempos['melhor_s']
+    if 'run_analysis' in resultados:
+        yield 'run_analysis', resultados['run_analysis']['melhor_s']
+
+
+def imprimir_relatorio(resultados, anterior=None):
+    """Tabela com os tempos e a variação em relação à versão anterior"""
+    tempos_anteriores = dict(_linhas_medicao(anterior)) if anterior else {}
+
+    print()
+    cabecalho = f"{'Medição':<28}{'Melhor (s)':>12}"
+    if anterior:
+        cabecalho += f"{anterior['versao'][:12]:>14}{'Variação':>11}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+
+    for nome, tempo in _linhas_medicao(resultados):
+        linha = f"{nome:<28}{tempo:>12.4f}"
+        if nome in tempos_anteriores:
+            referencia = tempos_anteriores[nome]
+            variacao = (tempo / referencia - 1) * 100 if referencia else 0
+            alerta = '  ⚠️' if variacao > 10 else ''
+            linha += f"{referencia:>14.4f}{variacao:>+10.1f}%{alerta}"
+        print(linha)
+
+    if 'run_analysis' in resultados:
+        print()
+        print('Etapas do run_analysis (última execução):')
+        for etapa, duracao in resultados['run_analysis']['etapas'].items():
+            print(f"  {etapa:<26}{duracao:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline NPS')
+    parser.add_argument('--linhas', type=int, default=50_000)
+    parser.add_argument('--lojas', type=int, default=10)
+    parser.add_argument('--vendedores', type=int, default=80)
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--versao', default=None, help='nome do resultado (padrão: git describe)')
+    parser.add_argument('--sem-run-analysis', action='store_true', help='não mede o pipeline completo')
+    parser.add_argument('--nao-salvar', action='store_true')
+    args = parser.parse_args()
+
+    parametros = {
+        'linhas': args.linhas,
+        'lojas': args.lojas,
+        'vendedores': args.vendedores,
+        'meses': args.meses,
+        'repeticoes': args.repeticoes
+    }
+    versao = args.versao or versao_atual()
+
+    print(f"📊 Gerando planilha sintética: {args.linhas} linhas, {args.lojas} lojas, "
+          f"{args.vendedores} vendedores, {args.meses} meses...")
+    planilha = gerar_dataset(args.linhas, args.lojas, args.vendedores, args.meses, sujo=True)
+    conteudo_csv = para_csv(planilha)
+
+    resultados = {
+        'versao': versao,
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'parametros': parametros
+    }
+
+    stubs = _stubs_pipeline(conteudo_csv)
+    for stub in stubs:
+        stub.start()
+    try:
+        print("🧹 Limpeza...")
+        resultados['limpeza'] = medir_limpeza(planilha, args.repeticoes)
+
+        # Métricas sobre os dados já limpos, como no pipeline
+        extractor = NPSExtractor(auth_method='public')
+        extractor.dados = extractor._limpar_dados_completos(planilha.copy())
+        dados = extractor.extrair_avaliacoes()
+        # Notas numéricas, como entregues por get_all_records (o export CSV
+        # público mantém tudo como texto)
+        dados['Avaliacao'] = pd.to_numeric(dados['Avaliacao'], errors='coerce')
+
+        print("🧮 Métodos calcular_*...")
+        resultados['calculos'] = medir_calculos(dados, args.repeticoes)
+
+        if not args.sem_run_analysis:
+            print("🚀 run_analysis (IA e PDF em stub)...")
+            resultados['run_analysis'] = medir_run_analysis(args.repeticoes)
+    finally:
+        for stub in reversed(stubs):
+            stub.stop()
+
+    anterior = carregar_anterior(versao, parametros)
+    imprimir_relatorio(resultados, anterior)
+
+    if not args.nao_salvar:
+        caminho = salvar_resultados(resultados, versao)
+        print(f"\n💾 Resultados salvos em: {os.path.relpath(caminho, RAIZ)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark da renderização de PDFs com e sem cache_renderizacao
+Monta relatórios com a estrutura dos PDFs executivos (capa, métricas,
+gráficos de distribuição e por vendedor, rodapé) para várias abas com
+dados parecidos, como em uma análise multi-abas.
+
+Uso: python benchmarks/bench_renderizacao.py [--relatorios 20]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+import cache_renderizacao
+from cache_renderizacao import CacheGraficos, estilos_pdf, fragmento_estatico
+
+
+TEXTO_METODOLOGIA = (
+    'NPS = % Promotores (notas 9-10) - % Detratores (notas 0-6). '
+    'Neutros (7-8) entram apenas no total de respostas. ' * 6
+)
+
+
+def grafico_distribuicao(dados):
+    figura, eixo = plt.subplots(figsize=(6, 3))
+    eixo.bar([str(n) for n in range(11)], dados['notas'], color='#2c5282')
+    eixo.set_title('Distribuição das notas')
+    return figura
+
+
+def grafico_vendedores(dados):
+    figura, eixo = plt.subplots(figsize=(6, 4))
+    eixo.barh(dados['nomes'], dados['nps'], color='#2f855a')
+    eixo.set_title('NPS por vendedor')
+    return figura
+
+
+def dados_aba(indice):
+    """Abas parecidas: a distribuição se repete a cada 4 abas"""
+    variante = indice % 4
+    return {
+        'loja': f'Loja {indice}',
+        'nps': 60 + variante,
+        'notas': [2, 1, 1, 2, 2, 4, 5, 8 + variante, 14, 20, 41],
+        'nomes': [f'Vendedor {i}' for i in range(8)],
+        'nps_vendedores': [50 + i + variante for i in range(8)]
+    }
+
+
+def _png(figura):
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=cache_renderizacao.DPI_PADRAO, bbox_inches='tight')
+    plt.close(figura)
+    buffer.seek(0)
+    return buffer
+
+
+def relatorio_sem_cache(dados, destino):
+    """Como os geradores fazem hoje: tudo reconstruído a cada relatório"""
+    estilos = getSampleStyleSheet()
+    estilos.add(ParagraphStyle('TituloRelatorio', parent=estilos['Title'], fontSize=22))
+    estilos.add(ParagraphStyle('Corpo', parent=estilos['BodyText'], fontSize=10))
+
+    historia = [
+        Paragraph('Relatório Executivo NPS', estilos['TituloRelatorio']),
+        Paragraph(TEXTO_METODOLOGIA, estilos['Corpo']),
+        Paragraph(f"{dados['loja']}: NPS {dados['nps']}", estilos['Corpo']),
+        Image(_png(grafico_distribuicao(dados)), width=15 * cm, height=7.5 * cm),
+        Image(_png(grafico_vendedores({'nomes': dados['nomes'], 'nps': dados['nps_vendedores']})),
+              width=15 * cm, height=10 * cm),
+        Spacer(1, 12),
+        Paragraph('Relatório gerado automaticamente', estilos['Corpo'])
+    ]
+    SimpleDocTemplate(destino, pagesize=A4).build(historia)
+
+
+def relatorio_com_cache(dados, destino, cache):
+    """Mesmo relatório usando estilos, gráficos e fragmentos do cache"""
+    estilos = estilos_pdf()
+    cabecalho = fragmento_estatico('capa', lambda: [
+        Paragraph('Relatório Executivo NPS', estilos['TituloRelatorio']),
+        Paragraph(TEXTO_METODOLOGIA, estilos['Corpo'])
+    ])
+    rodape = fragmento_estatico('rodape', lambda: [
+        Spacer(1, 12),
+        Paragraph('Relatório gerado automaticamente', estilos['Corpo'])
+    ])
+
+    historia = cabecalho + [
+        Paragraph(f"{dados['loja']}: NPS {dados['nps']}", estilos['Corpo']),
+        cache.imagem('distribuicao_notas', {'notas': dados['notas']}, grafico_distribuicao,
+                     15 * cm, 7.5 * cm),
+        cache.imagem('nps_vendedores', {'nomes': dados['nomes'], 'nps': dados['nps_vendedores']},
+                     grafico_vendedores, 15 * cm, 10 * cm)
+    ] + rodape
+    SimpleDocTemplate(destino, pagesize=A4).build(historia)
+
+
+def medir(relatorios, gerar):
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory() as pasta:
+        for indice in range(relatorios):
+            gerar(dados_aba(indice), os.path.join(pasta, f'relatorio_{indice}.pdf'))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da renderização de PDFs')
+    parser.add_argument('--relatorios', type=int, default=20)
+    args = parser.parse_args()
+
+    # Cache só em memória para não depender de execuções anteriores
+    cache = CacheGraficos(pasta='')
+
+    sem_cache = medir(args.relatorios, relatorio_sem_cache)
+    com_cache = medir(args.relatorios, lambda dados, destino: relatorio_com_cache(dados, destino, cache))
+
+    print(f"📄 {args.relatorios} relatórios")
+    print(f"  sem cache: {sem_cache:8.3f}s ({sem_cache / args.relatorios * 1000:7.1f} ms/relatório)")
+    print(f"  com cache: {com_cache:8.3f}s ({com_cache / args.relatorios * 1000:7.1f} ms/relatório)")
+    print(f"  gráficos: {cache.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Teste de carga dos servidores do frontend (Flask e socketserver)
+Sobe os serviços locais de Google Sheets/OAuth/OpenAI, inicia cada servidor em
+um subprocesso apontado para eles (PDF em stub, benchmarks/stubs) e dispara
+/api/analyze e /relatorios/ em paralelo. Reporta RPS, latência p50/p95/p99 e
+taxa de erro; aborta se nenhum /api/analyze tiver sucesso.
+
+Uso: python benchmarks/carga.py [--servidor ambos] [--concorrencia 8] [--requisicoes 200]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.servicos_locais import ServicosLocais
+
+
+SERVIDORES = {
+    'flask': os.path.join(RAIZ, 'frontend', 'server_flask.py'),
+    'socketserver': os.path.join(RAIZ, 'frontend', 'server.py')
+}
+
+PASTA_RELATORIOS = os.path.join(RAIZ, 'relatorios')
+# Módulos que substituem a renderização do PDF no servidor (vêm antes da raiz)
+PASTA_STUBS = os.path.join(RAIZ, 'benchmarks', 'stubs')
+PDF_CARGA = '_teste_carga.pdf'
+
+# PDF mínimo servido em /relatorios/ durante o teste
+CONTEUDO_PDF = b'%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n' + b'0' * 64 * 1024
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(nome, porta, ambiente_extra):
+    """Inicia o servidor em subprocesso e aguarda responder"""
+    ambiente = dict(os.environ)
+    ambiente.update(ambiente_extra)
+    ambiente.update({
+        'PORT': str(porta),
+        'ABRIR_NAVEGADOR': '0',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+        'PYTHONPATH': os.pathsep.join(filter(None, [PASTA_STUBS, RAIZ, os.environ.get('PYTHONPATH')]))
+    })
+
+    processo = subprocess.Popen(
+        [sys.executable, SERVIDORES[nome]],
+        cwd=RAIZ, env=ambiente,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    limite = time.time() + 30
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f'Servidor {nome} terminou com código {processo.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{porta}/', timeout=1)
+            return processo
+        except requests.RequestException:
+            time.sleep(0.2)
+
+    processo.kill()
+    raise RuntimeError(f'Servidor {nome} não respondeu em 30s')
+
+
+def executar_carga(url_base, concorrencia, requisicoes, fracao_analyze, timeout):
+    """Dispara as requisições e retorna [(rota, latencia_s, ok, erro)]"""
+    resultados = []
+    lock = threading.Lock()
+    contador = itertools.count()
+    locais = threading.local()
+
+    # Sequência determinística de rotas conforme a fração de /api/analyze
+    a_cada = max(1, round(1 / fracao_analyze)) if fracao_analyze > 0 else 0
+
+    def rota_da_requisicao(indice):
+        if a_cada and indice % a_cada == 0:
+            return 'analyze'
+        return 'relatorios'
+
+    def trabalhador():
+        locais.sessao = requests.Session()
+        while True:
+            indice = next(contador)
+            if indice >= requisicoes:
+                return
+            rota = rota_da_requisicao(indice)
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                if rota == 'analyze':
+                    resposta = locais.sessao.post(
+                        f'{url_base}/api/analyze',
+                        json={
+                            'sheets_url': f'https://docs.google.com/spreadsheets/d/carga-loja-{indice % 20}/edit',
+                            'loja_nome': f'Loja {indice % 20}'
+                        },
+                        timeout=timeout
+                    )
+                    corpo = resposta.json()
+                    ok = resposta.status_code == 200 and corpo.get('success') is True
+                    if not ok:
+                        erro = f"HTTP {resposta.status_code}: {corpo.get('error')}"
+                else:
+                    resposta = locais.sessao.get(f'{url_base}/relatorios/{PDF_CARGA}', timeout=timeout)
+                    ok = resposta.status_code == 200 and len(resposta.content) == len(CONTEUDO_PDF)
+                    if not ok:
+                        erro = f"HTTP {resposta.status_code} ({len(resposta.content)} bytes)"
+            except (requests.RequestException, ValueError) as e:
+                ok = False
+                erro = str(e)
+            latencia = time.perf_counter() - inicio
+            with lock:
+                resultados.append((rota, latencia, ok, erro))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for _ in range(concorrencia):
+            executor.submit(trabalhador)
+    duracao = time.perf_counter() - inicio
+
+    return resultados, duracao
+
+
+def resumir(resultados, duracao):
+    """RPS, percentis de latência e taxa de erro por rota e no total"""
+    resumo = {}
+    grupos = {'total': resultados}
+    for rota in sorted({r[0] for r in resultados}):
+        grupos[rota] = [r for r in resultados if r[0] == rota]
+
+    for nome, itens in grupos.items():
+        if not itens:
+            continue
+        latencias = np.array([r[1] for r in itens]) * 1000
+        erros = sum(1 for r in itens if not r[2])
+        resumo[nome] = {
+            'requisicoes': len(itens),
+            'rps': round(len(itens) / duracao, 2),
+            'p50_ms': round(float(np.percentile(latencias, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencias, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencias, 99)), 1),
+            'max_ms': round(float(latencias.max()), 1),
+            'taxa_erro': round(erros / len(itens), 4)
+        }
+    return resumo
+
+
+def verificar_analyze(nome, resultados):
+    """Mostra as falhas de /api/analyze; sem nenhum sucesso, as latências só
+    medem o caminho de erro e o teste é abortado"""
+    analyze = [r for r in resultados if r[0] == 'analyze']
+    falhas = [r[3] for r in analyze if not r[2]]
+    if not falhas:
+        return
+    print(f"⚠️ {nome}: {len(falhas)}/{len(analyze)} /api/analyze falharam (primeira: {falhas[0]})")
+    if len(falhas) == len(analyze):
+        raise SystemExit(f"❌ {nome}: nenhum /api/analyze teve sucesso; resultado descartado")
+
+
+def imprimir_resumo(nome, resumo, concorrencia):
+    print()
+    print(f"🖥️  {nome} (concorrência {concorrencia})")
+    cabecalho = f"{'Rota':<12}{'Req':>7}{'RPS':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Erros':>9}"
+    print(cabecalho)
+    print('-' * len(cabecalho))
+    for rota, m in resumo.items():
+        print(f"{rota:<12}{m['requisicoes']:>7}{m['rps']:>9.1f}{m['p50_ms']:>10.1f}"
+              f"{m['p95_ms']:>10.1f}{m['p99_ms']:>10.1f}{m['taxa_erro'] * 100:>8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga dos servidores do frontend')
+    parser.add_argument('--servidor', choices=['flask', 'socketserver', 'ambos'], default='ambos')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=200)
+    parser.add_argument('--fracao-analyze', type=float, default=0.25,
+                        help='fração das requisições em /api/analyze (o resto em /relatorios/)')
+    parser.add_argument('--linhas', type=int, default=5000, help='linhas de cada planilha sintética')
+    parser.add_argument('--latencia-ms', type=int, default=0, help='latência dos serviços locais (Sheets/token)')
+    parser.add_argument('--latencia-openai-ms', type=int, default=0, help='latência da OpenAI local')
+    parser.add_argument('--taxa-429', type=float, default=0.0, help='fração de respostas 429 dos serviços locais')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--saida', help='grava o resumo em JSON')
+    args = parser.parse_args()
+
+    servicos = ServicosLocais(
+        linhas=args.linhas,
+        latencia_ms=args.latencia_ms,
+        latencia_openai_ms=args.latencia_openai_ms,
+        taxa_429=args.taxa_429
+    ).iniciar()
+    print(f"🧪 Serviços locais (Sheets/OpenAI) em {servicos.url_base}")
+
+    os.makedirs(PASTA_RELATORIOS, exist_ok=True)
+    caminho_pdf = os.path.join(PASTA_RELATORIOS, PDF_CARGA)
+    with open(caminho_pdf, 'wb') as f:
+        f.write(CONTEUDO_PDF)
+
+    nomes = ['flask', 'socketserver'] if args.servidor == 'ambos' else [args.servidor]
+    relatorio = {'parametros': vars(args), 'servidores': {}}
+
+    try:
+        for nome in nomes:
+            porta = _porta_livre()
+            print(f"🚀 Iniciando {nome} na porta {porta}...")
+            processo = iniciar_servidor(nome, porta, servicos.variaveis_ambiente())
+            try:
+                resultados, duracao = executar_carga(
+                    f'http://127.0.0.1:{porta}', args.concorrencia, args.requisicoes,
+                    args.fracao_analyze, args.timeout
+                )
+            finally:
+                processo.terminate()
+                processo.wait(timeout=10)
+
+            verificar_analyze(nome, resultados)
+            resumo = resumir(resultados, duracao)
+            relatorio['servidores'][nome] = resumo
+            imprimir_resumo(nome, resumo, args.concorrencia)
+    finally:
+        servicos.parar()
+        if os.path.exists(caminho_pdf):
+            os.remove(caminho_pdf)
+
+    relatorio['chamadas_servicos_locais'] = servicos.contagem
+    relatorio['respostas_429'] = servicos.throttled
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resumo salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
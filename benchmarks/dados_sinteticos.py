@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Gerador de planilhas NPS sintéticas
+Mesmo esquema da planilha real: Data, Nome, Loja, Vendedor, Avaliacao,
+Comentario e colunas Looker, no formato texto exportado pelo Google Sheets
+"""
+
+import numpy as np
+import pandas as pd
+
+
+COMENTARIOS_POSITIVOS = ('Ótimo atendimento', 'Recomendo', 'Vendedor muito atencioso', 'Entrega rápida')
+COMENTARIOS_NEUTROS = ('Ok', 'Poderia ser melhor', 'Demorou um pouco')
+COMENTARIOS_NEGATIVOS = ('Péssimo atendimento', 'Não recomendo', 'Produto com defeito', 'Ninguém retornou')
+
+
+def gerar_dataset(linhas=10_000, lojas=10, vendedores=80, meses=12, inicio='2024-01-01',
+                  taxa_sem_nota=0.05, taxa_sem_comentario=0.4, com_looker=True, sujo=False, seed=42):
+    """Gera planilha sintética (todas as colunas como texto)
+
+    Args:
+        linhas: número de avaliações
+        lojas: quantidade de lojas distintas
+        vendedores: quantidade de vendedores (cada um fixo em uma loja)
+        meses: meses cobertos a partir de `inicio`
+        taxa_sem_nota: fração de linhas com Avaliacao vazia
+        taxa_sem_comentario: fração de linhas com Comentario vazio
+        com_looker: inclui as colunas Looker_* calculadas a partir da nota
+        sujo: adiciona espaços extras em nomes e comentários, como na exportação real
+        seed: semente do gerador aleatório
+
+    Returns:
+        pandas.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+
+    # Datas uniformes no período, com hora
+    base = np.datetime64(inicio, 's')
+    fim = (pd.Timestamp(inicio) + pd.DateOffset(months=meses)).to_datetime64().astype('datetime64[s]')
+    segundos = rng.integers(0, int((fim - base) / np.timedelta64(1, 's')), linhas)
+    datas = pd.to_datetime(base + segundos.astype('timedelta64[s]'))
+
+    # Vendedores distribuídos entre as lojas; volume por vendedor desigual
+    nomes_lojas = np.array([f'MDO Loja {i + 1}' for i in range(lojas)], dtype=object)
+    loja_do_vendedor = rng.integers(0, lojas, vendedores)
+    pesos = rng.pareto(2.0, vendedores) + 1
+    vendedor = rng.choice(vendedores, linhas, p=pesos / pesos.sum())
+
+    # Notas concentradas no topo, como no NPS real
+    probabilidades = np.array([2, 1, 1, 2, 2, 4, 5, 8, 14, 20, 41], dtype=float)
+    notas = rng.choice(11, linhas, p=probabilidades / probabilidades.sum())
+    sem_nota = rng.random(linhas) < taxa_sem_nota
+
+    comentarios = np.where(
+        notas >= 9, _sortear(rng, COMENTARIOS_POSITIVOS, linhas),
+        np.where(notas >= 7, _sortear(rng, COMENTARIOS_NEUTROS, linhas), _sortear(rng, COMENTARIOS_NEGATIVOS, linhas))
+    ).astype(object)
+    comentarios[rng.random(linhas) < taxa_sem_comentario] = ''
+
+    nomes = np.array([f'Cliente {i}' for i in rng.integers(0, max(linhas // 2, 1), linhas)], dtype=object)
+    if sujo:
+        nomes = np.array([f' {n} ' for n in nomes], dtype=object)
+        comentarios = np.array([f'{c} ' if c else c for c in comentarios], dtype=object)
+
+    avaliacao = notas.astype(str).astype(object)
+    avaliacao[sem_nota] = ''
+
+    dados = pd.DataFrame({
+        'Data': datas.strftime('%d/%m/%Y %H:%M:%S'),
+        'Nome': nomes,
+        'Loja': nomes_lojas[loja_do_vendedor[vendedor]],
+        'Vendedor': np.array([f'Vendedor {i + 1}' for i in range(vendedores)], dtype=object)[vendedor],
+        'Avaliacao': avaliacao,
+        'Comentario': comentarios
+    })
+
+    if com_looker:
+        classificacao = np.where(notas >= 9, '🟢 Promotor', np.where(notas >= 7, '🟡 Neutro', '🔴 Detrator')).astype(object)
+        classificacao[sem_nota] = ''
+        dias = rng.integers(0, 60, linhas)
+        dados['Looker_Classificacao'] = classificacao
+        dados['Looker_Interacao_D1_D30'] = np.where((dias >= 1) & (dias <= 30), 'Sim', 'Não')
+        dados['Looker_Interacao_Outros'] = np.where(dias > 30, 'Sim', 'Não')
+        dados['Looker_Avaliou'] = np.where(sem_nota, 'Não avaliou', 'Avaliou')
+
+    return dados
+
+
+def _sortear(rng, opcoes, linhas):
+    """Sorteia `linhas` valores entre as opções"""
+    return np.array(opcoes, dtype=object)[rng.integers(0, len(opcoes), linhas)]
+
+
+def para_csv(dados, separador=','):
+    """Bytes UTF-8 no formato do export CSV/TSV do Google Sheets"""
+    return dados.to_csv(index=False, sep=separador).encode('utf-8')
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Servidores locais que substituem Google Sheets, OAuth e OpenAI em testes de desempenho
+Export CSV/TSV, Sheets API v4 (metadados, values, values:batchGet), /token
+e /v1/chat/completions, com latência, throttling (429) e tamanho de payload
+configuráveis
+
+Uso: python benchmarks/servicos_locais.py [--porta 8765] [--linhas 5000] [--latencia-ms 50] [--taxa-429 0.1]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.dados_sinteticos import gerar_dataset, para_csv
+
+
+RELATORIO_IA = (
+    "📊 Análise Pós-venda — Período\n\n"
+    "✅ Visão Geral:\n● NPS Atendimento: 0\n\n"
+    "📌 Recomendações\n1. Resposta gerada pelo servidor local de testes\n"
+)
+
+TITULO_ABA = 'Respostas'
+
+# Configuração padrão (alterável no construtor, via configurar() ou POST /_config)
+CONFIG_PADRAO = {
+    'latencia_ms': 0,            # atraso fixo de cada resposta Sheets/token
+    'jitter_ms': 0,              # atraso aleatório adicional (0..jitter_ms)
+    'latencia_openai_ms': 0,     # atraso fixo de /v1/chat/completions
+    'taxa_429': 0.0,             # fração de requisições respondidas com 429
+    'limite_rps': 0,             # requisições/s aceitas antes de 429 (0 = sem limite)
+    'retry_after_s': 1,          # valor do header Retry-After nas respostas 429
+    'linhas': 5000,              # linhas de cada planilha sintética
+    'lojas': 10,
+    'vendedores': 80,
+    'meses': 12,
+    'colunas_extras': 0,         # colunas de texto adicionais (aumenta o payload)
+    'tamanho_extra': 32,         # caracteres por célula extra
+    'tamanho_resposta_ia': 0,    # caracteres adicionais na resposta da IA
+    'expira_token_s': 3600,      # expires_in dos tokens emitidos
+    'seed': 42
+}
+
+
+class ServicosLocais:
+    """Servidor HTTP local com os endpoints externos usados pelo pipeline"""
+
+    def __init__(self, porta=0, **config):
+        self.config = dict(CONFIG_PADRAO)
+        self._lock = threading.Lock()
+        self._planilhas = {}
+        self.contagem = {}
+        self.throttled = {}
+        self._janela = (0, 0)  # (segundo, requisições no segundo)
+        self.configurar(**config)
+
+        handler = type('HandlerServicosLocais', (_HandlerServicosLocais,), {'servicos': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', porta), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def porta(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def url_base(self):
+        return f'http://127.0.0.1:{self.porta}'
+
+    def configurar(self, **config):
+        """Altera a configuração em execução (planilhas são regeradas se o tamanho mudar)"""
+        desconhecidas = set(config) - set(CONFIG_PADRAO)
+        if desconhecidas:
+            raise ValueError(f'Configurações desconhecidas: {sorted(desconhecidas)}')
+
+        with self._lock:
+            self.config.update(config)
+            self._rng = random.Random(self.config['seed'])
+            if set(config) & {'linhas', 'lojas', 'vendedores', 'meses', 'colunas_extras', 'tamanho_extra', 'seed'}:
+                self._planilhas = {}
+
+    def variaveis_ambiente(self):
+        """Variáveis que apontam o sistema NPS para este servidor"""
+        return {
+            'SHEETS_EXPORT_BASE_URL': self.url_base,
+            'SHEETS_API_BASE_URL': self.url_base,
+            'GOOGLE_TOKEN_URI': f'{self.url_base}/token',
+            'OPENAI_BASE_URL': f'{self.url_base}/v1',
+            'OPENAI_API_KEY': 'chave-local'
+        }
+
+    def iniciar(self):
+        """Sobe o servidor em thread daemon"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def planilha(self, sheet_id):
+        """Valores (cabeçalho + linhas, como texto) da planilha sintética"""
+        with self._lock:
+            if sheet_id not in self._planilhas:
+                c = self.config
+                dados = gerar_dataset(c['linhas'], c['lojas'], c['vendedores'], c['meses'],
+                                      seed=c['seed'] + sum(sheet_id.encode('utf-8')))
+                for i in range(c['colunas_extras']):
+                    dados[f'Extra_{i + 1}'] = 'x' * c['tamanho_extra']
+                self._planilhas[sheet_id] = {'dados': dados, 'valores': None, 'export': {}}
+            return self._planilhas[sheet_id]
+
+    def valores(self, sheet_id):
+        planilha = self.planilha(sheet_id)
+        if planilha['valores'] is None:
+            dados = planilha['dados']
+            planilha['valores'] = [list(dados.columns)] + dados.astype(str).values.tolist()
+        return planilha['valores']
+
+    def exportar(self, sheet_id, separador):
+        planilha = self.planilha(sheet_id)
+        if separador not in planilha['export']:
+            planilha['export'][separador] = para_csv(planilha['dados'], separador)
+        return planilha['export'][separador]
+
+    def registrar(self, rota):
+        with self._lock:
+            self.contagem[rota] = self.contagem.get(rota, 0) + 1
+
+    def deve_limitar(self, rota):
+        """Decide se a requisição recebe 429 (taxa aleatória ou limite por segundo)"""
+        with self._lock:
+            limitar = self.config['taxa_429'] > 0 and self._rng.random() < self.config['taxa_429']
+
+            if self.config['limite_rps'] > 0:
+                segundo = int(time.time())
+                inicio, quantidade = self._janela
+                quantidade = quantidade + 1 if inicio == segundo else 1
+                self._janela = (segundo, quantidade)
+                limitar = limitar or quantidade > self.config['limite_rps']
+
+            if limitar:
+                self.throttled[rota] = self.throttled.get(rota, 0) + 1
+            return limitar
+
+    def atraso(self, base_ms):
+        """Dorme a latência configurada (base + jitter)"""
+        with self._lock:
+            jitter = self._rng.uniform(0, self.config['jitter_ms']) if self.config['jitter_ms'] else 0
+        total = (base_ms + jitter) / 1000
+        if total > 0:
+            time.sleep(total)
+
+
+def _indice_coluna(letras):
+    """'A' -> 0, 'AA' -> 26"""
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - ord('A') + 1)
+    return indice - 1
+
+
+def recortar_intervalo(valores, intervalo):
+    """Aplica um intervalo A1 ("'Aba'!A2:F100", "Aba!A:C", "'Aba'") à matriz"""
+    if '!' not in intervalo:
+        return valores
+
+    celulas = intervalo.split('!', 1)[1].upper()
+    match = re.fullmatch(r'([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?', celulas)
+    if not match:
+        return []
+
+    col_ini, lin_ini, col_fim, lin_fim = match.groups()
+    lin_ini = int(lin_ini) if lin_ini else 1
+    if col_fim is None:
+        # Célula única
+        col_fim, lin_fim = col_ini, str(lin_ini)
+    lin_fim = int(lin_fim) if lin_fim else len(valores)
+    c0 = _indice_coluna(col_ini) if col_ini else 0
+    c1 = _indice_coluna(col_fim) + 1 if col_fim else None
+
+    return [linha[c0:c1] for linha in valores[lin_ini - 1:lin_fim]]
+
+
+class _HandlerServicosLocais(BaseHTTPRequestHandler):
+    servicos = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, status, corpo, tipo, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _json(self, status, dados, headers=None):
+        self._responder(status, json.dumps(dados, ensure_ascii=False).encode('utf-8'), 'application/json', headers)
+
+    def _limitado(self, rota, latencia_ms):
+        """Registra a rota, aplica latência e responde 429 se for o caso"""
+        self.servicos.registrar(rota)
+        self.servicos.atraso(latencia_ms)
+        if self.servicos.deve_limitar(rota):
+            self._json(429, {'error': {'code': 429, 'message': 'Rate limit exceeded', 'status': 'RESOURCE_EXHAUSTED'}},
+                       {'Retry-After': str(self.servicos.config['retry_after_s'])})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        config = self.servicos.config
+
+        match = re.match(r'^/spreadsheets/d/([^/]+)/export$', url.path)
+        if match:
+            if self._limitado('sheets_export', config['latencia_ms']):
+                return
+            formato = parse_qs(url.query).get('format', ['csv'])[0]
+            separador = '\t' if formato == 'tsv' else ','
+            self._responder(200, self.servicos.exportar(match.group(1), separador), 'text/csv; charset=utf-8')
+            return
+
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)/values:batchGet$', url.path)
+        if match:
+            if self._limitado('sheets_batch_get', config['latencia_ms']):
+                return
+            valores = self.servicos.valores(match.group(1))
+            intervalos = parse_qs(url.query).get('ranges', [])
+            self._json(200, {
+                'spreadsheetId': match.group(1),
+                'valueRanges': [self._value_range(intervalo, valores) for intervalo in intervalos]
+            })
+            return
+
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)/values/(.+)$', url.path)
+        if match:
+            if self._limitado('sheets_values', config['latencia_ms']):
+                return
+            valores = self.servicos.valores(match.group(1))
+            self._json(200, self._value_range(unquote(match.group(2)), valores))
+            return
+
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)$', url.path)
+        if match:
+            if self._limitado('sheets_metadata', config['latencia_ms']):
+                return
+            valores = self.servicos.valores(match.group(1))
+            self._json(200, {
+                'spreadsheetId': match.group(1),
+                'properties': {'title': f'Planilha {match.group(1)}', 'locale': 'pt_BR', 'timeZone': 'America/Sao_Paulo'},
+                'sheets': [{
+                    'properties': {
+                        'sheetId': 0,
+                        'title': TITULO_ABA,
+                        'index': 0,
+                        'sheetType': 'GRID',
+                        'gridProperties': {'rowCount': len(valores), 'columnCount': len(valores[0])}
+                    }
+                }]
+            })
+            return
+
+        self._responder(404, b'nao encontrado', 'text/plain')
+
+    def _value_range(self, intervalo, valores):
+        recorte = recortar_intervalo(valores, intervalo)
+        resposta = {'range': intervalo, 'majorDimension': 'ROWS'}
+        if recorte:
+            resposta['values'] = recorte
+        return resposta
+
+    def do_POST(self):
+        tamanho = int(self.headers.get('Content-Length', 0) or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b''
+        caminho = urlparse(self.path).path
+        config = self.servicos.config
+
+        if caminho == '/_config':
+            try:
+                self.servicos.configurar(**json.loads(corpo or b'{}'))
+            except (ValueError, TypeError) as e:
+                self._json(400, {'erro': str(e)})
+                return
+            self._json(200, self.servicos.config)
+            return
+
+        if caminho == '/token':
+            if self._limitado('token', config['latencia_ms']):
+                return
+            self._json(200, {
+                'access_token': f'token-local-{time.time_ns()}',
+                'expires_in': config['expira_token_s'],
+                'token_type': 'Bearer',
+                'scope': 'https://www.googleapis.com/auth/spreadsheets.readonly'
+            })
+            return
+
+        if caminho == '/v1/chat/completions':
+            if self._limitado('openai_chat', config['latencia_openai_ms']):
+                return
+            try:
+                modelo = json.loads(corpo or b'{}').get('model', 'gpt-4o')
+            except ValueError:
+                modelo = 'gpt-4o'
+
+            conteudo = RELATORIO_IA + '.' * config['tamanho_resposta_ia']
+            self._json(200, {
+                'id': 'chatcmpl-local',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': modelo,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': conteudo},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': len(corpo) // 4, 'completion_tokens': len(conteudo) // 4,
+                          'total_tokens': (len(corpo) + len(conteudo)) // 4}
+            })
+            return
+
+        self._json(404, {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidores locais de Google Sheets, OAuth e OpenAI')
+    parser.add_argument('--porta', type=int, default=8765)
+    for nome, valor in CONFIG_PADRAO.items():
+        parser.add_argument('--' + nome.replace('_', '-'), type=type(valor), default=valor)
+    args = parser.parse_args()
+
+    config = {nome: getattr(args, nome) for nome in CONFIG_PADRAO}
+    servicos = ServicosLocais(args.porta, **config)
+    print(f"🧪 Serviços locais em {servicos.url_base}")
+    for nome, valor in servicos.variaveis_ambiente().items():
+        print(f"   export {nome}={valor}")
+
+    try:
+        servicos.httpd.serve_forever()
+    except KeyboardInterrupt:
+        servicos.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Stub do gerador de PDF executivo para o teste de carga
+benchmarks/carga.py põe esta pasta no PYTHONPATH do servidor (e dos workers
+de renderização), como o _GeradorPDFStub do bench_pipeline: mede o servidor
+sem renderizar o PDF.
+"""
+
+import os
+
+
+class GeradorPDFExecutivoSimples:
+    """Substitui GeradorPDFExecutivoSimples sem renderizar"""
+
+    def gerar_pdf_executivo_simples(self, dados_pdf, loja_nome):
+        return os.path.join('relatorios', 'benchmark.pdf')
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Stub do gerador de relatório PDF completo para o teste de carga
+Usado pelo servidor socketserver; mesma função do stub executivo ao lado.
+"""
+
+import os
+
+
+class GeradorRelatorioPDF:
+    """Substitui GeradorRelatorioPDF sem renderizar"""
+
+    def __init__(self, metricas):
+        self.metricas = metricas
+
+    def gerar_relatorio_completo(self, titulo):
+        return True
+
+    def salvar_pdf(self, nome_arquivo):
+        return os.path.join('relatorios', nome_arquivo)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Cache de renderização dos relatórios PDF
+Fontes e estilos ReportLab registrados uma vez por processo, gráficos
+matplotlib memoizados pelos dados de entrada (em memória e em disco, com limite
+de tamanho e idade) e fragmentos estáticos reutilizados.
+Com o prazo da requisição curto, gráficos fora do cache saem em resolução
+menor; com o prazo esgotado, viram espaço em branco no PDF.
+"""
+
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from instrumentacao import medir_etapa
+from prazo import prazo_esgotado, tem_tempo
+
+logger = logging.getLogger(__name__)
+
+
+# Gráficos mantidos em memória (LRU) e pasta do cache em disco ('' desativa)
+MAX_GRAFICOS_MEMORIA = int(os.environ.get('CACHE_GRAFICOS_MAX', '256'))
+PASTA_CACHE_GRAFICOS = os.environ.get('CACHE_GRAFICOS_DIR', os.path.join('cache', 'graficos'))
+# Limites do cache em disco (0 = sem limite): tamanho total e idade sem uso;
+# acima do tamanho, saem os PNGs usados há mais tempo
+MAX_MB_DISCO = float(os.environ.get('CACHE_GRAFICOS_DISCO_MB', '200'))
+VALIDADE_DIAS_DISCO = float(os.environ.get('CACHE_GRAFICOS_DISCO_DIAS', '30'))
+# Varredura dos PNGs vencidos mesmo sem atingir o tamanho máximo (s)
+INTERVALO_PODA_DISCO = 3600
+DPI_PADRAO = 150
+# Resolução dos gráficos renderizados com o prazo curto
+DPI_RAPIDO = 72
+# Duração presumida (s) de um gráfico antes da primeira medida
+TEMPO_GRAFICO_PADRAO = 1
+
+# Fontes TTF distribuídas com o matplotlib (acentos e símbolos)
+FONTES_TTF = {
+    'DejaVuSans': 'DejaVuSans.ttf',
+    'DejaVuSans-Bold': 'DejaVuSans-Bold.ttf'
+}
+
+_lock_fontes = threading.Lock()
+_fontes_registradas = None
+
+
+def registrar_fontes():
+    """Registra as fontes TTF no ReportLab uma única vez por processo
+
+    Returns:
+        tuple: nomes das fontes registradas (vazio se indisponíveis)
+    """
+    global _fontes_registradas
+
+    if _fontes_registradas is not None:
+        return _fontes_registradas
+
+    with _lock_fontes:
+        if _fontes_registradas is not None:
+            return _fontes_registradas
+
+        registradas = []
+        try:
+            import matplotlib
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            from reportlab.lib.fonts import addMapping
+
+            pasta = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf')
+            for nome, arquivo in FONTES_TTF.items():
+                caminho = os.path.join(pasta, arquivo)
+                if os.path.exists(caminho):
+                    pdfmetrics.registerFont(TTFont(nome, caminho))
+                    registradas.append(nome)
+
+            if len(registradas) == len(FONTES_TTF):
+                addMapping('DejaVuSans', 0, 0, 'DejaVuSans')
+                addMapping('DejaVuSans', 1, 0, 'DejaVuSans-Bold')
+
+        except Exception as e:
+            logger.warning("⚠️ Fontes TTF indisponíveis, usando Helvetica: %s", e)
+            registradas = []
+
+        _fontes_registradas = tuple(registradas)
+        return _fontes_registradas
+
+
+def fonte_padrao():
+    """(fonte normal, fonte negrito) para os estilos dos relatórios"""
+    if len(registrar_fontes()) == len(FONTES_TTF):
+        return 'DejaVuSans', 'DejaVuSans-Bold'
+    return 'Helvetica', 'Helvetica-Bold'
+
+
+@lru_cache(maxsize=None)
+def _criar_estilos(fonte, fonte_negrito):
+    """StyleSheet base + estilos dos relatórios NPS"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    estilos = getSampleStyleSheet()
+    for nome in ('Normal', 'BodyText', 'Title', 'Heading1', 'Heading2', 'Heading3'):
+        estilos[nome].fontName = fonte_negrito if nome.startswith(('Title', 'Heading')) else fonte
+
+    estilos.add(ParagraphStyle('TituloRelatorio', parent=estilos['Title'], fontName=fonte_negrito,
+                               fontSize=22, leading=26, alignment=TA_CENTER,
+                               textColor=colors.HexColor('#1f3b57'), spaceAfter=12))
+    estilos.add(ParagraphStyle('Subtitulo', parent=estilos['Heading2'], fontName=fonte_negrito,
+                               fontSize=14, leading=18, textColor=colors.HexColor('#2c5282'), spaceAfter=8))
+    estilos.add(ParagraphStyle('Corpo', parent=estilos['BodyText'], fontName=fonte,
+                               fontSize=10, leading=14))
+    estilos.add(ParagraphStyle('Destaque', parent=estilos['BodyText'], fontName=fonte_negrito,
+                               fontSize=12, leading=16, textColor=colors.HexColor('#2f855a')))
+    estilos.add(ParagraphStyle('Rodape', parent=estilos['BodyText'], fontName=fonte,
+                               fontSize=8, leading=10, alignment=TA_CENTER, textColor=colors.grey))
+    return estilos
+
+
+def estilos_pdf():
+    """StyleSheet compartilhado pelo processo (não altere os estilos retornados)"""
+    return _criar_estilos(*fonte_padrao())
+
+
+class CacheGraficos:
+    """PNGs de gráficos matplotlib memoizados pelos dados de entrada"""
+
+    def __init__(self, max_itens=MAX_GRAFICOS_MEMORIA, pasta=PASTA_CACHE_GRAFICOS,
+                 max_mb_disco=MAX_MB_DISCO, validade_dias_disco=VALIDADE_DIAS_DISCO):
+        self.max_itens = max_itens
+        self.pasta = pasta
+        self.max_bytes_disco = int(max_mb_disco * 1024 * 1024)
+        self.validade_disco = validade_dias_disco * 86400
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes em disco estimados desde a última varredura (None = não varrido)
+        self._bytes_disco = None
+        self._ultima_poda = 0
+        self.acertos = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(tipo, dados, opcoes):
+        """Hash estável de (tipo, dados, opções)"""
+        conteudo = json.dumps({'tipo': tipo, 'dados': dados, 'opcoes': opcoes},
+                              sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def obter(self, tipo, dados, renderizar, dpi=DPI_PADRAO, pular_sem_prazo=False, **opcoes):
+        """Retorna o PNG (bytes) do gráfico, renderizando só na primeira vez
+
+        Args:
+            tipo: nome do gráfico (ex.: 'distribuicao_notas')
+            dados: dados serializáveis em JSON que definem o gráfico
+            renderizar: função(dados, **opcoes) -> matplotlib Figure
+            dpi: resolução do PNG
+            pular_sem_prazo: com o prazo esgotado, retorna None em vez de renderizar
+        """
+        chave = self.chave(tipo, dados, dict(opcoes, dpi=dpi))
+
+        with self._lock:
+            png = self._itens.get(chave)
+            if png is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return png
+
+        png = self._ler_disco(chave)
+        do_disco = png is not None
+        if png is None:
+            if pular_sem_prazo and prazo_esgotado():
+                return None
+            # Prazo curto: renderização mais barata, em resolução menor
+            if dpi > DPI_RAPIDO and not tem_tempo('grafico', TEMPO_GRAFICO_PADRAO):
+                return self.obter(tipo, dados, renderizar, dpi=DPI_RAPIDO, **opcoes)
+            with medir_etapa('grafico'):
+                png = _figura_para_png(renderizar(dados, **opcoes), dpi)
+            self._gravar_disco(chave, png)
+
+        with self._lock:
+            if do_disco:
+                self.acertos_disco += 1
+            else:
+                self.falhas += 1
+            self._itens[chave] = png
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+        return png
+
+    def imagem(self, tipo, dados, renderizar, largura, altura, **opcoes):
+        """Flowable ReportLab Image com o gráfico memoizado (Spacer se o prazo esgotou)"""
+        from reportlab.platypus import Image, Spacer
+        png = self.obter(tipo, dados, renderizar, pular_sem_prazo=True, **opcoes)
+        if png is None:
+            return Spacer(largura, altura)
+        return Image(io.BytesIO(png), width=largura, height=altura)
+
+    def _ler_disco(self, chave):
+        if not self.pasta:
+            return None
+        caminho = os.path.join(self.pasta, f'{chave}.png')
+        try:
+            if self.validade_disco and time.time() - os.path.getmtime(caminho) > self.validade_disco:
+                os.remove(caminho)
+                return None
+            with open(caminho, 'rb') as f:
+                png = f.read()
+            # mtime marca o último uso (ordem de remoção da poda)
+            os.utime(caminho)
+            return png
+        except OSError:
+            return None
+
+    def _gravar_disco(self, chave, png):
+        if not self.pasta:
+            return
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            temporario = os.path.join(self.pasta, f'{chave}.{os.getpid()}.tmp')
+            with open(temporario, 'wb') as f:
+                f.write(png)
+            os.replace(temporario, os.path.join(self.pasta, f'{chave}.png'))
+        except OSError as e:
+            logger.warning("⚠️ Erro ao gravar gráfico em cache: %s", e)
+            return
+
+        with self._lock:
+            if self._bytes_disco is not None:
+                self._bytes_disco += len(png)
+            podar = (self._bytes_disco is None
+                     or (self.max_bytes_disco and self._bytes_disco > self.max_bytes_disco)
+                     or time.time() - self._ultima_poda > INTERVALO_PODA_DISCO)
+            if podar:
+                self._ultima_poda = time.time()
+        if podar:
+            self._podar_disco()
+
+    def _podar_disco(self):
+        """Remove os PNGs vencidos e, acima do tamanho máximo, os usados há mais tempo
+
+        Vários processos podem usar a mesma pasta: cada um recalcula o total
+        na varredura.
+        """
+        arquivos = []
+        try:
+            with os.scandir(self.pasta) as entradas:
+                for entrada in entradas:
+                    if not entrada.name.endswith('.png'):
+                        continue
+                    try:
+                        info = entrada.stat()
+                    except OSError:
+                        continue
+                    arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        except OSError as e:
+            logger.warning("⚠️ Erro ao varrer cache de gráficos: %s", e)
+            return
+
+        arquivos.sort()
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        agora = time.time()
+        removidos = 0
+        for modificado, tamanho, caminho in arquivos:
+            vencido = self.validade_disco and agora - modificado > self.validade_disco
+            excedido = self.max_bytes_disco and total > self.max_bytes_disco
+            if not (vencido or excedido):
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            removidos += 1
+
+        with self._lock:
+            self._bytes_disco = total
+        if removidos:
+            logger.debug("🧹 %s gráfico(s) removido(s) do cache em disco (%.1f MB)", removidos, total / 1024 / 1024)
+
+    def estatisticas(self):
+        with self._lock:
+            return {'itens': len(self._itens), 'acertos': self.acertos,
+                    'acertos_disco': self.acertos_disco, 'falhas': self.falhas}
+
+    def limpar(self):
+        """Esvazia o cache em memória (o cache em disco é mantido)"""
+        with self._lock:
+            self._itens.clear()
+
+
+def _figura_para_png(figura, dpi):
+    """Salva a figura em PNG e libera a memória do matplotlib"""
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+
+    import matplotlib.pyplot as plt
+    plt.close(figura)
+    return buffer.getvalue()
+
+
+# Cache único do processo
+cache_graficos = CacheGraficos()
+
+_fragmentos = {}
+_lock_fragmentos = threading.Lock()
+
+
+def grafico_png(tipo, dados, renderizar, **opcoes):
+    """Atalho para cache_graficos.obter"""
+    return cache_graficos.obter(tipo, dados, renderizar, **opcoes)
+
+
+def fragmento_estatico(chave, construir):
+    """Flowables que não dependem dos dados (capa, legendas, rodapé, metodologia)
+
+    A lista é construída uma vez por chave; cada chamada recebe cópias
+    rasas, pois o ReportLab guarda o estado de layout (wrap/split) em cada
+    flowable. Os parágrafos já interpretados são compartilhados.
+
+    Args:
+        chave: identifica o fragmento (inclua o que muda o conteúdo, ex.: estilo)
+        construir: função() -> lista de flowables
+    """
+    with _lock_fragmentos:
+        fragmento = _fragmentos.get(chave)
+        if fragmento is None:
+            fragmento = list(construir())
+            _fragmentos[chave] = fragmento
+
+    return [copy.copy(flowable) for flowable in fragmento]
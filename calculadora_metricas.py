@@ -10,170 +10,178 @@ import numpy as np
 from datetime import datetime, timedelta
 import openai
 import json
+import logging
 import os
-from looker_formulas import LookerFormulas
+from instrumentacao import etapa_metodo, medir_etapa
+from agregados_nps import CuboNPS, caminho_cubo
+from motor_looker import MotorLooker
+from historico_nps import abrir_historico
+from prazo import tem_tempo, timeout_prazo, verificar_prazo
+
+logger = logging.getLogger(__name__)
+
+# Duração presumida (s) das etapas opcionais antes da primeira medida
+TEMPO_IA_PADRAO = 30
+TEMPO_LOOKER_PADRAO = 2
 
 
 class CalculadoraMetricas:
     """Classe para calcular métricas NPS"""
     
-    def __init__(self, dados):
+    def __init__(self, dados=None, cubo=None, origem=None):
         """
         Inicializa calculadora com dados
         
         Args:
             dados: DataFrame com dados NPS
+            cubo: CuboNPS já construído (dispensa as linhas nas métricas de contagem)
+            origem: ID da planilha ou caminho do arquivo; se informado, o cubo
+                construído a partir de `dados` é salvo ao lado do dataset
         """
         self.dados = dados
         self.metricas = {}
+        self.origem = origem
+        self._cubo = cubo
+        self._motor_looker = None
+        self._dados_looker = None
         
         # Configura OpenAI - use variável de ambiente OPENAI_API_KEY
         self.openai_client = openai.OpenAI(
             api_key=os.environ.get('OPENAI_API_KEY', 'your_openai_api_key_here')
         )
     
+    @classmethod
+    def do_historico(cls, origem, meses=None, lojas=None, desde=None, ate=None):
+        """
+        Calculadora sobre o histórico em disco da planilha
+        
+        Lê só as partições (mês e, se particionado, loja) da consulta.
+        
+        Args:
+            origem: ID da planilha
+            meses: meses 'AAAA-MM'; desde/ate: intervalo de meses
+            lojas: nomes de loja
+            
+        Returns:
+            CalculadoraMetricas ou None se o histórico não tem essas partições
+        """
+        historico = abrir_historico(origem)
+        if historico is None:
+            return None
+        
+        with medir_etapa('historico'):
+            dados = historico.carregar(meses=meses, lojas=lojas, desde=desde, ate=ate)
+        if dados is None or len(dados) == 0:
+            return None
+        
+        # Recorte não é a planilha inteira: o cubo não substitui o salvo
+        completo = meses is None and lojas is None and desde is None and ate is None
+        return cls(dados, origem=origem if completo else None)
+    
+    @property
+    def cubo(self):
+        """Cubo de contagens; as linhas são percorridas uma única vez"""
+        if self._cubo is None and self.dados is not None:
+            with medir_etapa('cubo', linhas=len(self.dados)):
+                self._cubo = CuboNPS.de_dados(self.dados)
+            if self.origem:
+                try:
+                    self._cubo.salvar(caminho_cubo(self.origem))
+                except OSError as e:
+                    logger.warning("⚠️ Erro ao salvar cubo NPS: %s", e)
+        return self._cubo
+    
+    @property
+    def motor_looker(self):
+        """Fórmulas Looker compiladas sobre as colunas (sem copiar os dados)"""
+        if self._motor_looker is None and self.dados is not None:
+            self._motor_looker = MotorLooker(self.dados)
+        return self._motor_looker
+    
+    @property
+    def dados_looker(self):
+        """Dados com as colunas Looker, materializados na primeira leitura
+        
+        Ficam só na calculadora: self.metricas guarda apenas o resumo.
+        """
+        if self._dados_looker is None and self.motor_looker is not None:
+            self._dados_looker = self.motor_looker.enriquecer()
+        return self._dados_looker
+    
+    @etapa_metodo('calcular_metricas_gerais')
     def calcular_metricas_gerais(self):
         """Calcula métricas gerais do dashboard"""
         try:
-            print("📊 Calculando métricas gerais...")
+            logger.debug("📊 Calculando métricas gerais...")
             
-            # Total de vendedores únicos
-            total_vendedores = 0
-            if 'Vendedor' in self.dados.columns:
-                total_vendedores = self.dados['Vendedor'].nunique()
+            self.metricas['gerais'] = self.cubo.metricas_gerais()
+            total_vendedores = self.metricas['gerais']['total_vendedores']
+            total_avaliacoes = self.metricas['gerais']['total_avaliacoes']
+            nota_media = self.metricas['gerais']['nota_media']
             
-            # Total de avaliações
-            total_avaliacoes = len(self.dados)
-            
-            # Nota média geral
-            nota_media = 0
-            if 'Avaliacao' in self.dados.columns:
-                nota_media = self.dados['Avaliacao'].mean()
-            
-            self.metricas['gerais'] = {
-                'total_vendedores': total_vendedores,
-                'total_avaliacoes': total_avaliacoes,
-                'nota_media': nota_media
-            }
-            
-            print(f"✅ Vendedores: {total_vendedores} | Avaliações: {total_avaliacoes} | Nota: {nota_media:.2f}")
+            logger.debug("✅ Vendedores: %s | Avaliações: %s | Nota: %.2f", total_vendedores, total_avaliacoes, nota_media)
             return self.metricas['gerais']
             
         except Exception as e:
-            print(f"❌ Erro nas métricas gerais: {str(e)}")
+            logger.error("❌ Erro nas métricas gerais: %s", e)
             return {}
     
+    @etapa_metodo('calcular_nps_por_loja')
     def calcular_nps_por_loja(self):
         """Calcula NPS por loja (ranking)"""
         try:
-            print("🏪 Calculando NPS por loja...")
+            logger.debug("🏪 Calculando NPS por loja...")
             
-            if 'Loja' not in self.dados.columns or 'Avaliacao' not in self.dados.columns:
-                print("⚠️ Colunas Loja ou Avaliacao não encontradas")
+            if 'Loja' not in self.cubo.colunas or 'Avaliacao' not in self.cubo.colunas:
+                logger.warning("⚠️ Colunas Loja ou Avaliacao não encontradas")
                 return []
             
-            ranking_lojas = []
-            
-            for loja in self.dados['Loja'].unique():
-                dados_loja = self.dados[self.dados['Loja'] == loja]
-                
-                if len(dados_loja) > 0:
-                    # Calcula NPS
-                    nps_info = self._calcular_nps_detalhado(dados_loja['Avaliacao'])
-                    
-                    ranking_lojas.append({
-                        'loja': loja,
-                        'total_avaliacoes': len(dados_loja),
-                        'nota_media': dados_loja['Avaliacao'].mean(),
-                        'nps_score': nps_info['nps_score'],
-                        'promotores': nps_info['promotores'],
-                        'neutros': nps_info['neutros'],
-                        'detratores': nps_info['detratores'],
-                        'pct_promotores': nps_info['pct_promotores'],
-                        'pct_neutros': nps_info['pct_neutros'],
-                        'pct_detratores': nps_info['pct_detratores']
-                    })
-            
-            # Ordena por NPS
-            ranking_lojas = sorted(ranking_lojas, key=lambda x: x['nps_score'], reverse=True)
+            # Ranking ordenado por NPS a partir do cubo
+            ranking_lojas = self.cubo.ranking('Loja')
             
             self.metricas['ranking_lojas'] = ranking_lojas
             
-            print(f"✅ NPS calculado para {len(ranking_lojas)} lojas")
+            logger.debug("✅ NPS calculado para %s lojas", len(ranking_lojas))
             return ranking_lojas
             
         except Exception as e:
-            print(f"❌ Erro no NPS por loja: {str(e)}")
+            logger.error("❌ Erro no NPS por loja: %s", e)
             return []
     
+    @etapa_metodo('calcular_nps_por_vendedor')
     def calcular_nps_por_vendedor(self):
         """Calcula NPS por vendedor"""
         try:
-            print("👤 Calculando NPS por vendedor...")
+            logger.debug("👤 Calculando NPS por vendedor...")
             
-            if 'Vendedor' not in self.dados.columns or 'Avaliacao' not in self.dados.columns:
-                print("⚠️ Colunas Vendedor ou Avaliacao não encontradas")
+            if 'Vendedor' not in self.cubo.colunas or 'Avaliacao' not in self.cubo.colunas:
+                logger.warning("⚠️ Colunas Vendedor ou Avaliacao não encontradas")
                 return []
             
-            ranking_vendedores = []
-            
-            for vendedor in self.dados['Vendedor'].unique():
-                dados_vendedor = self.dados[self.dados['Vendedor'] == vendedor]
-                
-                if len(dados_vendedor) > 0:
-                    # Calcula NPS
-                    nps_info = self._calcular_nps_detalhado(dados_vendedor['Avaliacao'])
-                    
-                    # Loja do vendedor (mais comum)
-                    loja_vendedor = "N/A"
-                    if 'Loja' in self.dados.columns:
-                        loja_vendedor = dados_vendedor['Loja'].mode().iloc[0] if len(dados_vendedor['Loja'].mode()) > 0 else "N/A"
-                    
-                    ranking_vendedores.append({
-                        'vendedor': vendedor,
-                        'loja': loja_vendedor,
-                        'total_avaliacoes': len(dados_vendedor),
-                        'nota_media': dados_vendedor['Avaliacao'].mean(),
-                        'nps_score': nps_info['nps_score'],
-                        'promotores': nps_info['promotores'],
-                        'neutros': nps_info['neutros'],
-                        'detratores': nps_info['detratores'],
-                        'pct_promotores': nps_info['pct_promotores'],
-                        'pct_neutros': nps_info['pct_neutros'],
-                        'pct_detratores': nps_info['pct_detratores']
-                    })
-            
-            # Ordena por NPS
-            ranking_vendedores = sorted(ranking_vendedores, key=lambda x: x['nps_score'], reverse=True)
+            # Ranking ordenado por NPS; loja = a mais comum do vendedor
+            ranking_vendedores = self.cubo.ranking('Vendedor')
             
             self.metricas['ranking_vendedores'] = ranking_vendedores
             
-            print(f"✅ NPS calculado para {len(ranking_vendedores)} vendedores")
+            logger.debug("✅ NPS calculado para %s vendedores", len(ranking_vendedores))
             return ranking_vendedores
             
         except Exception as e:
-            print(f"❌ Erro no NPS por vendedor: {str(e)}")
+            logger.error("❌ Erro no NPS por vendedor: %s", e)
             return []
     
+    @etapa_metodo('calcular_distribuicao_notas')
     def calcular_distribuicao_notas(self):
         """Calcula distribuição de notas (8, 9, 10)"""
         try:
-            print("📈 Calculando distribuição de notas...")
+            logger.debug("📈 Calculando distribuição de notas...")
             
-            if 'Avaliacao' not in self.dados.columns:
-                print("⚠️ Coluna Avaliacao não encontrada")
+            if 'Avaliacao' not in self.cubo.colunas:
+                logger.warning("⚠️ Coluna Avaliacao não encontrada")
                 return {}
             
             # Conta cada nota
-            distribuicao = {}
-            for nota in range(0, 11):
-                count = len(self.dados[self.dados['Avaliacao'] == nota])
-                porcentagem = (count / len(self.dados)) * 100 if len(self.dados) > 0 else 0
-                
-                distribuicao[nota] = {
-                    'count': count,
-                    'porcentagem': porcentagem
-                }
+            distribuicao = self.cubo.distribuicao_notas()
             
             # Destaque para notas altas (8, 9, 10)
             notas_altas = {
@@ -185,31 +193,32 @@ class CalculadoraMetricas:
             self.metricas['distribuicao_notas'] = distribuicao
             self.metricas['notas_altas'] = notas_altas
             
-            print(f"✅ Distribuição calculada - Nota 10: {distribuicao[10]['count']} ({distribuicao[10]['porcentagem']:.1f}%)")
+            logger.debug("✅ Distribuição calculada - Nota 10: %s (%.1f%%)", distribuicao[10]['count'], distribuicao[10]['porcentagem'])
             return distribuicao
             
         except Exception as e:
-            print(f"❌ Erro na distribuição: {str(e)}")
+            logger.error("❌ Erro na distribuição: %s", e)
             return {}
     
+    @etapa_metodo('calcular_percentuais_nps')
     def calcular_percentuais_nps(self):
         """Calcula % Promotores/Neutros/Detratores"""
         try:
-            print("🎯 Calculando percentuais NPS...")
+            logger.debug("🎯 Calculando percentuais NPS...")
             
-            if 'Avaliacao' not in self.dados.columns:
-                print("⚠️ Coluna Avaliacao não encontrada")
+            if 'Avaliacao' not in self.cubo.colunas:
+                logger.warning("⚠️ Coluna Avaliacao não encontrada")
                 return {}
             
-            nps_info = self._calcular_nps_detalhado(self.dados['Avaliacao'])
+            nps_info = self.cubo.percentuais_nps()
             
             self.metricas['percentuais_nps'] = nps_info
             
-            print(f"✅ Promotores: {nps_info['pct_promotores']:.1f}% | Neutros: {nps_info['pct_neutros']:.1f}% | Detratores: {nps_info['pct_detratores']:.1f}%")
+            logger.debug("✅ Promotores: %.1f%% | Neutros: %.1f%% | Detratores: %.1f%%", nps_info['pct_promotores'], nps_info['pct_neutros'], nps_info['pct_detratores'])
             return nps_info
             
         except Exception as e:
-            print(f"❌ Erro nos percentuais: {str(e)}")
+            logger.error("❌ Erro nos percentuais: %s", e)
             return {}
     
     def _calcular_nps_detalhado(self, avaliacoes):
@@ -252,13 +261,14 @@ class CalculadoraMetricas:
             }
             
         except Exception as e:
-            print(f"❌ Erro no cálculo NPS: {str(e)}")
+            logger.error("❌ Erro no cálculo NPS: %s", e)
             return {}
     
     def calcular_todas_metricas(self):
         """Calcula todas as métricas do dashboard"""
         try:
-            print("🎯 Calculando todas as métricas...")
+            logger.debug("🎯 Calculando todas as métricas...")
+            verificar_prazo('calcular')
             
             # Calcula cada grupo de métricas
             self.calcular_metricas_gerais()
@@ -274,19 +284,32 @@ class CalculadoraMetricas:
             self.gerar_insights_automaticos()
             
             # NOVA FUNCIONALIDADE: Métricas Looker + IA Analytics
-            self.calcular_metricas_looker()
+            # (opcionais: puladas quando o prazo da requisição está curto)
+            verificar_prazo('calcular')
+            if tem_tempo('looker', TEMPO_LOOKER_PADRAO):
+                self.calcular_metricas_looker()
+            else:
+                self._registrar_degradacao('looker', 'omitida')
             
-            print("✅ Todas as métricas calculadas com sucesso!")
-            print("   📊 Métricas tradicionais: ✅")
-            print("   🔍 Métricas Looker: ✅")
-            print("   🤖 Análise IA Analytics: ✅")
+            # Resultado vai para PDFs, caches e respostas: só tipos JSON
+            self.metricas = _resumo_serializavel(self.metricas)
+            
+            logger.info("✅ Todas as métricas calculadas com sucesso!")
+            logger.debug("   📊 Métricas tradicionais: ✅")
+            logger.debug("   🔍 Métricas Looker: ✅")
+            logger.debug("   🤖 Análise IA Analytics: ✅")
             
             return self.metricas
             
         except Exception as e:
-            print(f"❌ Erro no cálculo geral: {str(e)}")
+            logger.error("❌ Erro no cálculo geral: %s", e)
             return {}
     
+    def _registrar_degradacao(self, etapa, modo):
+        """Anota etapa opcional pulada ou servida do cache por causa do prazo"""
+        logger.info("⏱️ Prazo curto: %s %s", etapa, modo)
+        self.metricas.setdefault('degradacao', {})[etapa] = modo
+    
     def obter_resumo(self):
         """Obtém resumo das métricas para o header"""
         try:
@@ -301,13 +324,14 @@ class CalculadoraMetricas:
             return resumo
             
         except Exception as e:
-            print(f"❌ Erro no resumo: {str(e)}")
+            logger.error("❌ Erro no resumo: %s", e)
             return {}
     
+    @etapa_metodo('calcular_resumo_executivo')
     def calcular_resumo_executivo(self):
         """Calcula resumo executivo detalhado"""
         try:
-            print("📊 Calculando resumo executivo...")
+            logger.debug("📊 Calculando resumo executivo...")
             
             # Métricas gerais
             gerais = self.metricas.get('gerais', {})
@@ -328,76 +352,30 @@ class CalculadoraMetricas:
             
             self.metricas['resumo_executivo'] = resumo_exec
             
-            print(f"✅ Resumo executivo: NPS {resumo_exec['nps_score_geral']:.1f}")
+            logger.debug("✅ Resumo executivo: NPS %.1f", resumo_exec['nps_score_geral'])
             return resumo_exec
             
         except Exception as e:
-            print(f"❌ Erro no resumo executivo: {str(e)}")
+            logger.error("❌ Erro no resumo executivo: %s", e)
             return {}
     
     def _calcular_comparacao_mensal(self):
         """Calcula comparação com mês anterior"""
         try:
-            if 'Data' not in self.dados.columns:
-                return None
-                
-            # Converte datas
-            self.dados['Data'] = pd.to_datetime(self.dados['Data'], errors='coerce')
-            dados_com_data = self.dados.dropna(subset=['Data'])
-            
-            if len(dados_com_data) == 0:
-                return None
-            
-            # Mês atual e anterior
-            data_max = dados_com_data['Data'].max()
-            mes_atual = data_max.month
-            ano_atual = data_max.year
-            
-            # Calcula mês anterior
-            if mes_atual == 1:
-                mes_anterior = 12
-                ano_anterior = ano_atual - 1
-            else:
-                mes_anterior = mes_atual - 1
-                ano_anterior = ano_atual
-            
-            # Filtra dados por mês
-            dados_mes_atual = dados_com_data[
-                (dados_com_data['Data'].dt.month == mes_atual) & 
-                (dados_com_data['Data'].dt.year == ano_atual)
-            ]
-            
-            dados_mes_anterior = dados_com_data[
-                (dados_com_data['Data'].dt.month == mes_anterior) & 
-                (dados_com_data['Data'].dt.year == ano_anterior)
-            ]
-            
-            if len(dados_mes_atual) == 0 or len(dados_mes_anterior) == 0:
+            if 'Data' not in self.cubo.colunas:
                 return None
             
-            # Calcula NPS de cada mês
-            nps_atual = self._calcular_nps_detalhado(dados_mes_atual['Avaliacao'])
-            nps_anterior = self._calcular_nps_detalhado(dados_mes_anterior['Avaliacao'])
-            
-            diferenca = nps_atual['nps_score'] - nps_anterior['nps_score']
-            
-            return {
-                'nps_mes_atual': nps_atual['nps_score'],
-                'nps_mes_anterior': nps_anterior['nps_score'],
-                'diferenca': diferenca,
-                'tendencia': 'subida' if diferenca > 0 else 'queda' if diferenca < 0 else 'estável',
-                'avaliacoes_mes_atual': len(dados_mes_atual),
-                'avaliacoes_mes_anterior': len(dados_mes_anterior)
-            }
+            return self.cubo.comparacao_mensal()
             
         except Exception as e:
-            print(f"❌ Erro na comparação mensal: {str(e)}")
+            logger.error("❌ Erro na comparação mensal: %s", e)
             return None
     
+    @etapa_metodo('analisar_vendedores')
     def analisar_vendedores(self):
         """Análise detalhada por vendedor"""
         try:
-            print("👤 Analisando vendedores...")
+            logger.debug("👤 Analisando vendedores...")
             
             vendedores = self.metricas.get('ranking_vendedores', [])
             
@@ -425,47 +403,29 @@ class CalculadoraMetricas:
             
             self.metricas['analise_vendedores'] = analise
             
-            print(f"✅ Análise: {len(top_performers)} top performers, {len(vendedores_problema)} com dificuldades")
+            logger.debug("✅ Análise: %s top performers, %s com dificuldades", len(top_performers), len(vendedores_problema))
             return analise
             
         except Exception as e:
-            print(f"❌ Erro na análise de vendedores: {str(e)}")
+            logger.error("❌ Erro na análise de vendedores: %s", e)
             return {}
     
+    @etapa_metodo('calcular_evolucao_temporal')
     def calcular_evolucao_temporal(self):
         """Calcula evolução temporal do NPS"""
         try:
-            print("📈 Calculando evolução temporal...")
+            logger.debug("📈 Calculando evolução temporal...")
             
-            if 'Data' not in self.dados.columns:
-                print("⚠️ Coluna Data não encontrada")
+            if 'Data' not in self.cubo.colunas:
+                logger.warning("⚠️ Coluna Data não encontrada")
                 return {}
             
-            # Converte datas
-            self.dados['Data'] = pd.to_datetime(self.dados['Data'], errors='coerce')
-            dados_com_data = self.dados.dropna(subset=['Data'])
+            # NPS por mês, já ordenado por período
+            evolucao_mensal = self.cubo.evolucao_mensal()
             
-            if len(dados_com_data) == 0:
+            if not evolucao_mensal:
                 return {}
             
-            # Agrupa por mês
-            dados_com_data['Ano_Mes'] = dados_com_data['Data'].dt.to_period('M')
-            evolucao_mensal = []
-            
-            for periodo in dados_com_data['Ano_Mes'].unique():
-                dados_periodo = dados_com_data[dados_com_data['Ano_Mes'] == periodo]
-                nps_periodo = self._calcular_nps_detalhado(dados_periodo['Avaliacao'])
-                
-                evolucao_mensal.append({
-                    'periodo': str(periodo),
-                    'nps_score': nps_periodo['nps_score'],
-                    'total_avaliacoes': len(dados_periodo),
-                    'nota_media': dados_periodo['Avaliacao'].mean()
-                })
-            
-            # Ordena por período
-            evolucao_mensal = sorted(evolucao_mensal, key=lambda x: x['periodo'])
-            
             # Calcula tendência
             tendencia = self._calcular_tendencia(evolucao_mensal)
             
@@ -478,11 +438,11 @@ class CalculadoraMetricas:
             
             self.metricas['evolucao_temporal'] = evolucao
             
-            print(f"✅ Evolução temporal: {len(evolucao_mensal)} períodos, tendência {tendencia}")
+            logger.debug("✅ Evolução temporal: %s períodos, tendência %s", len(evolucao_mensal), tendencia)
             return evolucao
             
         except Exception as e:
-            print(f"❌ Erro na evolução temporal: {str(e)}")
+            logger.error("❌ Erro na evolução temporal: %s", e)
             return {}
     
     def _calcular_tendencia(self, evolucao_mensal):
@@ -508,13 +468,14 @@ class CalculadoraMetricas:
                 return 'estável'
                 
         except Exception as e:
-            print(f"❌ Erro no cálculo de tendência: {str(e)}")
+            logger.error("❌ Erro no cálculo de tendência: %s", e)
             return 'erro'
     
+    @etapa_metodo('gerar_insights_automaticos')
     def gerar_insights_automaticos(self):
         """Gera insights e recomendações automáticas"""
         try:
-            print("💡 Gerando insights automáticos...")
+            logger.debug("💡 Gerando insights automáticos...")
             
             insights = []
             alertas = []
@@ -568,11 +529,11 @@ class CalculadoraMetricas:
             
             self.metricas['insights_automaticos'] = insights_completos
             
-            print(f"✅ Insights gerados: {len(insights)} positivos, {len(alertas)} alertas")
+            logger.debug("✅ Insights gerados: %s positivos, %s alertas", len(insights), len(alertas))
             return insights_completos
             
         except Exception as e:
-            print(f"❌ Erro na geração de insights: {str(e)}")
+            logger.error("❌ Erro na geração de insights: %s", e)
             return {}
     
     def _detectar_empresa(self):
@@ -593,7 +554,7 @@ class CalculadoraMetricas:
             return "Sistema NPS"
             
         except Exception as e:
-            print(f"⚠️ Erro ao detectar empresa: {str(e)}")
+            logger.warning("⚠️ Erro ao detectar empresa: %s", e)
             return "Sistema NPS"
     
     def _detectar_unidade(self):
@@ -605,7 +566,7 @@ class CalculadoraMetricas:
             return "Unidade Principal"
             
         except Exception as e:
-            print(f"⚠️ Erro ao detectar unidade: {str(e)}")
+            logger.warning("⚠️ Erro ao detectar unidade: %s", e)
             return "Unidade Principal"
     
     def _detectar_periodo(self):
@@ -619,14 +580,15 @@ class CalculadoraMetricas:
             return datetime.now().strftime("%B/%Y")
             
         except Exception as e:
-            print(f"⚠️ Erro ao detectar período: {str(e)}")
+            logger.warning("⚠️ Erro ao detectar período: %s", e)
             return datetime.now().strftime("%B/%Y")
     
     def _extrair_comentarios_positivos(self):
         """Extrai comentários de promotores"""
         try:
-            if 'Comentario' in self.dados.columns and 'Looker_Classificacao' in self.dados.columns:
-                promotores = self.dados[self.dados['Looker_Classificacao'] == '🟢 Promotor']
+            dados = self.dados_looker
+            if dados is not None and 'Comentario' in dados.columns and 'Looker_Classificacao' in dados.columns:
+                promotores = dados[dados['Looker_Classificacao'] == '🟢 Promotor']
                 comentarios_com_nomes = []
                 
                 for _, row in promotores.iterrows():
@@ -644,14 +606,15 @@ class CalculadoraMetricas:
             return []
             
         except Exception as e:
-            print(f"⚠️ Erro ao extrair comentários positivos: {str(e)}")
+            logger.warning("⚠️ Erro ao extrair comentários positivos: %s", e)
             return []
     
     def _extrair_comentarios_negativos(self):
         """Extrai comentários de detratores"""
         try:
-            if 'Comentario' in self.dados.columns and 'Looker_Classificacao' in self.dados.columns:
-                detratores = self.dados[self.dados['Looker_Classificacao'] == '🔴 Detrator']
+            dados = self.dados_looker
+            if dados is not None and 'Comentario' in dados.columns and 'Looker_Classificacao' in dados.columns:
+                detratores = dados[dados['Looker_Classificacao'] == '🔴 Detrator']
                 comentarios_com_nomes = []
                 
                 for _, row in detratores.iterrows():
@@ -669,14 +632,15 @@ class CalculadoraMetricas:
             return []
             
         except Exception as e:
-            print(f"⚠️ Erro ao extrair comentários negativos: {str(e)}")
+            logger.warning("⚠️ Erro ao extrair comentários negativos: %s", e)
             return []
     
     def _analisar_detratores(self):
         """Analisa detratores em detalhes"""
         try:
-            if 'Looker_Classificacao' in self.dados.columns:
-                detratores = self.dados[self.dados['Looker_Classificacao'] == '🔴 Detrator']
+            dados = self.dados_looker
+            if dados is not None and 'Looker_Classificacao' in dados.columns:
+                detratores = dados[dados['Looker_Classificacao'] == '🔴 Detrator']
                 analise = []
                 
                 for _, row in detratores.iterrows():
@@ -692,7 +656,7 @@ class CalculadoraMetricas:
             return []
             
         except Exception as e:
-            print(f"⚠️ Erro ao analisar detratores: {str(e)}")
+            logger.warning("⚠️ Erro ao analisar detratores: %s", e)
             return []
     
     def _formatar_vendedores_para_ia(self, analise_vendedores):
@@ -704,70 +668,47 @@ class CalculadoraMetricas:
             return texto
             
         except Exception as e:
-            print(f"⚠️ Erro ao formatar vendedores: {str(e)}")
+            logger.warning("⚠️ Erro ao formatar vendedores: %s", e)
             return "Dados de vendedores indisponíveis"
     
+    @etapa_metodo('calcular_metricas_looker')
     def calcular_metricas_looker(self):
         """
         Calcula métricas usando fórmulas Looker exatas
         Integra com sistema existente SEM alterar funcionamento atual
         """
         try:
-            print("🚀 Calculando métricas Looker...")
-            
-            # Aplicar todas as fórmulas Looker
-            dados_enriquecidos = LookerFormulas.aplicar_todas_formulas(self.dados)
+            logger.debug("🚀 Calculando métricas Looker...")
             
-            # Calcular NPS Looker geral
-            nps_geral = LookerFormulas.calcular_nps_looker(dados_enriquecidos)
-            
-            # Análise por loja (usando fórmulas Looker)
-            analise_lojas = []
-            if 'Loja' in self.dados.columns:
-                analise_lojas = LookerFormulas.analisar_por_dimensao(dados_enriquecidos, 'Loja')
+            # NPS geral, por loja e por vendedor nas mesmas contagens
+            with medir_etapa('looker', linhas=len(self.dados)):
+                resultado = self.motor_looker.calcular(dimensoes=('Loja', 'Vendedor'))
+            nps_geral = resultado['geral']
+            analise_lojas = resultado['dimensoes'].get('Loja', [])
             
             # Análise por vendedor (usando fórmulas Looker)
             analise_vendedores = []
-            if 'Vendedor' in self.dados.columns:
-                analise_vendedores_raw = LookerFormulas.analisar_por_dimensao(dados_enriquecidos, 'Vendedor')
+            if 'Vendedor' in resultado['dimensoes']:
+                analise_vendedores_raw = resultado['dimensoes']['Vendedor']
+                
+                # Loja de cada vendedor (primeira ocorrência)
+                lojas_vendedores = {}
+                if 'Loja' in self.dados.columns:
+                    lojas_vendedores = self.dados.drop_duplicates('Vendedor').set_index('Vendedor')['Loja'].to_dict()
                 
-                # Adicionar informação de loja para cada vendedor
                 for vendedor_data in analise_vendedores_raw:
-                    vendedor_nome = vendedor_data['vendedor']
-                    # Buscar loja do vendedor
-                    loja_vendedor = "N/A"
-                    if 'Loja' in self.dados.columns:
-                        vendedor_rows = dados_enriquecidos[dados_enriquecidos['Vendedor'] == vendedor_nome]
-                        if len(vendedor_rows) > 0:
-                            loja_vendedor = vendedor_rows['Loja'].iloc[0]
-                    
-                    vendedor_data['loja'] = loja_vendedor
+                    vendedor_data['loja'] = lojas_vendedores.get(vendedor_data['vendedor'], "N/A")
                     analise_vendedores.append(vendedor_data)
             
-            # Análise de interações
-            interacoes_d1_d30 = dados_enriquecidos['Looker_Interacao_D1_D30'].value_counts().get('Sim', 0)
-            interacoes_outros = dados_enriquecidos['Looker_Interacao_Outros'].value_counts().get('Sim', 0)
-            
-            # Análise de avaliações
-            avaliou_count = dados_enriquecidos['Looker_Avaliou'].value_counts().get('Avaliou', 0)
-            nao_avaliou_count = dados_enriquecidos['Looker_Avaliou'].value_counts().get('Não avaliou', 0)
+            interacoes_d1_d30 = resultado['interacoes']['d1_d30_positivas']
             
             # Compilar resultados Looker
             resultados_looker = {
                 'metricas_gerais': nps_geral,
                 'analise_lojas': analise_lojas,
                 'analise_vendedores': analise_vendedores,
-                'dados_enriquecidos': dados_enriquecidos,
-                'interacoes': {
-                    'd1_d30_positivas': interacoes_d1_d30,
-                    'outros_periodos_positivas': interacoes_outros,
-                    'total_registros': len(dados_enriquecidos)
-                },
-                'avaliacoes': {
-                    'avaliou': avaliou_count,
-                    'nao_avaliou': nao_avaliou_count,
-                    'total': len(dados_enriquecidos)
-                },
+                'interacoes': resultado['interacoes'],
+                'avaliacoes': resultado['avaliacoes'],
                 'metadados': {
                     'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                     'versao_looker': '1.0.0',
@@ -784,18 +725,16 @@ class CalculadoraMetricas:
             # Salvar nos resultados gerais
             self.metricas['looker'] = resultados_looker
             
-            print(f"✅ Métricas Looker calculadas com sucesso!")
-            print(f"   🎯 NPS Final: {nps_geral['nps_final']}")
-            print(f"   📊 Lojas analisadas: {len(analise_lojas)}")
-            print(f"   👥 Vendedores analisados: {len(analise_vendedores)}")
-            print(f"   📋 Interações D+1/D+30: {interacoes_d1_d30}")
+            logger.debug("✅ Métricas Looker calculadas com sucesso!")
+            logger.debug("   🎯 NPS Final: %s", nps_geral['nps_final'])
+            logger.debug("   📊 Lojas analisadas: %s", len(analise_lojas))
+            logger.debug("   👥 Vendedores analisados: %s", len(analise_vendedores))
+            logger.debug("   📋 Interações D+1/D+30: %s", interacoes_d1_d30)
             
             return resultados_looker
             
         except Exception as e:
-            print(f"❌ Erro ao calcular métricas Looker: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Erro ao calcular métricas Looker: %s", e)
             return None
     
     def gerar_analise_ia_socialzap(self, resultados_looker):
@@ -803,13 +742,20 @@ class CalculadoraMetricas:
         Envia dados para IA analisar e gerar relatório no formato Analytics
         """
         try:
-            print("🤖 Gerando análise IA formato Analytics...")
+            unidade, periodo = self._detectar_unidade(), self._detectar_periodo()
+            nome_arquivo = f"Relatorio_NPS_{unidade.replace(' ', '_')}_{periodo.replace('/', '_')}.txt"
+            
+            # Prazo curto: última análise salva da mesma unidade/período
+            if not tem_tempo('ia', TEMPO_IA_PADRAO):
+                return self._analise_ia_em_cache(nome_arquivo)
+            
+            logger.debug("🤖 Gerando análise IA formato Analytics...")
             
             # Preparar dados estruturados para IA
             dados_para_ia = {
                 'empresa': self._detectar_empresa(),
-                'unidade': self._detectar_unidade(),
-                'periodo': self._detectar_periodo(),
+                'unidade': unidade,
+                'periodo': periodo,
                 'metricas_gerais': resultados_looker['metricas_gerais'],
                 'analise_vendedores': resultados_looker['analise_vendedores'],
                 'comentarios_positivos': self._extrair_comentarios_positivos(),
@@ -882,36 +828,71 @@ INSTRUÇÕES ESPECÍFICAS:
 """
 
             # Enviar para OpenAI
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "Você é um analista especialista em NPS que gera relatórios no formato Analytics. Seja preciso, profissional e use exatamente o formato solicitado."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt_socialzap
-                    }
-                ],
-                temperature=0.3
-            )
+            with medir_etapa('ia'):
+                response = self.openai_client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[
+                        {
+                            "role": "system", 
+                            "content": "Você é um analista especialista em NPS que gera relatórios no formato Analytics. Seja preciso, profissional e use exatamente o formato solicitado."
+                        },
+                        {
+                            "role": "user", 
+                            "content": prompt_socialzap
+                        }
+                    ],
+                    temperature=0.3,
+                    timeout=timeout_prazo(120)
+                )
             
             relatorio_ia = response.choices[0].message.content
             
-            # Salvar relatório
-            nome_arquivo = f"Relatorio_NPS_{dados_para_ia['unidade'].replace(' ', '_')}_{dados_para_ia['periodo'].replace('/', '_')}.txt"
+            # Salvar relatório (também serve de cache quando o prazo estiver curto)
             with open(nome_arquivo, 'w', encoding='utf-8') as f:
                 f.write(relatorio_ia)
             
-            print(f"✅ Relatório IA Analytics gerado: {nome_arquivo}")
+            logger.info("✅ Relatório IA Analytics gerado: %s", nome_arquivo)
             return relatorio_ia
             
         except Exception as e:
-            print(f"❌ Erro na análise IA Analytics: {str(e)}")
+            logger.error("❌ Erro na análise IA Analytics: %s", e)
+            return None
+    
+    def _analise_ia_em_cache(self, nome_arquivo):
+        """Relatório IA salvo anteriormente (None se não houver)"""
+        try:
+            with open(nome_arquivo, encoding='utf-8') as f:
+                relatorio_ia = f.read()
+            self._registrar_degradacao('ia', 'cache')
+            return relatorio_ia
+        except OSError:
+            self._registrar_degradacao('ia', 'omitida')
             return None
 
 
+def _resumo_serializavel(valor, caminho='metricas'):
+    """Converte numpy para tipos Python e descarta tabelas (DataFrame/Series)
+    
+    Mantém o resultado das métricas pequeno e serializável: o tamanho
+    depende do número de lojas/vendedores/meses, não do número de linhas.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        logger.warning("⚠️ %s: tabela removida do resultado das métricas", caminho)
+        return None
+    if isinstance(valor, dict):
+        resumo = {}
+        for chave, item in valor.items():
+            item = _resumo_serializavel(item, f'{caminho}.{chave}')
+            if item is not None or valor[chave] is None:
+                resumo[chave] = item
+        return resumo
+    if isinstance(valor, list):
+        return [_resumo_serializavel(item, caminho) for item in valor]
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
 def main():
     """Função principal para teste"""
     # Dados de exemplo
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Configuração de logging do sistema NPS
+Nível global, nível por módulo e saída em texto ou JSON via variáveis de ambiente
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+
+# LOG_LEVEL: nível global (DEBUG, INFO, WARNING, ERROR)
+# LOG_FORMAT: 'texto' (padrão) ou 'json' (uma linha JSON por evento)
+# LOG_NIVEIS: níveis por módulo, ex.: "nps_extractor=DEBUG,werkzeug=WARNING"
+NIVEL_PADRAO = 'INFO'
+FORMATO_TEXTO = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_configurado = False
+
+
+class FormatadorJSON(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'modulo': record.name,
+            'mensagem': record.getMessage()
+        }
+        if record.exc_info:
+            evento['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False)
+
+
+def _niveis_por_modulo(valor):
+    """Interpreta LOG_NIVEIS ("modulo=NIVEL,outro=NIVEL")"""
+    niveis = {}
+    for item in valor.split(','):
+        if '=' not in item:
+            continue
+        modulo, nivel = item.split('=', 1)
+        niveis[modulo.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar_logging(nivel=None, formato=None):
+    """Configura o logger raiz uma única vez por processo
+
+    Args:
+        nivel: nível global (padrão: LOG_LEVEL ou INFO)
+        formato: 'texto' ou 'json' (padrão: LOG_FORMAT ou texto)
+    """
+    global _configurado
+    if _configurado:
+        return
+
+    nivel = (nivel or os.environ.get('LOG_LEVEL', NIVEL_PADRAO)).upper()
+    formato = (formato or os.environ.get('LOG_FORMAT', 'texto')).lower()
+
+    handler = logging.StreamHandler(sys.stderr)
+    if formato == 'json':
+        handler.setFormatter(FormatadorJSON())
+    else:
+        handler.setFormatter(logging.Formatter(FORMATO_TEXTO))
+
+    raiz = logging.getLogger()
+    raiz.handlers = [handler]
+    raiz.setLevel(nivel)
+
+    for modulo, nivel_modulo in _niveis_por_modulo(os.environ.get('LOG_NIVEIS', '')).items():
+        logging.getLogger(modulo).setLevel(nivel_modulo)
+
+    _configurado = True
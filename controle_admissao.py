@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Controle de admissão das análises (/api/analyze)
+Limita as análises simultâneas e a memória reservada por elas; as demais
+esperam em uma fila limitada, por ordem de chegada. Fila cheia ou espera
+acima do limite viram recusa (HTTP 429 com Retry-After). Quem espera
+respeita o prazo da requisição: prazo vencido ou cliente desconectado
+liberam o lugar na fila na hora (PrazoEsgotado).
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from instrumentacao import medir_etapa
+from prazo import INTERVALO_CONEXAO, prazo_atual
+
+logger = logging.getLogger(__name__)
+
+
+# Análises executando ao mesmo tempo, análises esperando e espera máxima (s)
+ANALISES_SIMULTANEAS = int(os.environ.get('ANALISES_SIMULTANEAS', '2'))
+ANALISES_FILA = int(os.environ.get('ANALISES_FILA', '8'))
+ANALISES_ESPERA_MAXIMA = float(os.environ.get('ANALISES_ESPERA_MAXIMA', '30'))
+# Memória reservada por análise e orçamento total (MB; 0 = 70% da RAM)
+MEMORIA_POR_ANALISE_MB = int(os.environ.get('MEMORIA_POR_ANALISE_MB', '512'))
+MEMORIA_ANALISES_MB = int(os.environ.get('MEMORIA_ANALISES_MB', '0'))
+
+# Uploads: memória estimada = tamanho do arquivo x fator (DataFrame + cópias)
+FATOR_MEMORIA_ARQUIVO = 10
+# Duração presumida de uma análise antes da primeira medida (s)
+DURACAO_INICIAL = 30.0
+
+_controle = None
+_lock = threading.Lock()
+
+
+class AnaliseRecusada(Exception):
+    """Análise não admitida; retry_after = segundos sugeridos para tentar de novo"""
+
+    def __init__(self, motivo, retry_after):
+        super().__init__(f'Servidor ocupado ({motivo}); tente novamente em {retry_after}s')
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+def _memoria_total_mb():
+    """70% da memória física (ou o suficiente para as análises simultâneas)"""
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        return int(total * 0.7 / (1024 * 1024))
+    except (AttributeError, ValueError, OSError):
+        return ANALISES_SIMULTANEAS * MEMORIA_POR_ANALISE_MB
+
+
+def estimar_memoria_mb(bytes_entrada=None):
+    """Memória a reservar para a análise (arquivos grandes reservam mais)"""
+    if not bytes_entrada:
+        return MEMORIA_POR_ANALISE_MB
+    return max(MEMORIA_POR_ANALISE_MB, math.ceil(bytes_entrada * FATOR_MEMORIA_ARQUIVO / (1024 * 1024)))
+
+
+class Vaga:
+    """Reserva de uma análise admitida (liberada uma única vez)"""
+
+    def __init__(self, controle, memoria_mb):
+        self._controle = controle
+        self.memoria_mb = memoria_mb
+        self._inicio = time.monotonic()
+        self._liberada = False
+
+    def liberar(self):
+        if not self._liberada:
+            self._liberada = True
+            self._controle._liberar(self.memoria_mb, time.monotonic() - self._inicio)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.liberar()
+
+
+class ControleAdmissao:
+    """Vagas de execução + orçamento de memória + fila limitada (FIFO)"""
+
+    def __init__(self, simultaneas=None, fila=None, espera_maxima=None, memoria_mb=None):
+        self.simultaneas = max(1, simultaneas or ANALISES_SIMULTANEAS)
+        self.fila_maxima = ANALISES_FILA if fila is None else fila
+        self.espera_maxima = ANALISES_ESPERA_MAXIMA if espera_maxima is None else espera_maxima
+        self.memoria_mb = memoria_mb or MEMORIA_ANALISES_MB or _memoria_total_mb()
+
+        self._condicao = threading.Condition()
+        self._fila = deque()
+        self._em_execucao = 0
+        self._memoria_reservada = 0
+        self._duracao_media = DURACAO_INICIAL
+        self._admitidas = 0
+        self._recusadas = {'fila_cheia': 0, 'espera': 0}
+
+    def _cabe(self, memoria):
+        """Há vaga e memória? (chamar com a condição; análise maior que o orçamento roda sozinha)"""
+        if self._em_execucao >= self.simultaneas:
+            return False
+        return self._em_execucao == 0 or self._memoria_reservada + memoria <= self.memoria_mb
+
+    def _retry_after(self):
+        """Estimativa (s) até abrir vaga para quem chegar agora (chamar com a condição)"""
+        rodadas = (len(self._fila) + self._em_execucao) / self.simultaneas
+        return max(1, math.ceil(self._duracao_media * max(rodadas, 1)))
+
+    def _recusar(self, motivo):
+        self._recusadas[motivo] += 1
+        retry_after = self._retry_after()
+        logger.warning("🚦 Análise recusada (%s): %s em execução, %s na fila, Retry-After %ss",
+                       motivo, self._em_execucao, len(self._fila), retry_after)
+        raise AnaliseRecusada(motivo, retry_after)
+
+    def admitir(self, memoria_mb=None):
+        """Reserva vaga e memória, esperando na fila se preciso
+
+        A espera é registrada como etapa 'fila' (histograma e etapas do job).
+
+        Returns:
+            Vaga: liberar() ou `with` devolve a reserva
+        Raises:
+            AnaliseRecusada: fila cheia ou espera maior que espera_maxima
+            PrazoEsgotado: prazo da requisição vencido ou cliente desconectado
+        """
+        memoria = memoria_mb or MEMORIA_POR_ANALISE_MB
+        prazo = prazo_atual()
+
+        with medir_etapa('fila'):
+            with self._condicao:
+                if self._fila or not self._cabe(memoria):
+                    if len(self._fila) >= self.fila_maxima:
+                        self._recusar('fila_cheia')
+
+                    vez = object()
+                    self._fila.append(vez)
+                    limite = time.monotonic() + self.espera_maxima
+                    try:
+                        while self._fila[0] is not vez or not self._cabe(memoria):
+                            if prazo is not None:
+                                prazo.verificar('fila')
+                            restante = limite - time.monotonic()
+                            if restante <= 0:
+                                self._recusar('espera')
+                            if prazo is not None:
+                                # Cancelamento não notifica a condição: acorda periodicamente
+                                restante = min(restante, prazo.restante(), INTERVALO_CONEXAO)
+                            self._condicao.wait(restante)
+                    finally:
+                        self._fila.remove(vez)
+                        # O próximo da fila pode caber agora
+                        self._condicao.notify_all()
+
+                self._em_execucao += 1
+                self._memoria_reservada += memoria
+                self._admitidas += 1
+
+        return Vaga(self, memoria)
+
+    def _liberar(self, memoria, duracao):
+        with self._condicao:
+            self._em_execucao -= 1
+            self._memoria_reservada -= memoria
+            # Média móvel da duração (base do Retry-After)
+            self._duracao_media = 0.8 * self._duracao_media + 0.2 * duracao
+            self._condicao.notify_all()
+
+    def obter_metricas(self):
+        with self._condicao:
+            return {
+                'em_execucao': self._em_execucao,
+                'fila': len(self._fila),
+                'memoria_reservada_mb': self._memoria_reservada,
+                'memoria_orcamento_mb': self.memoria_mb,
+                'simultaneas': self.simultaneas,
+                'admitidas': self._admitidas,
+                'recusadas': dict(self._recusadas),
+                'duracao_media_s': round(self._duracao_media, 3)
+            }
+
+
+def obter_controle():
+    """Controle de admissão do processo (criado no primeiro uso)"""
+    global _controle
+
+    with _lock:
+        if _controle is None:
+            _controle = ControleAdmissao()
+            logger.info("🚦 Admissão: %s análise(s) simultânea(s), fila %s, espera máx. %ss, memória %s MB",
+                        _controle.simultaneas, _controle.fila_maxima, _controle.espera_maxima, _controle.memoria_mb)
+        return _controle
+
+
+def admitir_analise(memoria_mb=None):
+    """Atalho: `with admitir_analise(): ...` (a reserva acontece na chamada)"""
+    return obter_controle().admitir(memoria_mb)
+
+
+def obter_metricas():
+    """Métricas da admissão (vazio se nenhuma análise passou pelo controle)"""
+    with _lock:
+        controle = _controle
+    return controle.obter_metricas() if controle is not None else {}
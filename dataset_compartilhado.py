@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Dataset compartilhado com os processos do pool
+O DataFrame limpo é gravado uma única vez em arquivos .npy na memória
+compartilhada (/dev/shm quando existe); os workers recebem só o descritor
+e abrem as colunas numéricas/datas com mmap, sem cópia. Texto vai como
+códigos (mmap) + valores únicos. Os arquivos são removidos quando a
+última referência é liberada.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# Pasta dos datasets publicados (RAM em /dev/shm no Linux)
+PASTA_DATASETS = (os.environ.get('DATASET_COMPARTILHADO_DIR')
+                  or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()))
+PREFIXO = 'nps_dataset_'
+
+_orfaos_verificados = False
+
+
+def _coluna_numpy(serie):
+    """True se a coluna pode ir direto para .npy (números, bool, datas sem fuso)"""
+    return isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'biufcmM'
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _remover_orfaos():
+    """Remove datasets deixados por processos que morreram sem liberar"""
+    global _orfaos_verificados
+
+    if _orfaos_verificados:
+        return
+    _orfaos_verificados = True
+
+    try:
+        nomes = os.listdir(PASTA_DATASETS)
+    except OSError:
+        return
+    for nome in nomes:
+        if not nome.startswith(PREFIXO):
+            continue
+        try:
+            pid = int(nome[len(PREFIXO):].split('_', 1)[0])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _processo_vivo(pid):
+            shutil.rmtree(os.path.join(PASTA_DATASETS, nome), ignore_errors=True)
+
+
+class DatasetCompartilhado:
+    """Dataset publicado + contagem de referências do processo dono
+
+    Quem publica começa com uma referência (liberada em fechar()); cada
+    tarefa enviada ao pool adquire outra e a libera ao terminar.
+    """
+
+    def __init__(self, pasta, descritor):
+        self.pasta = pasta
+        self.descritor = descritor
+        self._referencias = 1
+        self._lock = threading.Lock()
+
+    @property
+    def linhas(self):
+        return self.descritor['linhas']
+
+    def adquirir(self):
+        with self._lock:
+            if self._referencias <= 0:
+                raise RuntimeError(f'Dataset compartilhado já removido: {self.pasta}')
+            self._referencias += 1
+        return self
+
+    def liberar(self, *_):
+        """Solta uma referência; a última remove os arquivos (aceita Future como argumento)"""
+        with self._lock:
+            self._referencias -= 1
+            remover = self._referencias == 0
+        if remover:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+            logger.debug("🧹 Dataset compartilhado removido: %s", self.pasta)
+
+    def fechar(self):
+        self.liberar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def gravar_colunas(dados, pasta):
+    """Grava as colunas do DataFrame como .npy em `pasta` (já existente)
+
+    Também usado pelo histórico em disco (historico_nps). Os arquivos do
+    descritor são relativos à pasta.
+
+    Returns:
+        dict: descritor ({pasta, linhas, colunas})
+    """
+    colunas = []
+    for posicao, nome in enumerate(dados.columns):
+        serie = dados.iloc[:, posicao]
+        base = f'c{posicao}'
+
+        if _coluna_numpy(serie):
+            np.save(os.path.join(pasta, f'{base}.npy'), serie.to_numpy())
+            colunas.append({'nome': nome, 'tipo': 'numpy', 'arquivo': f'{base}.npy'})
+            continue
+
+        # Texto/objetos: códigos mapeáveis + valores únicos
+        codigos, valores = pd.factorize(serie)
+        tipo_codigo = np.int32 if len(valores) < 2 ** 31 else np.int64
+        np.save(os.path.join(pasta, f'{base}.codigos.npy'), codigos.astype(tipo_codigo, copy=False))
+        np.save(os.path.join(pasta, f'{base}.valores.npy'), np.asarray(valores, dtype=object), allow_pickle=True)
+        colunas.append({
+            'nome': nome,
+            'tipo': 'codificada',
+            'arquivo': f'{base}.codigos.npy',
+            'valores': f'{base}.valores.npy'
+        })
+
+    descritor = {'pasta': pasta, 'linhas': len(dados), 'colunas': colunas}
+    with open(os.path.join(pasta, 'descritor.json'), 'w', encoding='utf-8') as f:
+        json.dump(descritor, f, ensure_ascii=False, default=str)
+    return descritor
+
+
+def ler_descritor(pasta):
+    """Descritor gravado por gravar_colunas (apontando para a pasta atual)"""
+    with open(os.path.join(pasta, 'descritor.json'), encoding='utf-8') as f:
+        descritor = json.load(f)
+    descritor['pasta'] = pasta
+    return descritor
+
+
+def publicar(dados):
+    """Grava o DataFrame na memória compartilhada
+
+    O índice não é preservado (os workers recebem um RangeIndex).
+
+    Returns:
+        DatasetCompartilhado
+    """
+    _remover_orfaos()
+    pasta = tempfile.mkdtemp(prefix=f'{PREFIXO}{os.getpid()}_', dir=PASTA_DATASETS)
+
+    try:
+        descritor = gravar_colunas(dados, pasta)
+    except Exception:
+        shutil.rmtree(pasta, ignore_errors=True)
+        raise
+
+    logger.debug("📤 Dataset compartilhado: %s linhas em %s", len(dados), pasta)
+    return DatasetCompartilhado(pasta, descritor)
+
+
+def anexar(descritor, inicio=None, fim=None, colunas=None):
+    """DataFrame a partir do descritor (lado do worker)
+
+    Colunas numéricas e de data são mmaps somente leitura (sem cópia); as
+    de texto são montadas só para o intervalo [inicio, fim). `colunas`
+    limita as colunas lidas.
+    """
+    fatia = slice(inicio, fim)
+    pasta = descritor['pasta']
+    selecionadas = [coluna for coluna in descritor['colunas']
+                    if colunas is None or coluna['nome'] in colunas]
+    arrays = []
+
+    for coluna in selecionadas:
+        if coluna['tipo'] == 'numpy':
+            arrays.append(np.load(os.path.join(pasta, coluna['arquivo']), mmap_mode='r')[fatia])
+            continue
+
+        codigos = np.load(os.path.join(pasta, coluna['arquivo']), mmap_mode='r')[fatia]
+        valores = np.load(os.path.join(pasta, coluna['valores']), allow_pickle=True)
+        # Código -1 (ausente) cai no None acrescentado ao fim
+        arrays.append(np.append(valores, None).take(codigos))
+
+    dados = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+    dados.columns = [coluna['nome'] for coluna in selecionadas]
+    return dados
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Esquema das colunas das planilhas NPS
+Resolve o cabeçalho em um esquema canônico (Data, Nome, Loja, Vendedor,
+Avaliacao, Comentario) com tipos, colunas de data e colunas principais.
+O esquema fica em cache pelo hash do cabeçalho e é persistido em disco:
+planilhas recorrentes pulam a inferência e o formato de data já conhecido.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Arquivo com os esquemas já resolvidos ('' desativa a persistência)
+ARQUIVO_ESQUEMAS = os.environ.get('ESQUEMAS_ARQUIVO', os.path.join('cache', 'esquemas.json'))
+VERSAO_ESQUEMA = 1
+
+# Palavras que identificam colunas de data e colunas principais (limpeza)
+PALAVRAS_DATA = ('data', 'date', 'timestamp', 'hora')
+COLUNAS_CHAVE = ('nome', 'cliente', 'vendedor')
+
+# Palavras de cada coluna canônica, testadas contra o nome em minúsculas
+PALAVRAS_CANONICAS = {
+    'Data': ('data', 'date', 'timestamp', 'created', 'hora', 'time'),
+    'Nome': ('nome', 'name', 'client', 'customer', 'cliente'),
+    'Loja': ('loja', 'store', 'unidade', 'filial', 'shop'),
+    'Vendedor': ('vendedor', 'atendente', 'funcionario', 'staff', 'seller', 'funcionário'),
+    'Avaliacao': ('avaliacao', 'avaliação', 'nota', 'score', 'rating', 'nps', 'nota_nps', 'grade'),
+    'Classificacao': ('classificacao', 'classificação', 'category', 'tipo', 'class'),
+    'Comentario': ('comentario', 'comentário', 'comment', 'observacao', 'observação', 'feedback')
+}
+
+# Tipo de cada coluna canônica após a limpeza
+TIPOS_CANONICOS = {
+    'Data': 'datetime64[ns]',
+    'Avaliacao': 'float64'
+}
+
+_esquemas = None
+_lock = threading.Lock()
+
+
+def assinatura(colunas):
+    """Hash do cabeçalho (nomes já normalizados, na ordem da planilha)"""
+    conteudo = json.dumps([str(coluna) for coluna in colunas], ensure_ascii=False)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def inferir_esquema(colunas):
+    """Classifica as colunas do cabeçalho (sem cache)
+
+    Returns:
+        dict: 'canonicas' ({nome canônico: coluna}), 'tipos' ({coluna: dtype}),
+            'datas' e 'chave' (colunas da limpeza) e 'formatos_data'
+    """
+    colunas = [str(coluna) for coluna in colunas]
+    minusculas = [coluna.lower().strip() for coluna in colunas]
+
+    canonicas = {}
+    for canonica, palavras in PALAVRAS_CANONICAS.items():
+        for coluna, nome in zip(colunas, minusculas):
+            if any(palavra in nome for palavra in palavras):
+                canonicas[canonica] = coluna
+                break
+
+    datas = [coluna for coluna, nome in zip(colunas, minusculas) if any(p in nome for p in PALAVRAS_DATA)]
+    chave = [coluna for coluna, nome in zip(colunas, minusculas)
+             if nome in COLUNAS_CHAVE and coluna not in datas]
+
+    tipos = {coluna: 'datetime64[ns]' for coluna in datas}
+    for canonica, tipo in TIPOS_CANONICOS.items():
+        coluna = canonicas.get(canonica)
+        if coluna is not None and coluna not in tipos:
+            tipos[coluna] = tipo
+
+    return {
+        'versao': VERSAO_ESQUEMA,
+        'canonicas': canonicas,
+        'tipos': tipos,
+        'datas': datas,
+        'chave': chave,
+        'formatos_data': {}
+    }
+
+
+def _carregar():
+    """Esquemas persistidos (lidos uma vez por processo)"""
+    global _esquemas
+
+    if _esquemas is not None:
+        return _esquemas
+
+    esquemas = {}
+    if ARQUIVO_ESQUEMAS:
+        try:
+            with open(ARQUIVO_ESQUEMAS, encoding='utf-8') as f:
+                esquemas = {chave: esquema for chave, esquema in json.load(f).items()
+                            if esquema.get('versao') == VERSAO_ESQUEMA}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning("⚠️ Cache de esquemas ignorado: %s", e)
+
+    _esquemas = esquemas
+    return _esquemas
+
+
+def _persistir():
+    """Grava os esquemas (arquivo temporário + rename); chamar com _lock"""
+    if not ARQUIVO_ESQUEMAS:
+        return
+    try:
+        pasta = os.path.dirname(ARQUIVO_ESQUEMAS)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f'{ARQUIVO_ESQUEMAS}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(_esquemas, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, ARQUIVO_ESQUEMAS)
+    except OSError as e:
+        logger.warning("⚠️ Erro ao salvar cache de esquemas: %s", e)
+
+
+def obter_esquema(colunas):
+    """Esquema do cabeçalho: cache em memória/disco, inferência só na primeira vez
+
+    O dict retornado é compartilhado; não altere (use registrar_formato_data).
+    """
+    chave = assinatura(colunas)
+
+    with _lock:
+        esquema = _carregar().get(chave)
+        if esquema is not None:
+            return esquema
+
+        esquema = inferir_esquema(colunas)
+        esquema['assinatura'] = chave
+        _esquemas[chave] = esquema
+        _persistir()
+
+    logger.debug("🧭 Esquema novo %s: %s", chave[:12], esquema['canonicas'])
+    return esquema
+
+
+def registrar_formato_data(esquema, coluna, formato):
+    """Guarda o formato de data que funcionou para a coluna do esquema"""
+    if not formato or esquema['formatos_data'].get(coluna) == formato:
+        return
+    with _lock:
+        esquema['formatos_data'][coluna] = formato
+        _persistir()
+
+
+def limpar_cache():
+    """Esquece os esquemas em memória (o arquivo é relido no próximo uso)"""
+    global _esquemas
+    with _lock:
+        _esquemas = None
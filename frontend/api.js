@@ -11,9 +11,11 @@ class DashBotAPI {
             console.log('🔗 URL:', sheetsUrl);
             console.log('🏢 Projeto:', lojaName);
             
-            // Timeout otimizado para análise IA (3 minutos)
+            // O cliente desiste em 2 minutos; o servidor recebe um prazo um pouco menor
+            // (X-Prazo) para responder antes, pulando etapas opcionais se preciso
+            const limiteMs = 120000; // 2 minutos
             const controller = new AbortController();
-            const timeoutId = setTimeout(() => controller.abort(), 180000); // 3 minutos
+            const timeoutId = setTimeout(() => controller.abort(), limiteMs);
             
             const startTime = Date.now();
             
@@ -21,6 +23,7 @@ class DashBotAPI {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'X-Prazo': String((limiteMs - 5000) / 1000)
                 },
                 body: JSON.stringify({
                     sheets_url: sheetsUrl,
@@ -35,6 +38,17 @@ class DashBotAPI {
             const elapsed = Date.now() - startTime;
             console.log(`⏱️ Análise concluída em ${(elapsed/1000).toFixed(1)}s`);
 
+            // Fila de análises cheia: o servidor informa quando tentar de novo
+            if (response.status === 429) {
+                const retryAfter = response.headers.get('Retry-After') || '30';
+                throw new Error(`Servidor ocupado com outras análises. Tente novamente em ${retryAfter}s.`);
+            }
+
+            // Prazo esgotado no servidor
+            if (response.status === 504) {
+                throw new Error('Análise demorou muito (máximo 2 minutos). Verifique a planilha.');
+            }
+
             if (!response.ok) {
                 const errorText = await response.text();
                 throw new Error(`Erro no servidor: ${errorText}`);
@@ -48,7 +62,7 @@ class DashBotAPI {
         } catch (error) {
             if (error.name === 'AbortError') {
                 console.error('⏰ Timeout na análise');
-                throw new Error('Análise demorou muito (máximo 3 minutos). Verifique a planilha.');
+                throw new Error('Análise demorou muito (máximo 2 minutos). Verifique a planilha.');
             }
             console.error('❌ Erro na API:', error);
             throw error;
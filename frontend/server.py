@@ -8,37 +8,83 @@ import socketserver
 import webbrowser
 import os
 import json
+import logging
 from urllib.parse import urlparse, parse_qs
 import subprocess
 import sys
+from contextlib import nullcontext
 
 # Configurações
-PORT = 8080
+PORT = int(os.environ.get('PORT', '8080'))
+ABRIR_NAVEGADOR = os.environ.get('ABRIR_NAVEGADOR', '1') != '0'
 FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
 
+sys.path.append(os.path.dirname(FRONTEND_DIR))
+from instrumentacao import coletar_etapas, medir_etapa, exportar_prometheus
+from perfilador import perfil_solicitado, perfilar
+from configuracao_log import configurar_logging
+from pool_renderizacao import gerar_pdf, submeter_pdf, aguardar_pdf, aquecer_pool
+from aquecedor_planilhas import iniciar_aquecedor, obter_aquecida, registrar
+from api_consultas import CONSULTAS, consultar
+from controle_admissao import AnaliseRecusada, admitir_analise
+from prazo import Prazo, PrazoEsgotado, segundos_da_requisicao, usar_prazo, vigiar_conexao
+
+configurar_logging()
+logger = logging.getLogger('server')
+
 class DashBotHandler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=FRONTEND_DIR, **kwargs)
     
+    def log_message(self, format, *args):
+        """Log de acesso em nível DEBUG (em vez de stderr a cada requisição)"""
+        logger.debug("%s - " + format, self.address_string(), *args)
+    
     def do_GET(self):
         """Processa requisições GET"""
-        if self.path.startswith('/relatorios/'):
+        url = urlparse(self.path)
+        if url.path.startswith('/api/') and url.path[5:] in CONSULTAS:
+            # Consultas do dashboard a partir dos agregados salvos (sem IA/PDF)
+            parametros = {chave: ','.join(valores) for chave, valores in parse_qs(url.query).items()}
+            status, resposta = consultar(url.path[5:], parametros)
+            corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(corpo)
+            return
+        elif self.path == '/api/metrics':
+            # Métricas por etapa do pipeline no formato texto do Prometheus
+            corpo = exportar_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+            return
+        elif self.path.startswith('/relatorios/'):
             # Servir PDFs da pasta relatorios - MELHORADO
             pdf_name = self.path[12:]  # Remove '/relatorios/'
             relatorios_dir = os.path.join(os.path.dirname(FRONTEND_DIR), 'relatorios')
             pdf_path = os.path.join(relatorios_dir, pdf_name)
             
-            print(f"📁 Solicitação PDF: {pdf_name}")
-            print(f"📂 Caminho: {pdf_path}")
-            print(f"📋 Existe: {os.path.exists(pdf_path)}")
+            logger.debug("📁 Solicitação PDF: %s", pdf_name)
+            logger.debug("📂 Caminho: %s", pdf_path)
+            logger.debug("📋 Existe: %s", os.path.exists(pdf_path))
             
-            if os.path.exists(pdf_path) and pdf_name.endswith('.pdf'):
+            # Perfis (.pstats/.html) ficam na mesma pasta dos PDFs
+            extensao = os.path.splitext(pdf_name)[1]
+            tipos = {'.pdf': 'application/pdf', '.pstats': 'application/octet-stream', '.html': 'text/html; charset=utf-8'}
+            
+            if os.path.exists(pdf_path) and extensao in tipos:
                 try:
                     # Obter tamanho do arquivo
                     file_size = os.path.getsize(pdf_path)
                     
                     self.send_response(200)
-                    self.send_header('Content-type', 'application/pdf')
+                    self.send_header('Content-type', tipos[extensao])
                     self.send_header('Content-Disposition', f'attachment; filename="{pdf_name}"')
                     self.send_header('Content-Length', str(file_size))
                     self.send_header('Access-Control-Allow-Origin', '*')
@@ -49,15 +95,15 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                     with open(pdf_path, 'rb') as f:
                         self.wfile.write(f.read())
                     
-                    print(f"✅ PDF enviado: {pdf_name} ({file_size} bytes)")
+                    logger.info("✅ PDF enviado: %s (%s bytes)", pdf_name, file_size)
                     return
                     
                 except Exception as e:
-                    print(f"❌ Erro ao enviar PDF: {e}")
+                    logger.error("❌ Erro ao enviar PDF: %s", e)
                     self.send_error(500, f'Erro ao enviar PDF: {str(e)}')
                     return
             else:
-                print(f"❌ PDF não encontrado: {pdf_path}")
+                logger.error("❌ PDF não encontrado: %s", pdf_path)
                 self.send_error(404, 'PDF não encontrado')
                 return
         else:
@@ -68,7 +114,7 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
         """Processa requisições POST para análise NPS"""
         if self.path == '/api/analyze':
             try:
-                print("📨 REQUISIÇÃO RECEBIDA")
+                logger.info("📨 REQUISIÇÃO RECEBIDA")
                 
                 # Ler dados da requisição
                 content_length = int(self.headers['Content-Length'])
@@ -78,31 +124,50 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                 sheets_url = data.get('sheets_url', '')
                 loja_nome = data.get('loja_nome', 'Sistema')
                 
-                print(f"📋 Dados recebidos: {data}")
+                logger.debug("📋 Dados recebidos: %s", data)
                 
-                # Headers CORS
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
-                self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-                self.end_headers()
+                # Prazo conta desde a chegada (inclui a espera na fila)
+                prazo = self._prazo(data)
                 
-                # Executar análise real
-                print("🚀 Iniciando análise...")
-                result = self.run_nps_analysis(sheets_url, loja_nome)
+                # Cliente desconectado cancela a análise, inclusive na fila
+                with usar_prazo(prazo), vigiar_conexao(self.connection, prazo):
+                    # Vaga de execução antes dos headers (sem vaga: 429/504 já respondidos)
+                    vaga = self._admitir()
+                    if vaga is None:
+                        return
+                    
+                    with vaga:
+                        # Headers CORS
+                        self.send_response(200)
+                        self.send_header('Content-type', 'application/json; charset=utf-8')
+                        self.send_header('Access-Control-Allow-Origin', '*')
+                        self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
+                        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+                        self.end_headers()
                 
-                # Retornar resultado
-                response = json.dumps(result, ensure_ascii=False, indent=2)
-                self.wfile.write(response.encode('utf-8'))
-                self.wfile.flush()
+                        # Executar análise real
+                        logger.debug("🚀 Iniciando análise...")
+                        # Perfilador opcional: campo "perfil" ou header X-Profile
+                        if perfil_solicitado(data.get('perfil'), self.headers.get('X-Profile')):
+                            contexto_perfil = perfilar('analise')
+                        else:
+                            contexto_perfil = nullcontext()
                 
-                print("📤 RESPOSTA ENVIADA")
+                        with coletar_etapas() as etapas, contexto_perfil as perfil:
+                            result = self._com_prazo(self.run_nps_analysis, sheets_url, loja_nome)
+                        result['etapas'] = etapas
+                        if perfil is not None and perfil.arquivo:
+                            result['perfil_url'] = f'/relatorios/{perfil.arquivo}'
+                
+                        # Retornar resultado
+                        response = json.dumps(result, ensure_ascii=False, indent=2)
+                        self.wfile.write(response.encode('utf-8'))
+                        self.wfile.flush()
+                
+                logger.info("📤 RESPOSTA ENVIADA")
                 
             except Exception as e:
-                print(f"❌ ERRO NO SERVIDOR: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("❌ ERRO NO SERVIDOR: %s", e)
                 
                 try:
                     self.send_response(500)
@@ -120,7 +185,7 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
         
         elif self.path == '/api/analyze-multi':
             try:
-                print("📨 REQUISIÇÃO MULTI-ABAS RECEBIDA")
+                logger.info("📨 REQUISIÇÃO MULTI-ABAS RECEBIDA")
                 
                 # Ler dados da requisição
                 content_length = int(self.headers['Content-Length'])
@@ -130,31 +195,42 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                 sheets_url = data.get('sheets_url', '')
                 loja_nome = data.get('loja_nome', 'Sistema')
                 
-                print(f"📋 Dados recebidos: {data}")
+                logger.debug("📋 Dados recebidos: %s", data)
                 
-                # Headers CORS
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
-                self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-                self.end_headers()
+                # Prazo conta desde a chegada (inclui a espera na fila)
+                prazo = self._prazo(data)
+                
+                # Cliente desconectado cancela a análise, inclusive na fila
+                with usar_prazo(prazo), vigiar_conexao(self.connection, prazo):
+                    # Vaga de execução antes dos headers (sem vaga: 429/504 já respondidos)
+                    vaga = self._admitir()
+                    if vaga is None:
+                        return
+                    
+                    with vaga:
+                        # Headers CORS
+                        self.send_response(200)
+                        self.send_header('Content-type', 'application/json; charset=utf-8')
+                        self.send_header('Access-Control-Allow-Origin', '*')
+                        self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
+                        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+                        self.end_headers()
                 
-                # Executar análise multi-abas
-                print("🚀 Iniciando análise multi-abas...")
-                result = self.run_multi_sheet_analysis(sheets_url, loja_nome)
+                        # Executar análise multi-abas
+                        logger.debug("🚀 Iniciando análise multi-abas...")
+                        with coletar_etapas() as etapas:
+                            result = self._com_prazo(self.run_multi_sheet_analysis, sheets_url, loja_nome)
+                        result['etapas'] = etapas
                 
-                # Retornar resultado
-                response = json.dumps(result, ensure_ascii=False, indent=2)
-                self.wfile.write(response.encode('utf-8'))
-                self.wfile.flush()
+                        # Retornar resultado
+                        response = json.dumps(result, ensure_ascii=False, indent=2)
+                        self.wfile.write(response.encode('utf-8'))
+                        self.wfile.flush()
                 
-                print("📤 RESPOSTA MULTI-ABAS ENVIADA")
+                logger.info("📤 RESPOSTA MULTI-ABAS ENVIADA")
                 
             except Exception as e:
-                print(f"❌ ERRO NO SERVIDOR MULTI-ABAS: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("❌ ERRO NO SERVIDOR MULTI-ABAS: %s", e)
                 
                 try:
                     self.send_response(500)
@@ -173,94 +249,141 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
         else:
             self.send_error(404, 'Endpoint não encontrado')
     
+    def _prazo(self, data):
+        """Prazo da análise (PRAZO_ANALISE, reduzido por X-Prazo/prazo_s do cliente)"""
+        segundos = segundos_da_requisicao(self.headers.get('X-Prazo') or data.get('prazo_s'))
+        return Prazo(segundos) if segundos else None
+    
+    def _com_prazo(self, analise, *args):
+        """Executa a análise; prazo esgotado ou cliente desconectado viram falha no resultado"""
+        try:
+            return analise(*args)
+        except PrazoEsgotado as e:
+            logger.warning("⏱️ Análise interrompida: %s", e)
+            return {
+                'success': False,
+                'error': str(e),
+                'etapa': e.etapa
+            }
+    
+    def _admitir(self):
+        """Vaga para a análise (None se a recusa ou o prazo esgotado já foram respondidos)"""
+        try:
+            return admitir_analise()
+        except AnaliseRecusada as e:
+            self._responder_recusa(e)
+        except PrazoEsgotado as e:
+            logger.warning("⏱️ Análise desistiu na fila: %s", e)
+            if e.motivo == 'cliente':
+                # Ninguém para receber a resposta
+                self.close_connection = True
+                return None
+            self._responder_json(504, {
+                'success': False,
+                'error': str(e),
+                'etapa': e.etapa
+            })
+        return None
+    
+    def _responder_json(self, status, corpo, headers=None):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(json.dumps(corpo, ensure_ascii=False).encode('utf-8'))
+    
+    def _responder_recusa(self, recusa):
+        """429 com Retry-After quando a análise não foi admitida"""
+        self._responder_json(429, {
+            'success': False,
+            'error': str(recusa),
+            'retry_after': recusa.retry_after
+        }, {'Retry-After': str(recusa.retry_after)})
+    
     def do_OPTIONS(self):
         """Permitir CORS"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Profile, X-Prazo')
         self.end_headers()
     
     def run_nps_analysis(self, sheets_url, loja_nome):
         """Executa a análise NPS real usando o backend Python"""
         try:
-            print(f"🚀 INICIANDO ANÁLISE NPS")
-            print(f"🔗 URL: {sheets_url}")
-            print(f"🏪 Loja: {loja_nome}")
+            logger.debug("🚀 INICIANDO ANÁLISE NPS")
+            logger.debug("🔗 URL: %s", sheets_url)
+            logger.debug("🏪 Loja: %s", loja_nome)
             
             # Importar módulos do sistema NPS
             sys.path.append(os.path.dirname(FRONTEND_DIR))
             
             from nps_extractor import NPSExtractor
             from calculadora_metricas import CalculadoraMetricas
-            from gerador_relatorio_pdf import GeradorRelatorioPDF
             from datetime import datetime
             
-            # 1. Extrair dados
-            print(f"🔍 PASSO 1: Conectando com planilha...")
-            extractor = NPSExtractor()
-            
-            if not extractor.conectar_sheets(sheets_url):
-                print("❌ Falha na conexão")
-                return {
-                    'success': False,
-                    'error': 'Falha na conexão com a planilha. Verifique se está pública.'
-                }
-            
-            print("✅ Conexão estabelecida!")
-            dados = extractor.extrair_avaliacoes()
-            
-            if dados is None or len(dados) == 0:
-                print("❌ Nenhum dado encontrado")
-                return {
-                    'success': False,
-                    'error': 'Nenhum dado válido encontrado na planilha.'
-                }
+            # 1. Extrair dados (snapshot do aquecedor, se ainda válido)
+            aquecida = obter_aquecida(sheets_url)
+            if aquecida is not None:
+                logger.debug("🔥 PASSO 1: Usando snapshot aquecido da planilha")
+                dados, cubo, origem = aquecida['dados'], aquecida['cubo'], aquecida['sheet_id']
+            else:
+                logger.debug("🔍 PASSO 1: Conectando com planilha...")
+                extractor = NPSExtractor()
+                
+                if not extractor.conectar_sheets(sheets_url):
+                    logger.error("❌ Falha na conexão")
+                    return {
+                        'success': False,
+                        'error': 'Falha na conexão com a planilha. Verifique se está pública.'
+                    }
+                
+                logger.debug("✅ Conexão estabelecida!")
+                dados = extractor.extrair_avaliacoes()
+                
+                if dados is None or len(dados) == 0:
+                    logger.error("❌ Nenhum dado encontrado")
+                    return {
+                        'success': False,
+                        'error': 'Nenhum dado válido encontrado na planilha.'
+                    }
+                
+                cubo, origem = None, extractor._extrair_sheet_id(sheets_url)
+                registrar(sheets_url)
             
-            print(f"✅ {len(dados)} registros extraídos")
+            logger.debug("✅ %s registros extraídos", len(dados))
             
             # 2. Calcular métricas
-            print("📊 PASSO 2: Calculando métricas...")
-            calculadora = CalculadoraMetricas(dados)
+            logger.debug("📊 PASSO 2: Calculando métricas...")
+            calculadora = CalculadoraMetricas(dados, cubo=cubo, origem=origem)
             metricas = calculadora.calcular_todas_metricas()
             
             if not metricas:
-                print("❌ Erro no cálculo de métricas")
+                logger.error("❌ Erro no cálculo de métricas")
                 return {
                     'success': False,
                     'error': 'Erro ao calcular métricas NPS.'
                 }
             
-            print("✅ Métricas calculadas!")
+            logger.debug("✅ Métricas calculadas!")
             
-            # 3. Gerar PDF
-            print("📄 PASSO 3: Gerando relatório PDF...")
-            gerador = GeradorRelatorioPDF(metricas)
-            sucesso = gerador.gerar_relatorio_completo(loja_nome)
-            
-            if not sucesso:
-                print("❌ Erro na geração do PDF")
-                return {
-                    'success': False,
-                    'error': 'Erro ao gerar relatório PDF.'
-                }
-            
-            print("✅ PDF gerado!")
-            
-            # 4. Salvar arquivo
-            print("💾 PASSO 4: Salvando arquivo...")
+            # 3. Gerar e salvar PDF no pool de renderização
+            logger.debug("📄 PASSO 3: Gerando relatório PDF...")
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             nome_arquivo = f"relatorio_nps_{loja_nome.replace(' ', '_')}_{timestamp}.pdf"
-            caminho_arquivo = gerador.salvar_pdf(nome_arquivo)
+            caminho_arquivo = gerar_pdf('relatorio_completo', linhas=len(dados), metricas=metricas,
+                                        titulo=loja_nome, nome_arquivo=nome_arquivo)
             
             if not caminho_arquivo:
-                print("❌ Erro ao salvar PDF")
+                logger.error("❌ Erro na geração do PDF")
                 return {
                     'success': False,
-                    'error': 'Erro ao salvar arquivo PDF.'
+                    'error': 'Erro ao gerar relatório PDF.'
                 }
             
-            print(f"✅ Arquivo salvo: {nome_arquivo}")
+            logger.info("✅ Arquivo salvo: %s", nome_arquivo)
             
             # 5. Preparar resposta
             resumo = calculadora.obter_resumo()
@@ -279,20 +402,20 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                 'rankings': {
                     'lojas': metricas.get('ranking_lojas', [])[:3],
                     'vendedores': metricas.get('ranking_vendedores', [])[:3]
-                }
+                },
+                # Etapas opcionais puladas/servidas do cache pelo prazo
+                'degradado': metricas.get('degradacao', {})
             }
             
-            print("🎉 ANÁLISE CONCLUÍDA COM SUCESSO!")
-            print(f"📊 NPS: {result['metrics']['nps_score']}")
-            print(f"📋 Respostas: {result['metrics']['total_responses']}")
-            print(f"⭐ Nota: {result['metrics']['avg_rating']}")
+            logger.info("🎉 ANÁLISE CONCLUÍDA COM SUCESSO!")
+            logger.debug("📊 NPS: %s", result['metrics']['nps_score'])
+            logger.debug("📋 Respostas: %s", result['metrics']['total_responses'])
+            logger.debug("⭐ Nota: %s", result['metrics']['avg_rating'])
             
             return result
             
         except Exception as e:
-            print(f"❌ ERRO CRÍTICO: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ ERRO CRÍTICO: %s", e)
             return {
                 'success': False,
                 'error': f'Erro interno: {str(e)}'
@@ -301,17 +424,17 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
     def run_multi_sheet_analysis(self, sheets_url, loja_nome):
         """Executa análise de múltiplas abas"""
         try:
-            print(f"🚀 ANÁLISE MULTI-ABAS")
-            print(f"🔗 URL: {sheets_url}")
-            print(f"🏪 Loja: {loja_nome}")
+            logger.info("🚀 ANÁLISE MULTI-ABAS")
+            logger.debug("🔗 URL: %s", sheets_url)
+            logger.debug("🏪 Loja: %s", loja_nome)
             
             # Importar módulos necessários
             sys.path.append(os.path.dirname(FRONTEND_DIR))
             import re
+            import io
             import pandas as pd
-            import requests
+            from sessao_http import obter_sessao, URL_BASE_DOCS
             from calculadora_metricas import CalculadoraMetricas
-            from gerador_relatorio_pdf import GeradorRelatorioPDF
             from datetime import datetime
             
             # Extrair ID da planilha
@@ -323,10 +446,10 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                 }
             
             sheet_id = sheet_id_match.group(1)
-            print(f"📋 ID da planilha: {sheet_id}")
+            logger.debug("📋 ID da planilha: %s", sheet_id)
             
             # Listar abas disponíveis
-            print("🔍 Procurando abas disponíveis...")
+            logger.debug("🔍 Procurando abas disponíveis...")
             abas_encontradas = []
             
             # Testa alguns GIDs comuns
@@ -334,15 +457,17 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
             
             for gid in gids_teste:
                 try:
-                    url_teste = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
-                    response = requests.get(url_teste, timeout=10)
+                    url_teste = f"{URL_BASE_DOCS}/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+                    response = obter_sessao().get(url_teste, timeout=10)
                     
-                    if response.status_code == 200 and len(response.text) > 50:
-                        dados = pd.read_csv(url_teste)
+                    if response.status_code == 200 and len(response.content) > 50:
+                        # Reaproveita o corpo já baixado em vez de buscar a URL de novo
+                        dados = pd.read_csv(io.BytesIO(response.content))
                         if not dados.empty:
                             abas_encontradas.append({
                                 'gid': gid,
                                 'url': url_teste,
+                                'dados': dados,
                                 'registros': len(dados),
                                 'colunas': list(dados.columns)
                             })
@@ -355,32 +480,42 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                     'error': 'Nenhuma aba encontrada ou planilha não pública'
                 }
             
-            print(f"✅ {len(abas_encontradas)} aba(s) encontrada(s)")
+            logger.debug("✅ %s aba(s) encontrada(s)", len(abas_encontradas))
             
-            # Processar cada aba
-            resultados = []
-            arquivos_gerados = []
+            # Calcula as métricas de cada aba e agenda os PDFs no pool;
+            # as abas são renderizadas em paralelo
+            pendentes = []
             
             for aba in abas_encontradas:
                 try:
-                    print(f"📊 Processando aba GID {aba['gid']} - {aba['registros']} registros")
+                    logger.debug("📊 Processando aba GID %s - %s registros", aba['gid'], aba['registros'])
                     
-                    # Lê dados da aba
-                    dados = pd.read_csv(aba['url'])
+                    # Dados da aba já carregados na descoberta
+                    dados = aba['dados']
                     
                     # Calcula métricas
-                    calculadora = CalculadoraMetricas(dados)
+                    calculadora = CalculadoraMetricas(dados, origem=f"{sheet_id}_gid{aba['gid']}")
                     metricas = calculadora.calcular_todas_metricas()
                     
-                    # Gera relatório
-                    gerador = GeradorRelatorioPDF(metricas)
-                    sucesso = gerador.gerar_relatorio_completo(f"{loja_nome} - Aba {aba['gid']}")
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    nome_arquivo = f"relatorio_aba_{aba['gid']}_{timestamp}.pdf"
+                    futuro = submeter_pdf('relatorio_completo', metricas=metricas,
+                                          titulo=f"{loja_nome} - Aba {aba['gid']}", nome_arquivo=nome_arquivo)
                     
-                    if sucesso:
-                        # Salva PDF
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        nome_arquivo = f"relatorio_aba_{aba['gid']}_{timestamp}.pdf"
-                        caminho_pdf = gerador.salvar_pdf(nome_arquivo)
+                    pendentes.append((aba, calculadora, metricas, nome_arquivo, futuro))
+                        
+                except Exception as e:
+                    logger.error("❌ Erro na aba %s: %s", aba['gid'], e)
+                    continue
+            
+            # Coleta os PDFs na ordem das abas
+            resultados = []
+            arquivos_gerados = []
+            
+            with medir_etapa('pdf', linhas=sum(p[0]['registros'] for p in pendentes)):
+                for aba, calculadora, metricas, nome_arquivo, futuro in pendentes:
+                    try:
+                        caminho_pdf = aguardar_pdf(futuro)
                         
                         if caminho_pdf:
                             resumo = calculadora.obter_resumo()
@@ -388,7 +523,7 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                             
                             resultado_aba = {
                                 'gid': aba['gid'],
-                                'registros': len(dados),
+                                'registros': aba['registros'],
                                 'file_path': caminho_pdf,
                                 'file_name': nome_arquivo,
                                 'nps_score': round(nps_geral, 1),
@@ -399,11 +534,11 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
                             resultados.append(resultado_aba)
                             arquivos_gerados.append(nome_arquivo)
                             
-                            print(f"✅ Aba {aba['gid']}: NPS {nps_geral:.1f}, {len(dados)} registros")
-                        
-                except Exception as e:
-                    print(f"❌ Erro na aba {aba['gid']}: {e}")
-                    continue
+                            logger.info("✅ Aba %s: NPS %.1f, %s registros", aba['gid'], nps_geral, aba['registros'])
+                    
+                    except Exception as e:
+                        logger.error("❌ Erro na aba %s: %s", aba['gid'], e)
+                        continue
             
             if not resultados:
                 return {
@@ -427,9 +562,7 @@ class DashBotHandler(http.server.SimpleHTTPRequestHandler):
             }
             
         except Exception as e:
-            print(f"❌ ERRO CRÍTICO MULTI-ABAS: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ ERRO CRÍTICO MULTI-ABAS: %s", e)
             return {
                 'success': False,
                 'error': f'Erro interno: {str(e)}'
@@ -439,9 +572,12 @@ def start_server():
     """Inicia o servidor web universal"""
     try:
         # Permite reutilizar a porta
-        socketserver.TCPServer.allow_reuse_address = True
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        # Uma thread por requisição: consultas não esperam análises e o
+        # controle de admissão arbitra as análises simultâneas
+        socketserver.ThreadingTCPServer.daemon_threads = True
         
-        with socketserver.TCPServer(("", PORT), DashBotHandler) as httpd:
+        with socketserver.ThreadingTCPServer(("", PORT), DashBotHandler) as httpd:
             print("🚀 ANALYTICS UNIVERSAL - IA GPT-4o")
             print("=" * 60)
             print(f"📡 Servidor: http://localhost:{PORT}")
@@ -453,10 +589,15 @@ def start_server():
             print()
             
             # Abrir navegador automaticamente
-            try:
-                webbrowser.open(f'http://localhost:{PORT}')
-            except:
-                print("🌐 Abra manualmente: http://localhost:8080")
+            if ABRIR_NAVEGADOR:
+                try:
+                    webbrowser.open(f'http://localhost:{PORT}')
+                except:
+                    print(f"🌐 Abra manualmente: http://localhost:{PORT}")
+            
+            # Sobe os workers de PDF e o aquecimento das planilhas antes da primeira requisição
+            aquecer_pool()
+            iniciar_aquecedor()
             
             # Iniciar servidor
             httpd.serve_forever()
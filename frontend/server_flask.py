@@ -9,18 +9,34 @@ from flask_cors import CORS
 import os
 import sys
 import json
+import logging
 import threading
 import webbrowser
 from datetime import datetime
+from contextlib import nullcontext
 
 # Adiciona o diretório pai ao path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from instrumentacao import coletar_etapas, exportar_prometheus
+from perfilador import perfil_solicitado, perfilar
+from configuracao_log import configurar_logging
+from pool_renderizacao import gerar_pdf, aquecer_pool
+from api_consultas import consultar
+from aquecedor_planilhas import iniciar_aquecedor, obter_aquecida, registrar
+from historico_nps import filtrar_periodo
+from controle_admissao import AnaliseRecusada, admitir_analise, estimar_memoria_mb
+from prazo import Prazo, PrazoEsgotado, segundos_da_requisicao, usar_prazo, vigiar_conexao
+
+configurar_logging()
+logger = logging.getLogger('server_flask')
+
 app = Flask(__name__)
 CORS(app)  # Permite CORS para todas as rotas
 
 # Configurações
-PORT = 8080
+PORT = int(os.environ.get('PORT', '8080'))
+ABRIR_NAVEGADOR = os.environ.get('ABRIR_NAVEGADOR', '1') != '0'
 FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.dirname(FRONTEND_DIR)
 
@@ -40,6 +56,18 @@ def serve_reports(filename):
     relatorios_dir = os.path.join(BASE_DIR, 'relatorios')
     return send_from_directory(relatorios_dir, filename)
 
+@app.route('/api/metrics')
+def metrics():
+    """Métricas por etapa do pipeline no formato texto do Prometheus"""
+    return exportar_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/api/<any(kpis, ranking, distribuicao, serie):consulta>')
+def consultas(consulta):
+    """Consultas do dashboard a partir dos agregados salvos (sem extração, IA ou PDF)"""
+    parametros = {chave: ','.join(valores) for chave, valores in request.args.lists()}
+    status, resposta = consultar(consulta, parametros)
+    return jsonify(resposta), status
+
 @app.route('/api/analyze', methods=['POST', 'OPTIONS'])
 def analyze_data():
     """Endpoint principal para análise universal - Suporte para upload e URLs"""
@@ -49,23 +77,56 @@ def analyze_data():
         return '', 200
     
     try:
-        print("📨 NOVA REQUISIÇÃO DE ANÁLISE")
+        logger.info("📨 NOVA REQUISIÇÃO DE ANÁLISE")
         
-        # Verifica se é upload de arquivo ou URL
-        if 'file' in request.files:
-            # Upload de arquivo CSV
-            result = handle_file_upload()
-        else:
-            # URL do Google Sheets (método original)
-            result = handle_sheets_url()
+        # Perfilador opcional: campo "perfil" ou header X-Profile
+        campos = request.form if 'file' in request.files else (request.get_json(silent=True) or {})
+        campo_perfil = campos.get('perfil')
+        contexto_perfil = perfilar('analise') if perfil_solicitado(campo_perfil, request.headers.get('X-Profile')) else nullcontext()
+        
+        # Vaga de execução + memória reservada (uploads reservam pelo tamanho)
+        memoria_mb = estimar_memoria_mb(request.content_length if 'file' in request.files else None)
+        
+        # Prazo da análise (PRAZO_ANALISE, reduzido por X-Prazo/prazo_s do cliente);
+        # cliente desconectado cancela o prazo
+        segundos = segundos_da_requisicao(request.headers.get('X-Prazo') or campos.get('prazo_s'))
+        prazo = Prazo(segundos) if segundos else None
         
-        print("✅ ANÁLISE CONCLUÍDA")
+        # Verifica se é upload de arquivo ou URL
+        with usar_prazo(prazo), vigiar_conexao(request.environ.get('werkzeug.socket'), prazo), \
+                coletar_etapas() as etapas, admitir_analise(memoria_mb), contexto_perfil as perfil:
+            if 'file' in request.files:
+                # Upload de arquivo CSV
+                result = handle_file_upload()
+            else:
+                # URL do Google Sheets (método original)
+                result = handle_sheets_url()
+        
+        # Tempo por etapa do job (auth, fetch, parse, clean, calcular_*, pdf...)
+        result['etapas'] = etapas
+        if perfil is not None and perfil.arquivo:
+            result['perfil_url'] = f'/relatorios/{perfil.arquivo}'
+        
+        logger.info("✅ ANÁLISE CONCLUÍDA")
         return jsonify(result)
         
+    except AnaliseRecusada as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }), 429, {'Retry-After': str(e.retry_after)}
+        
+    except PrazoEsgotado as e:
+        logger.warning("⏱️ Análise interrompida: %s", e)
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'etapa': e.etapa
+        }), 504
+        
     except Exception as e:
-        print(f"❌ ERRO NA API: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ ERRO NA API: %s", e)
         
         return jsonify({
             'success': False,
@@ -74,7 +135,7 @@ def analyze_data():
 
 def handle_file_upload():
     """Processa upload de arquivo CSV"""
-    print("📤 Processando upload de arquivo...")
+    logger.debug("📤 Processando upload de arquivo...")
     
     file = request.files['file']
     if not file or file.filename == '':
@@ -89,10 +150,10 @@ def handle_file_upload():
     gerar_ia = request.form.get('gerar_ia', 'false').lower() == 'true'
     estilo_pdf = request.form.get('estilo_pdf', 'moderno')  # NOVO: Estilo do PDF
     
-    print(f"🏢 Loja: {loja_nome}")
-    print(f"📊 Usar Looker: {usar_looker}")
-    print(f"🤖 Gerar IA: {gerar_ia}")
-    print(f"🎨 Estilo PDF: {estilo_pdf}")
+    logger.debug("🏢 Loja: %s", loja_nome)
+    logger.debug("📊 Usar Looker: %s", usar_looker)
+    logger.debug("🤖 Gerar IA: %s", gerar_ia)
+    logger.debug("🎨 Estilo PDF: %s", estilo_pdf)
     
     # Salva arquivo temporário
     import tempfile
@@ -104,14 +165,13 @@ def handle_file_upload():
         # Carrega dados do CSV
         import pandas as pd
         dados = pd.read_csv(csv_path, encoding='utf-8')
-        print(f"✅ {len(dados)} registros carregados do CSV")
-        print(f"📋 Colunas: {list(dados.columns)}")
+        logger.debug("✅ %s registros carregados do CSV", len(dados))
+        logger.debug("📋 Colunas: %s", list(dados.columns))
         
         # Executar análise direta com PDF executivo simples
         from calculadora_metricas import CalculadoraMetricas
-        from gerador_pdf_executivo_simples import GeradorPDFExecutivoSimples
         
-        print("🧠 Calculando métricas dos dados...")
+        logger.debug("🧠 Calculando métricas dos dados...")
         calculadora = CalculadoraMetricas(dados)
         metricas = calculadora.calcular_todas_metricas()
         
@@ -131,9 +191,9 @@ def handle_file_upload():
             'vendedores': metricas.get('analise_vendedores', [])
         }
         
-        # Gerar PDF executivo simples
-        gerador = GeradorPDFExecutivoSimples()
-        caminho_arquivo = gerador.gerar_pdf_executivo_simples(dados_pdf, loja_nome)
+        # Gerar PDF executivo simples (pool de renderização)
+        caminho_arquivo = gerar_pdf('executivo_simples', linhas=dados_pdf['total_avaliacoes'],
+                                    dados_pdf=dados_pdf, loja_nome=loja_nome)
         
         if not caminho_arquivo:
             return {
@@ -141,7 +201,6 @@ def handle_file_upload():
                 'error': 'Erro ao gerar relatório PDF.'
             }
         
-        import os
         nome_arquivo = os.path.basename(caminho_arquivo)
         
         result = {
@@ -153,7 +212,9 @@ def handle_file_upload():
                 'nps_score': dados_pdf['nps_final'],
                 'total_registros': dados_pdf['total_avaliacoes']
             },
-            'tipo_relatorio': 'PDF Executivo Simples'
+            'tipo_relatorio': 'PDF Executivo Simples',
+            # Etapas opcionais puladas/servidas do cache pelo prazo
+            'degradado': metricas.get('degradacao', {})
         }
         
         # Remove arquivo temporário
@@ -161,15 +222,15 @@ def handle_file_upload():
         
         return result
         
-    except Exception as e:
-        # Remove arquivo temporário em caso de erro
+    except BaseException as e:
+        # Remove arquivo temporário em caso de erro (inclusive prazo esgotado)
         if os.path.exists(csv_path):
             os.unlink(csv_path)
         raise e
 
 def handle_sheets_url():
     """Processa URL do Google Sheets (método original)"""
-    print("🔗 Processando URL do Google Sheets...")
+    logger.debug("🔗 Processando URL do Google Sheets...")
     
     data = request.get_json()
     if not data:
@@ -181,10 +242,12 @@ def handle_sheets_url():
     sheets_url = data.get('sheets_url', '')
     loja_nome = data.get('loja_nome', 'Análise Universal')
     estilo_pdf = data.get('estilo_pdf', 'executivo_simples')  # Novo parâmetro
+    desde = data.get('desde')  # Período opcional ('AAAA-MM'), lido do histórico
+    ate = data.get('ate')
     
-    print(f"🔗 URL: {sheets_url}")
-    print(f"🏢 Projeto: {loja_nome}")
-    print(f"🎨 Estilo PDF: {estilo_pdf}")
+    logger.debug("🔗 URL: %s", sheets_url)
+    logger.debug("🏢 Projeto: %s", loja_nome)
+    logger.debug("🎨 Estilo PDF: %s", estilo_pdf)
     
     if not sheets_url:
         return {
@@ -193,41 +256,64 @@ def handle_sheets_url():
         }
     
     # Executa análise original
-    return run_analysis(sheets_url, loja_nome, estilo_pdf)
+    return run_analysis(sheets_url, loja_nome, estilo_pdf, desde=desde, ate=ate)
 
-def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples'):
+def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples', desde=None, ate=None):
     """Executa análise e gera PDF executivo simples"""
     try:
-        print(f"📊 INICIANDO DASHBOARD EXECUTIVO para: {loja_nome}")
+        logger.info("📊 INICIANDO DASHBOARD EXECUTIVO para: %s", loja_nome)
         
         # Importa apenas o necessário
         from nps_extractor import NPSExtractor
         from calculadora_metricas import CalculadoraMetricas
-        from gerador_pdf_executivo_simples import GeradorPDFExecutivoSimples
-        
-        # 1. EXTRAÇÃO DOS DADOS
-        print("🔍 PASSO 1: Extraindo dados da planilha...")
-        extractor = NPSExtractor()
-        
-        if not extractor.conectar_sheets(sheets_url):
-            return {
-                'success': False,
-                'error': 'Não foi possível conectar com a planilha. Verifique se está pública.'
-            }
-        
-        dados = extractor.extrair_avaliacoes()
-        
-        if dados is None or len(dados) == 0:
-            return {
-                'success': False,
-                'error': 'Nenhum dado encontrado na planilha. Verifique se há dados válidos.'
-            }
         
-        print(f"✅ {len(dados)} registros extraídos")
+        # 1. EXTRAÇÃO DOS DADOS (snapshot do aquecedor, se ainda válido)
+        aquecida = obter_aquecida(sheets_url)
+        if aquecida is not None:
+            logger.debug("🔥 PASSO 1: Usando snapshot aquecido da planilha")
+            dados, cubo, origem = aquecida['dados'], aquecida['cubo'], aquecida['sheet_id']
+        else:
+            logger.debug("🔍 PASSO 1: Extraindo dados da planilha...")
+            extractor = NPSExtractor()
+            
+            if not extractor.conectar_sheets(sheets_url):
+                return {
+                    'success': False,
+                    'error': 'Não foi possível conectar com a planilha. Verifique se está pública.'
+                }
+            
+            dados = extractor.extrair_avaliacoes()
+            
+            if dados is None or len(dados) == 0:
+                return {
+                    'success': False,
+                    'error': 'Nenhum dado encontrado na planilha. Verifique se há dados válidos.'
+                }
+            
+            # O cubo de contagens fica salvo ao lado do dataset (ID da planilha)
+            cubo, origem = None, extractor._extrair_sheet_id(sheets_url)
+            registrar(sheets_url)
+        
+        logger.debug("✅ %s registros extraídos", len(dados))
         
         # 2. ANÁLISE DAS MÉTRICAS
-        print("🧠 PASSO 2: Calculando métricas NPS...")
-        calculadora = CalculadoraMetricas(dados)
+        logger.debug("🧠 PASSO 2: Calculando métricas NPS...")
+        if desde or ate:
+            # Período: só as partições mensais do histórico que a consulta usa
+            calculadora = CalculadoraMetricas.do_historico(origem, desde=desde, ate=ate)
+            if calculadora is None:
+                # Histórico desativado, sem coluna de data ou não sincronizado:
+                # recorta em memória os dados que acabaram de ser extraídos
+                recorte = filtrar_periodo(dados, desde=desde, ate=ate)
+                if recorte is None or len(recorte) == 0:
+                    return {
+                        'success': False,
+                        'error': 'Nenhum dado da planilha no período informado.'
+                    }
+                calculadora = CalculadoraMetricas(recorte)
+            dados = calculadora.dados
+        else:
+            calculadora = CalculadoraMetricas(dados, cubo=cubo, origem=origem)
         metricas = calculadora.calcular_todas_metricas()
         
         if not metricas:
@@ -237,9 +323,7 @@ def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples'):
             }
         
         # 3. GERAÇÃO DO PDF EXECUTIVO SIMPLES
-        print("📄 PASSO 3: Gerando relatório PDF executivo...")
-        
-        gerador = GeradorPDFExecutivoSimples()
+        logger.debug("📄 PASSO 3: Gerando relatório PDF executivo...")
         
         # Preparar dados para o PDF
         dados_pdf = {
@@ -251,10 +335,11 @@ def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples'):
             'vendedores': metricas.get('analise_vendedores', [])
         }
         
-        print(f"🎯 Métricas: NPS {dados_pdf['nps_final']}, {dados_pdf['total_avaliacoes']} avaliações")
+        logger.debug("🎯 Métricas: NPS %s, %s avaliações", dados_pdf['nps_final'], dados_pdf['total_avaliacoes'])
         
-        # Gerar PDF executivo simples
-        caminho_arquivo = gerador.gerar_pdf_executivo_simples(dados_pdf, loja_nome)
+        # Gerar PDF executivo simples fora do processo web
+        caminho_arquivo = gerar_pdf('executivo_simples', linhas=dados_pdf['total_avaliacoes'],
+                                    dados_pdf=dados_pdf, loja_nome=loja_nome)
         
         if not caminho_arquivo:
             return {
@@ -266,7 +351,7 @@ def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples'):
         import os
         nome_arquivo = os.path.basename(caminho_arquivo)
         
-        print(f"✅ PDF executivo gerado: {nome_arquivo}")
+        logger.info("✅ PDF executivo gerado: %s", nome_arquivo)
         
         # Retornar estrutura compatível com frontend
         return {
@@ -281,13 +366,13 @@ def run_analysis(sheets_url, loja_nome, estilo_pdf='executivo_simples'):
                 'neutros_count': dados_pdf['neutros_count'],
                 'detratores_count': dados_pdf['detratores_count']
             },
-            'tipo_relatorio': 'PDF Executivo Simples'
+            'tipo_relatorio': 'PDF Executivo Simples',
+            # Etapas opcionais puladas/servidas do cache pelo prazo
+            'degradado': metricas.get('degradacao', {})
         }
         
     except Exception as e:
-        print(f"❌ ERRO NO DASHBOARD: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ ERRO NO DASHBOARD: %s", e)
         
         return {
             'success': False,
@@ -314,9 +399,14 @@ def start_server():
         try:
             webbrowser.open(f'http://localhost:{PORT}')
         except:
-            print("🌐 Abra manualmente: http://localhost:8080")
+            print(f"🌐 Abra manualmente: http://localhost:{PORT}")
+    
+    if ABRIR_NAVEGADOR:
+        threading.Thread(target=open_browser, daemon=True).start()
     
-    threading.Thread(target=open_browser, daemon=True).start()
+    # Sobe os workers de PDF e o aquecimento das planilhas antes da primeira requisição
+    aquecer_pool()
+    iniciar_aquecedor()
     
     # Inicia servidor Flask
     app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Histórico NPS em disco, particionado por mês
+Cada planilha ganha uma pasta com uma partição colunar (.npy mapeável, ver
+dataset_compartilhado) por mês de 'Data' e, opcionalmente, por loja. Meses
+fechados ficam congelados: só o mês corrente (e as linhas sem data) são
+regravados a cada sincronização. As leituras abrem apenas as partições
+pedidas.
+
+Com extração autenticada, o manifesto guarda a primeira linha da planilha
+que ainda não está congelada; a próxima extração lê só dali em diante
+(supõe planilha de respostas, em que linhas novas entram no fim).
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dataset_compartilhado import anexar, gravar_colunas, ler_descritor
+from esquema_colunas import assinatura, obter_esquema
+
+logger = logging.getLogger(__name__)
+
+
+# Pasta do histórico ('' desativa), partição por loja e dias após o fim do
+# mês em que ele ainda é atualizado (respostas atrasadas)
+PASTA_HISTORICO = os.environ.get('HISTORICO_DIR', os.path.join('cache', 'historico'))
+POR_LOJA = os.environ.get('HISTORICO_POR_LOJA', '0').lower() in ('1', 'true', 'sim')
+CARENCIA_DIAS = int(os.environ.get('HISTORICO_CARENCIA_DIAS', '3'))
+# Extração autenticada só das linhas após os meses congelados
+INCREMENTAL = os.environ.get('HISTORICO_INCREMENTAL', '1').lower() in ('1', 'true', 'sim')
+
+VERSAO_HISTORICO = 1
+SEM_DATA = 'sem-data'
+# Posição da linha na planilha (índice dos dados limpos), guardada nas partições
+COLUNA_LINHA = '_linha_planilha'
+
+_lock = threading.Lock()
+
+
+def _chaves_mes(datas):
+    """Série datetime -> ano * 12 + mês - 1 (-1 para datas ausentes)"""
+    chaves = (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isnan(chaves), -1, chaves).astype(np.int64)
+
+
+def _rotulo_mes(chave):
+    if chave < 0:
+        return SEM_DATA
+    return f'{chave // 12:04d}-{chave % 12 + 1:02d}'
+
+
+def mes_fechado(mes, hoje=None):
+    """True se o mês ('AAAA-MM') terminou há mais de CARENCIA_DIAS dias"""
+    if mes == SEM_DATA:
+        return False
+    hoje = hoje or date.today()
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    inicio_seguinte = date(ano + numero // 12, numero % 12 + 1, 1)
+    return hoje >= inicio_seguinte + timedelta(days=CARENCIA_DIAS)
+
+
+def _normalizar_mes(valor):
+    """'AAAA-MM', date/datetime ou Timestamp -> 'AAAA-MM' (None passa direto)"""
+    if valor is None:
+        return None
+    if isinstance(valor, str) and len(valor) == 7:
+        return valor
+    return pd.Timestamp(valor).strftime('%Y-%m')
+
+
+def _substituir_pasta(temporaria, destino):
+    """Troca `destino` por `temporaria` (a antiga é removida depois da troca)"""
+    antiga = None
+    if os.path.exists(destino):
+        antiga = f'{destino}.antiga.{os.getpid()}'
+        os.replace(destino, antiga)
+    os.replace(temporaria, destino)
+    if antiga:
+        shutil.rmtree(antiga, ignore_errors=True)
+
+
+class HistoricoNPS:
+    """Partições mensais de uma planilha (origem = ID da planilha)"""
+
+    def __init__(self, origem, pasta=None):
+        self.origem = origem
+        self.pasta = os.path.join(pasta or PASTA_HISTORICO, str(origem))
+        self.manifesto = self._ler_manifesto()
+
+    # ---------- Manifesto ----------
+
+    def _ler_manifesto(self):
+        try:
+            with open(os.path.join(self.pasta, 'manifesto.json'), encoding='utf-8') as f:
+                manifesto = json.load(f)
+            if manifesto.get('versao') == VERSAO_HISTORICO:
+                return manifesto
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Manifesto do histórico ignorado (%s): %s", self.origem, e)
+        return {'versao': VERSAO_HISTORICO, 'particoes': {}, 'linha_corte': None}
+
+    def _salvar_manifesto(self):
+        temporario = os.path.join(self.pasta, f'manifesto.json.{os.getpid()}.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.manifesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, os.path.join(self.pasta, 'manifesto.json'))
+
+    @property
+    def particoes(self):
+        return self.manifesto['particoes']
+
+    @property
+    def linha_corte(self):
+        """Primeira linha de dados (0 = linha 2 da planilha) fora dos meses congelados"""
+        return self.manifesto.get('linha_corte')
+
+    def meses(self):
+        return sorted(self.particoes)
+
+    def congelados(self):
+        return sorted(mes for mes, particao in self.particoes.items() if particao['congelada'])
+
+    # ---------- Escrita ----------
+
+    def _gravar_particao(self, mes, dados, coluna_loja):
+        """Grava o mês (uma subpasta por loja se POR_LOJA) e devolve a entrada do manifesto"""
+        destino = os.path.join(self.pasta, mes)
+        temporaria = f'{destino}.tmp.{os.getpid()}'
+        shutil.rmtree(temporaria, ignore_errors=True)
+        os.makedirs(temporaria)
+
+        try:
+            dados = dados.assign(**{COLUNA_LINHA: dados.index.to_numpy()})
+            particao = {'linhas': len(dados), 'congelada': mes_fechado(mes)}
+            if self.manifesto.get('por_loja') and coluna_loja:
+                codigos, lojas = pd.factorize(dados[coluna_loja].astype(str))
+                particao['lojas'] = {}
+                for numero, loja in enumerate(lojas):
+                    subpasta = f'l{numero}'
+                    os.makedirs(os.path.join(temporaria, subpasta))
+                    gravar_colunas(dados.loc[codigos == numero], os.path.join(temporaria, subpasta))
+                    particao['lojas'][loja] = subpasta
+                # Linhas sem loja ficam em uma partição própria
+                if (codigos < 0).any():
+                    os.makedirs(os.path.join(temporaria, 'sem-loja'))
+                    gravar_colunas(dados.loc[codigos < 0], os.path.join(temporaria, 'sem-loja'))
+                    particao['lojas'][''] = 'sem-loja'
+            else:
+                gravar_colunas(dados, temporaria)
+        except Exception:
+            shutil.rmtree(temporaria, ignore_errors=True)
+            raise
+
+        _substituir_pasta(temporaria, destino)
+        return particao
+
+    def sincronizar(self, dados):
+        """Atualiza as partições com os dados limpos da planilha
+
+        Meses congelados não são regravados; os demais são substituídos.
+
+        Returns:
+            int: partições gravadas (-1 se os dados não têm coluna de data)
+        """
+        esquema = obter_esquema(dados.columns)
+        coluna_data = esquema['canonicas'].get('Data')
+        if coluna_data is None or not pd.api.types.is_datetime64_any_dtype(dados[coluna_data]):
+            logger.debug("📚 Histórico ignorado (%s): sem coluna de data", self.origem)
+            return -1
+
+        colunas = [str(coluna) for coluna in dados.columns]
+        with _lock:
+            # Cabeçalho mudou: o histórico anterior não vale mais
+            if self.manifesto.get('assinatura') != assinatura(colunas):
+                if self.particoes:
+                    logger.info("📚 Cabeçalho alterado: histórico de %s recriado", self.origem)
+                shutil.rmtree(self.pasta, ignore_errors=True)
+                self.manifesto = {
+                    'versao': VERSAO_HISTORICO,
+                    'assinatura': assinatura(colunas),
+                    'coluna_data': coluna_data,
+                    'coluna_loja': esquema['canonicas'].get('Loja'),
+                    'por_loja': POR_LOJA,
+                    'particoes': {},
+                    'linha_corte': None
+                }
+            os.makedirs(self.pasta, exist_ok=True)
+
+            chaves = _chaves_mes(dados[coluna_data])
+            ordem = np.argsort(chaves, kind='stable')
+            unicas, inicios = np.unique(chaves[ordem], return_index=True)
+            limites = list(inicios[1:]) + [len(ordem)]
+
+            gravadas = 0
+            presentes = set()
+            for chave, inicio, fim in zip(unicas, inicios, limites):
+                mes = _rotulo_mes(int(chave))
+                presentes.add(mes)
+                atual = self.particoes.get(mes)
+                if atual is not None and atual['congelada']:
+                    continue
+                self.particoes[mes] = self._gravar_particao(
+                    mes, dados.iloc[ordem[inicio:fim]], self.manifesto.get('coluna_loja'))
+                gravadas += 1
+
+            # Mês aberto que sumiu da planilha (linhas apagadas)
+            for mes in [mes for mes, particao in self.particoes.items()
+                        if mes not in presentes and not particao['congelada']]:
+                shutil.rmtree(os.path.join(self.pasta, mes), ignore_errors=True)
+                del self.particoes[mes]
+
+            if dados.attrs.get('indice_planilha'):
+                congelados = set(self.congelados())
+                abertas = ~np.isin(chaves, [chave for chave in unicas if _rotulo_mes(int(chave)) in congelados])
+                posicoes = dados.index.to_numpy()
+                if abertas.any():
+                    self.manifesto['linha_corte'] = int(posicoes[abertas].min())
+                elif len(posicoes):
+                    self.manifesto['linha_corte'] = int(posicoes.max()) + 1
+
+            self.manifesto['atualizado_em'] = datetime.now().isoformat(timespec='seconds')
+            self._salvar_manifesto()
+
+        logger.info("📚 Histórico %s: %s partição(ões) gravada(s), %s congelada(s)",
+                    self.origem, gravadas, len(self.congelados()))
+        return gravadas
+
+    # ---------- Leitura ----------
+
+    def _pastas(self, meses, lojas):
+        """Pastas das partições pedidas e se ainda falta filtrar por loja"""
+        pastas = []
+        for mes in meses:
+            particao = self.particoes[mes]
+            if 'lojas' not in particao:
+                pastas.append(os.path.join(self.pasta, mes))
+                continue
+            for loja, subpasta in particao['lojas'].items():
+                if lojas is None or loja in lojas:
+                    pastas.append(os.path.join(self.pasta, mes, subpasta))
+        return pastas
+
+    def carregar(self, meses=None, lojas=None, colunas=None, desde=None, ate=None):
+        """Linhas das partições pedidas (None se o histórico não tem nenhuma)
+
+        Args:
+            meses: meses 'AAAA-MM' (None = todos, incluindo linhas sem data)
+            lojas: nomes de loja
+            colunas: colunas a ler (None = todas)
+            desde/ate: intervalo de meses (inclusivo), em 'AAAA-MM' ou data
+        """
+        desde, ate = _normalizar_mes(desde), _normalizar_mes(ate)
+        selecionados = [
+            mes for mes in self.meses()
+            if (meses is None or mes in meses)
+            and (desde is None or (mes != SEM_DATA and mes >= desde))
+            and (ate is None or (mes != SEM_DATA and mes <= ate))
+        ]
+        if not selecionados:
+            return None
+
+        lojas = None if lojas is None else {str(loja) for loja in lojas}
+        lidas = None if colunas is None else list(colunas) + [COLUNA_LINHA]
+        partes = []
+        for pasta in self._pastas(selecionados, lojas):
+            try:
+                partes.append(anexar(ler_descritor(pasta), colunas=lidas))
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ Partição do histórico ilegível (%s): %s", pasta, e)
+                return None
+        if not partes:
+            return None
+
+        dados = partes[0] if len(partes) == 1 else pd.concat(partes, ignore_index=True)
+        if COLUNA_LINHA in dados.columns:
+            dados = dados.set_index(COLUNA_LINHA)
+            dados.index.name = None
+
+        # Partição só por mês: filtro de loja nas linhas
+        coluna_loja = self.manifesto.get('coluna_loja')
+        if lojas is not None and not self.manifesto.get('por_loja') and coluna_loja in dados.columns:
+            dados = dados.loc[dados[coluna_loja].astype(str).isin(lojas)]
+
+        dados.attrs['limpeza_completa'] = True
+        return dados
+
+    def juntar(self, recentes):
+        """Meses congelados do histórico + linhas recentes (extração incremental)
+
+        Linhas recentes de meses já congelados são descartadas: esses meses
+        já estão completos no histórico.
+        """
+        congelados = self.congelados()
+        antigos = self.carregar(meses=congelados) if congelados else None
+        if antigos is None:
+            return recentes
+
+        coluna_data = self.manifesto['coluna_data']
+        if recentes is not None and len(recentes) and coluna_data in recentes.columns:
+            chaves_congeladas = [int(mes[:4]) * 12 + int(mes[5:7]) - 1 for mes in congelados]
+            recentes = recentes.loc[~np.isin(_chaves_mes(recentes[coluna_data]), chaves_congeladas)]
+
+        dados = pd.concat([antigos, recentes]) if recentes is not None and len(recentes) else antigos
+        dados.attrs.update({'limpeza_completa': True, 'indice_planilha': True})
+        return dados
+
+
+def abrir_historico(origem):
+    """HistoricoNPS da planilha (None se o histórico está desativado)"""
+    if not PASTA_HISTORICO or not origem:
+        return None
+    return HistoricoNPS(origem)
+
+
+def sincronizar(origem, dados):
+    """Atualiza o histórico da planilha; erros só geram aviso
+
+    Returns:
+        HistoricoNPS ou None
+    """
+    historico = abrir_historico(origem)
+    if historico is None or dados is None or len(dados) == 0:
+        return None
+    try:
+        historico.sincronizar(dados)
+    except Exception as e:
+        logger.warning("⚠️ Erro ao sincronizar histórico de %s: %s", origem, e)
+        return None
+    return historico
+
+
+def filtrar_periodo(dados, desde=None, ate=None):
+    """Linhas de `dados` entre os meses desde/ate (inclusivo), sem o histórico
+
+    Mesmo recorte de HistoricoNPS.carregar, feito em memória quando o
+    histórico está desativado ou não tem a planilha.
+
+    Returns:
+        DataFrame (linhas sem data ficam de fora) ou None se não há coluna de data
+    """
+    coluna_data = obter_esquema(dados.columns)['canonicas'].get('Data')
+    if coluna_data is None or not pd.api.types.is_datetime64_any_dtype(dados[coluna_data]):
+        return None
+
+    chaves = _chaves_mes(dados[coluna_data])
+    selecionadas = chaves >= 0
+    desde, ate = _normalizar_mes(desde), _normalizar_mes(ate)
+    if desde is not None:
+        selecionadas &= chaves >= int(desde[:4]) * 12 + int(desde[5:7]) - 1
+    if ate is not None:
+        selecionadas &= chaves <= int(ate[:4]) * 12 + int(ate[5:7]) - 1
+    return dados.loc[selecionadas]
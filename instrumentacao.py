@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Instrumentação do pipeline NPS - tempo, linhas, bytes e memória por etapa
+Agrega as etapas para exportação no formato texto do Prometheus e
+coleta as etapas de cada job para anexar ao resultado
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    _TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _TAMANHO_PAGINA = None
+
+
+# Limites dos buckets do histograma de duração (segundos)
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Etapas do job atual (None fora de coletar_etapas)
+_etapas_job = contextvars.ContextVar('etapas_job', default=None)
+
+_registro = {}
+_lock = threading.Lock()
+
+
+def _memoria_residente_bytes():
+    """Memória residente atual do processo via /proc/self/statm (None se indisponível)"""
+    if _TAMANHO_PAGINA is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _TAMANHO_PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _memoria_pico_bytes():
+    """Pico de memória residente do processo desde o início (None se indisponível)"""
+    if resource is None:
+        return None
+    # Linux reporta ru_maxrss em KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _mb(valor):
+    return round(valor / (1024 * 1024), 1) if valor is not None else None
+
+
+class Etapa:
+    """Mede uma etapa do pipeline (use com `with`)
+
+    Memória: residente ao fim da etapa e variação desde o início. A
+    residente é do processo; com análises simultâneas, a variação inclui
+    as alocações das outras.
+    """
+
+    def __init__(self, nome, linhas=None, bytes_lidos=None):
+        self.nome = nome
+        self.linhas = linhas
+        self.bytes_lidos = bytes_lidos
+        self.inicio = None
+        self.duracao = None
+        self.erro = False
+        self.memoria_mb = None
+        self.memoria_delta_mb = None
+        self._memoria_inicio = None
+
+    def registrar(self, linhas=None, bytes_lidos=None):
+        """Informa linhas processadas e bytes lidos durante a etapa"""
+        if linhas is not None:
+            self.linhas = linhas
+        if bytes_lidos is not None:
+            self.bytes_lidos = bytes_lidos
+
+    def __enter__(self):
+        self._memoria_inicio = _memoria_residente_bytes()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        self.duracao = time.perf_counter() - self.inicio
+        self.erro = tipo_erro is not None
+        _registrar(self)
+        return False
+
+    def como_dict(self):
+        """Resumo serializável da etapa"""
+        return {
+            'etapa': self.nome,
+            'duracao_s': round(self.duracao, 6) if self.duracao is not None else None,
+            'linhas': self.linhas,
+            'bytes': self.bytes_lidos,
+            'memoria_mb': self.memoria_mb,
+            'memoria_delta_mb': self.memoria_delta_mb,
+            'erro': self.erro
+        }
+
+
+def _registrar(etapa):
+    """Acumula a etapa no registro do processo e no job atual"""
+    memoria = _memoria_residente_bytes()
+    etapa.memoria_mb = _mb(memoria)
+    if memoria is not None and etapa._memoria_inicio is not None:
+        etapa.memoria_delta_mb = _mb(memoria - etapa._memoria_inicio)
+
+    with _lock:
+        r = _registro.setdefault(etapa.nome, {
+            'contagem': 0,
+            'soma': 0.0,
+            'erros': 0,
+            'linhas': 0,
+            'bytes': 0,
+            'buckets': [0] * len(BUCKETS_DURACAO)
+        })
+        r['contagem'] += 1
+        r['soma'] += etapa.duracao
+        r['erros'] += 1 if etapa.erro else 0
+        r['linhas'] += etapa.linhas or 0
+        r['bytes'] += etapa.bytes_lidos or 0
+        for i, limite in enumerate(BUCKETS_DURACAO):
+            if etapa.duracao <= limite:
+                r['buckets'][i] += 1
+
+    etapas = _etapas_job.get()
+    if etapas is not None:
+        etapas.append(etapa.como_dict())
+
+
+def medir_etapa(nome, linhas=None, bytes_lidos=None):
+    """Atalho: `with medir_etapa('fetch') as etapa: ...`"""
+    return Etapa(nome, linhas, bytes_lidos)
+
+
+def etapa_metodo(nome):
+    """Decorador para métodos que processam self.dados (linhas = len(self.dados))"""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltorio(self, *args, **kwargs):
+            dados = getattr(self, 'dados', None)
+            with Etapa(nome, linhas=len(dados) if dados is not None else None):
+                return metodo(self, *args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+class coletar_etapas:
+    """Coleta as etapas executadas no contexto atual
+
+    Uso:
+        with coletar_etapas() as etapas:
+            ...
+        resultado['etapas'] = etapas
+    """
+
+    def __enter__(self):
+        self.etapas = []
+        self._token = _etapas_job.set(self.etapas)
+        return self.etapas
+
+    def __exit__(self, tipo_erro, erro, tb):
+        _etapas_job.reset(self._token)
+        return False
+
+
+def submeter_com_contexto(executor, funcao, *args, **kwargs):
+    """executor.submit que preserva o job atual (etapas medidas na thread entram no job)"""
+    contexto = contextvars.copy_context()
+    return executor.submit(contexto.run, funcao, *args, **kwargs)
+
+
+def _rotulo(valor):
+    """Escapa valor de rótulo Prometheus"""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exportar_prometheus():
+    """Métricas acumuladas no formato texto do Prometheus (version 0.0.4)"""
+    with _lock:
+        registro = {nome: dict(r, buckets=list(r['buckets'])) for nome, r in _registro.items()}
+
+    linhas = [
+        '# HELP nps_etapa_duracao_segundos Duração das etapas do pipeline NPS',
+        '# TYPE nps_etapa_duracao_segundos histogram'
+    ]
+    for nome, r in sorted(registro.items()):
+        rotulo = _rotulo(nome)
+        for limite, quantidade in zip(BUCKETS_DURACAO, r['buckets']):
+            linhas.append(f'nps_etapa_duracao_segundos_bucket{{etapa="{rotulo}",le="{limite}"}} {quantidade}')
+        linhas.append(f'nps_etapa_duracao_segundos_bucket{{etapa="{rotulo}",le="+Inf"}} {r["contagem"]}')
+        linhas.append(f'nps_etapa_duracao_segundos_sum{{etapa="{rotulo}"}} {r["soma"]:.6f}')
+        linhas.append(f'nps_etapa_duracao_segundos_count{{etapa="{rotulo}"}} {r["contagem"]}')
+
+    for metrica, chave, ajuda in (
+        ('nps_etapa_erros_total', 'erros', 'Etapas que terminaram com exceção'),
+        ('nps_etapa_linhas_total', 'linhas', 'Linhas processadas por etapa'),
+        ('nps_etapa_bytes_total', 'bytes', 'Bytes lidos por etapa'),
+    ):
+        linhas.append(f'# HELP {metrica} {ajuda}')
+        linhas.append(f'# TYPE {metrica} counter')
+        for nome, r in sorted(registro.items()):
+            linhas.append(f'{metrica}{{etapa="{_rotulo(nome)}"}} {r[chave]}')
+
+    for metrica, valor, ajuda in (
+        ('nps_memoria_residente_bytes', _memoria_residente_bytes(), 'Memória residente atual do processo'),
+        ('nps_processo_memoria_pico_bytes', _memoria_pico_bytes(), 'Pico de memória residente do processo desde o início'),
+    ):
+        if valor is not None:
+            linhas.append(f'# HELP {metrica} {ajuda}')
+            linhas.append(f'# TYPE {metrica} gauge')
+            linhas.append(f'{metrica} {valor}')
+
+    try:
+        from sessao_http import obter_metricas
+        metricas_http = obter_metricas()
+    except ImportError:
+        metricas_http = {}
+
+    if metricas_http:
+        for metrica, chave, tipo, ajuda in (
+            ('nps_http_requisicoes_total', 'requisicoes', 'counter', 'Requisições HTTP por host'),
+            ('nps_http_erros_total', 'erros', 'counter', 'Respostas HTTP >= 400 por host'),
+            ('nps_http_tentativas_extras_total', 'tentativas_extras', 'counter', 'Novas tentativas (retry) por host'),
+            ('nps_http_tempo_segundos_total', 'tempo_total', 'counter', 'Tempo total de resposta por host'),
+            ('nps_http_bytes_total', 'bytes', 'counter', 'Bytes recebidos por host (corpo descomprimido)'),
+        ):
+            linhas.append(f'# HELP {metrica} {ajuda}')
+            linhas.append(f'# TYPE {metrica} {tipo}')
+            for host, m in sorted(metricas_http.items()):
+                linhas.append(f'{metrica}{{host="{_rotulo(host)}"}} {m[chave]}')
+
+    # Admissão das análises (a espera aparece na etapa "fila" do histograma)
+    try:
+        from controle_admissao import obter_metricas as obter_metricas_admissao
+        admissao = obter_metricas_admissao()
+    except ImportError:
+        admissao = {}
+
+    if admissao:
+        for metrica, valor, tipo, ajuda in (
+            ('nps_analises_em_execucao', admissao['em_execucao'], 'gauge', 'Análises executando'),
+            ('nps_analises_fila', admissao['fila'], 'gauge', 'Análises esperando vaga'),
+            ('nps_analises_memoria_reservada_bytes', admissao['memoria_reservada_mb'] * 1024 * 1024,
+             'gauge', 'Memória reservada pelas análises em execução'),
+            ('nps_analises_admitidas_total', admissao['admitidas'], 'counter', 'Análises admitidas'),
+        ):
+            linhas.append(f'# HELP {metrica} {ajuda}')
+            linhas.append(f'# TYPE {metrica} {tipo}')
+            linhas.append(f'{metrica} {valor}')
+        linhas.append('# HELP nps_analises_recusadas_total Análises recusadas com 429, por motivo')
+        linhas.append('# TYPE nps_analises_recusadas_total counter')
+        for motivo, quantidade in sorted(admissao['recusadas'].items()):
+            linhas.append(f'nps_analises_recusadas_total{{motivo="{_rotulo(motivo)}"}} {quantidade}')
+
+    return '\n'.join(linhas) + '\n'
+
+
+def obter_registro():
+    """Cópia do registro acumulado por etapa"""
+    with _lock:
+        return {nome: dict(r, buckets=list(r['buckets'])) for nome, r in _registro.items()}
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Geração de relatórios NPS em lote (modo não interativo)
+Lê um manifesto de planilhas/lojas, baixa as planilhas em paralelo,
+limpa cada uma uma única vez, recorta por loja, gera os PDFs no pool de
+renderização e grava um índice com o resumo do lote. Com o pool ativo,
+cada planilha vai uma vez para a memória compartilhada (ordenada por loja)
+e os workers calculam métricas e PDF de cada loja sobre o seu intervalo.
+
+Manifesto (JSON):
+    {
+      "planilhas": [
+        {"url": "https://docs.google.com/spreadsheets/d/.../edit", "lojas": "*"},
+        {"url": "https://docs.google.com/spreadsheets/d/.../edit", "lojas": ["MDO Colombo", "MDO Centro"]},
+        {"url": "https://docs.google.com/spreadsheets/d/.../edit", "nome": "MDO Curitiba"}
+      ]
+    }
+
+"lojas": "*" gera um relatório por loja da planilha; uma lista restringe
+às lojas informadas; sem "lojas" a planilha inteira vira um relatório com
+o nome em "nome".
+
+Uso: python main.py --lote manifesto.json [--saida relatorios]
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from agregados_nps import CuboNPS, caminho_cubo
+from calculadora_metricas import CalculadoraMetricas
+from dataset_compartilhado import anexar, publicar
+from nps_extractor import NPSExtractor
+from pool_renderizacao import aquecer_pool, obter_pool, renderizar_relatorio_completo, submeter_pdf
+
+logger = logging.getLogger(__name__)
+
+
+# Downloads simultâneos e cálculos de métricas simultâneos (threads)
+LOTE_DOWNLOADS = int(os.environ.get('LOTE_DOWNLOADS', '8'))
+LOTE_CALCULOS = int(os.environ.get('LOTE_CALCULOS', '4'))
+PASTA_RELATORIOS = 'relatorios'
+
+TODAS_LOJAS = '*'
+
+
+def carregar_manifesto(caminho):
+    """Lê e valida o manifesto
+
+    Returns:
+        list: entradas {'url', 'lojas', 'nome'} (lojas: None, '*' ou lista)
+    """
+    with open(caminho, encoding='utf-8') as f:
+        conteudo = json.load(f)
+
+    entradas = conteudo.get('planilhas', []) if isinstance(conteudo, dict) else conteudo
+    validas = []
+
+    for i, entrada in enumerate(entradas, 1):
+        url = (entrada.get('url') or '').strip()
+        if not url:
+            raise ValueError(f"Entrada {i} do manifesto sem 'url'")
+
+        lojas = entrada.get('lojas')
+        if lojas is not None and lojas != TODAS_LOJAS and not isinstance(lojas, list):
+            raise ValueError(f"Entrada {i}: 'lojas' deve ser \"*\" ou uma lista")
+
+        validas.append({
+            'url': url,
+            'lojas': lojas,
+            'nome': entrada.get('nome') or f'Planilha {i}'
+        })
+
+    return validas
+
+
+def _baixar(url):
+    """Conecta e extrai avaliações já limpas (None se falhar)"""
+    extractor = NPSExtractor()
+    if not extractor.conectar_sheets(url):
+        return None
+    return extractor.extrair_avaliacoes()
+
+
+def baixar_planilhas(urls):
+    """Baixa as planilhas em paralelo (cada URL uma única vez)
+
+    Returns:
+        dict: url -> DataFrame (ou Exception em caso de falha)
+    """
+    dados_por_url = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(LOTE_DOWNLOADS, len(urls)))) as executor:
+        futuros = {url: executor.submit(_baixar, url) for url in urls}
+        for url, futuro in futuros.items():
+            try:
+                dados = futuro.result()
+                if dados is None or len(dados) == 0:
+                    raise ValueError('Nenhum dado encontrado na planilha')
+                dados_por_url[url] = dados
+                logger.info("✅ %s registros: %s", len(dados), url)
+            except Exception as e:
+                logger.error("❌ Falha ao baixar %s: %s", url, e)
+                dados_por_url[url] = e
+
+    return dados_por_url
+
+
+def recortar_lojas(dados, entrada):
+    """[(nome do relatório, DataFrame, loja ou None)] da entrada do manifesto"""
+    lojas = entrada['lojas']
+    if lojas is None or 'Loja' not in dados.columns:
+        return [(entrada['nome'], dados, None)]
+
+    # Um único groupby em vez de um filtro por loja
+    grupos = {loja: grupo for loja, grupo in dados.groupby('Loja', sort=False)}
+    if lojas == TODAS_LOJAS:
+        return [(loja, grupo, loja) for loja, grupo in sorted(grupos.items(), key=lambda item: str(item[0]))]
+
+    recortes = []
+    for loja in lojas:
+        if loja in grupos:
+            recortes.append((loja, grupos[loja], loja))
+        else:
+            logger.warning("⚠️ Loja '%s' não encontrada em %s", loja, entrada['url'])
+    return recortes
+
+
+def _nome_arquivo(loja, timestamp, usados):
+    """Nome do PDF da loja, único dentro do lote"""
+    base = f"relatorio_nps_{re.sub(r'[^0-9A-Za-z_-]+', '_', str(loja)).strip('_')}_{timestamp}"
+    nome = f'{base}.pdf'
+    sequencia = 2
+    while nome in usados:
+        nome = f'{base}_{sequencia}.pdf'
+        sequencia += 1
+    usados.add(nome)
+    return nome
+
+
+def _item_loja(loja, registros, metricas, resumo, nome_arquivo):
+    """Linha do índice do lote"""
+    return {
+        'loja': str(loja),
+        'registros': registros,
+        'nps_score': round(float(metricas.get('percentuais_nps', {}).get('nps_score', 0)), 1),
+        'avaliacoes': resumo.get('avaliacoes', 0),
+        'nota_media': round(float(resumo.get('nota_media', 0) or 0), 2),
+        'vendedores': resumo.get('vendedores', 0),
+        'arquivo': nome_arquivo
+    }
+
+
+def _calcular_loja(loja, dados, cubo, nome_arquivo):
+    """Métricas da loja + agendamento do PDF (sem pool: threads do lote)
+
+    As métricas de contagem saem do recorte do cubo da planilha; as linhas
+    da loja só são usadas pelas fórmulas Looker/IA.
+    """
+    calculadora = CalculadoraMetricas(dados.reset_index(drop=True), cubo=cubo)
+    metricas = calculadora.calcular_todas_metricas()
+    if not metricas:
+        raise ValueError('Erro ao calcular métricas')
+
+    futuro = submeter_pdf('relatorio_completo', metricas=metricas, titulo=str(loja), nome_arquivo=nome_arquivo)
+    return _item_loja(loja, len(dados), metricas, calculadora.obter_resumo(), nome_arquivo), futuro
+
+
+def gerar_relatorio_loja(dataset, inicio, fim, loja, nome_arquivo):
+    """Executado no worker do pool: métricas e PDF do intervalo da loja
+
+    Args:
+        dataset: descritor do DatasetCompartilhado da planilha
+        inicio, fim: intervalo de linhas da loja no dataset
+
+    Returns:
+        dict: linha do índice com 'caminho' (None se o PDF falhar)
+    """
+    dados = anexar(dataset, inicio, fim)
+    calculadora = CalculadoraMetricas(dados)
+    metricas = calculadora.calcular_todas_metricas()
+    if not metricas:
+        raise ValueError('Erro ao calcular métricas')
+
+    item = _item_loja(loja, len(dados), metricas, calculadora.obter_resumo(), nome_arquivo)
+    item['caminho'] = renderizar_relatorio_completo(metricas, str(loja), nome_arquivo)
+    return item
+
+
+def _publicar_por_loja(dados):
+    """Publica a planilha ordenada por loja (ordem original dentro da loja)
+
+    Returns:
+        tuple: (DatasetCompartilhado, {loja: (inicio, fim)})
+    """
+    if 'Loja' not in dados.columns:
+        return publicar(dados), {}
+
+    codigos, lojas = pd.factorize(dados['Loja'])
+    ordem = np.argsort(codigos, kind='stable')
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(lojas))
+
+    # Linhas sem loja (código -1) ficam no início
+    limites = {}
+    inicio = int((codigos < 0).sum())
+    for loja, quantidade in zip(lojas, contagens):
+        limites[loja] = (inicio, inicio + int(quantidade))
+        inicio += int(quantidade)
+
+    return publicar(dados.take(ordem)), limites
+
+
+def processar_lote(caminho_manifesto, pasta_saida=PASTA_RELATORIOS):
+    """Executa o lote e grava o índice
+
+    Returns:
+        dict: índice do lote (também salvo em <pasta_saida>/indice_lote_<timestamp>.json)
+    """
+    inicio = time.perf_counter()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    entradas = carregar_manifesto(caminho_manifesto)
+
+    # Sobe os workers de PDF enquanto as planilhas baixam
+    aquecer_pool()
+
+    urls = list(dict.fromkeys(entrada['url'] for entrada in entradas))
+    logger.info("📥 Baixando %s planilha(s) para %s entrada(s)...", len(urls), len(entradas))
+    dados_por_url = baixar_planilhas(urls)
+
+    redes = []
+    cubos = {}
+    compartilhados = {}
+    via_pool = obter_pool() is not None
+    # Um item por relatório, na ordem do manifesto: dict pronto (erro) ou
+    # (loja, url, futuro do cálculo)
+    agendados = []
+    nomes_usados = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, LOTE_CALCULOS)) as executor:
+        for url in urls:
+            dados = dados_por_url[url]
+            if isinstance(dados, Exception):
+                continue
+            # Cubo da planilha: linhas percorridas uma vez, lojas viram recortes
+            cubo = CuboNPS.de_dados(dados)
+            cubos[url] = cubo
+            sheet_id = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
+            if sheet_id:
+                try:
+                    cubo.salvar(caminho_cubo(sheet_id.group(1)))
+                except OSError as e:
+                    logger.warning("⚠️ Erro ao salvar cubo NPS: %s", e)
+            if via_pool:
+                compartilhados[url] = _publicar_por_loja(dados)
+            rede = cubo.calcular_metricas()
+            redes.append({
+                'url': url,
+                'registros': len(dados),
+                'nps_score': round(float(rede.get('percentuais_nps', {}).get('nps_score', 0)), 1),
+                'ranking_lojas': [
+                    {'loja': item['loja'], 'nps_score': round(float(item['nps_score']), 1),
+                     'total_avaliacoes': item['total_avaliacoes']}
+                    for item in rede.get('ranking_lojas', [])
+                ]
+            })
+
+        for entrada in entradas:
+            dados = dados_por_url[entrada['url']]
+            if isinstance(dados, Exception):
+                agendados.append({'loja': entrada['nome'], 'url': entrada['url'],
+                                  'status': 'erro', 'erro': str(dados)})
+                continue
+
+            cubo = cubos[entrada['url']]
+            for nome, recorte, loja in recortar_lojas(dados, entrada):
+                nome_arquivo = _nome_arquivo(nome, timestamp, nomes_usados)
+                if via_pool:
+                    # Worker anexa o intervalo da loja e faz métricas + PDF
+                    dataset, limites = compartilhados[entrada['url']]
+                    primeira, ultima = (0, dataset.linhas) if loja is None else limites[loja]
+                    futuro = submeter_pdf('relatorio_loja', dataset=dataset, inicio=primeira, fim=ultima,
+                                          loja=nome, nome_arquivo=nome_arquivo)
+                else:
+                    cubo_recorte = cubo if loja is None else cubo.fatiar(lojas=[loja])
+                    futuro = executor.submit(_calcular_loja, nome, recorte, cubo_recorte, nome_arquivo)
+                agendados.append((nome, entrada['url'], futuro))
+
+        # Referência do lote; as tarefas seguram as suas até terminar
+        for dataset, _ in compartilhados.values():
+            dataset.fechar()
+
+        logger.info("🧮 %s relatório(s) em cálculo...", len(agendados))
+
+        # Aguarda os cálculos; os PDFs seguem renderizando no pool
+        for i, agendado in enumerate(agendados):
+            if isinstance(agendado, dict):
+                continue
+            loja, url, futuro = agendado
+            try:
+                resultado = futuro.result()
+                item, futuro_pdf = resultado if isinstance(resultado, tuple) else (resultado, None)
+                item['url'] = url
+                agendados[i] = (item, futuro_pdf)
+            except Exception as e:
+                logger.error("❌ %s: %s", loja, e)
+                agendados[i] = {'loja': str(loja), 'url': url, 'status': 'erro', 'erro': str(e)}
+
+    relatorios = []
+    for agendado in agendados:
+        if isinstance(agendado, dict):
+            relatorios.append(agendado)
+            continue
+        item, futuro_pdf = agendado
+        try:
+            caminho = item.pop('caminho') if futuro_pdf is None else futuro_pdf.result()
+            if not caminho:
+                raise ValueError('Erro ao gerar relatório PDF')
+            item['caminho'] = caminho
+            item['status'] = 'ok'
+        except Exception as e:
+            logger.error("❌ PDF de %s: %s", item['loja'], e)
+            item['status'] = 'erro'
+            item['erro'] = str(e)
+        relatorios.append(item)
+
+    gerados = sum(1 for r in relatorios if r['status'] == 'ok')
+    indice = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'manifesto': os.path.abspath(caminho_manifesto),
+        'duracao_s': round(time.perf_counter() - inicio, 2),
+        'total': len(relatorios),
+        'gerados': gerados,
+        'erros': len(relatorios) - gerados,
+        'planilhas': redes,
+        'relatorios': relatorios
+    }
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminho_indice = os.path.join(pasta_saida, f'indice_lote_{timestamp}.json')
+    with open(caminho_indice, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2, default=str)
+    indice['indice'] = caminho_indice
+
+    logger.info("📋 Lote concluído: %s/%s relatório(s) em %.1fs - índice em %s",
+                gerados, len(relatorios), indice['duracao_s'], caminho_indice)
+    return indice
@@ -7,10 +7,13 @@ Data: 09/07/2025
 
 import sys
 import os
+import logging
 from datetime import datetime
 from nps_extractor import NPSExtractor
 from calculadora_metricas import CalculadoraMetricas
-from gerador_relatorio_pdf import GeradorRelatorioPDF
+from configuracao_log import configurar_logging
+
+logger = logging.getLogger('main')
 
 
 def exibir_menu():
@@ -99,14 +102,13 @@ def processar_relatorio():
             print("⚠️ ATENÇÃO: Sem coluna de avaliação - relatório será limitado!")
             print("💡 Para relatório completo, adicione coluna 'Avaliacao' com notas 0-10")
         
-        # Mostra amostra dos dados
-        print("📊 Amostra dos dados:")
-        print(dados.head(3).to_string())
-        print()
+        # Amostra dos dados (apenas com LOG_LEVEL=DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Amostra dos dados:\n%s", dados.head(3).to_string())
         
         # 3. CALCULAR MÉTRICAS
         print(f"\n📊 PASSO 2: Calculando métricas para '{nome_loja}'...")
-        calculadora = CalculadoraMetricas(dados)
+        calculadora = CalculadoraMetricas(dados, origem=extractor._extrair_sheet_id(url))
         metricas = calculadora.calcular_todas_metricas()
         
         if not metricas:
@@ -118,6 +120,8 @@ def processar_relatorio():
         # 4. GERAR RELATÓRIO
         print(f"\n📄 PASSO 3: Gerando relatório para '{nome_loja}'...")
         
+        # Import tardio: o modo --lote não depende do gerador no processo principal
+        from gerador_relatorio_pdf import GeradorRelatorioPDF
         gerador = GeradorRelatorioPDF(metricas)
         sucesso = gerador.gerar_relatorio_completo(nome_loja)
         
@@ -383,13 +387,46 @@ def testar_planilha_especifica():
     
     input("\nPressione Enter para voltar ao menu...")
 
+def processar_lote_cli(caminho_manifesto, pasta_saida):
+    """Modo não interativo: relatórios de todas as lojas do manifesto"""
+    from lote_relatorios import processar_lote
+    
+    print(f"\n📦 LOTE DE RELATÓRIOS: {caminho_manifesto}")
+    print("=" * 60)
+    
+    try:
+        indice = processar_lote(caminho_manifesto, pasta_saida)
+    except (OSError, ValueError) as e:
+        print(f"❌ Manifesto inválido: {str(e)}")
+        return False
+    
+    for relatorio in indice['relatorios']:
+        if relatorio['status'] == 'ok':
+            print(f"  ✅ {relatorio['loja']}: NPS {relatorio['nps_score']:.1f} → {relatorio['arquivo']}")
+        else:
+            print(f"  ❌ {relatorio['loja']}: {relatorio['erro']}")
+    
+    print(f"\n📋 {indice['gerados']}/{indice['total']} relatório(s) em {indice['duracao_s']:.1f}s")
+    print(f"🗂️ Índice: {indice['indice']}")
+    return indice['erros'] == 0
+
 def main():
     """Interface principal do sistema"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Agente analista de dashboard NPS')
+    parser.add_argument('--lote', metavar='MANIFESTO', help='gera os relatórios do manifesto JSON sem interação')
+    parser.add_argument('--saida', default='relatorios', help='pasta do índice do lote')
+    args = parser.parse_args()
+    
+    configurar_logging()
+    
+    if args.lote:
+        sys.exit(0 if processar_lote_cli(args.lote, args.saida) else 1)
+    
     print("🚀 AGENTE ANALISTA DE DASHBOARD NPS")
     print("Autor: Leonardo | Data: 2025")
     
     # Verificar se é ambiente não-interativo
-    import sys
     if not sys.stdin.isatty():
         print("\n🔧 MODO AUTOMÁTICO DETECTADO - Executando teste do sistema...")
         try:
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Motor das fórmulas Looker - regras compiladas em arrays NumPy
+Classificação, "Avaliou" e interações D+1/D+30 viram códigos inteiros em
+uma única passada pelas colunas, sem copiar o DataFrame; o NPS geral e o
+NPS por dimensão saem das mesmas contagens (bincount por grupo).
+As interações contam os dias entre a Data da avaliação e a data de
+referência (a mais recente dos dados): D+1 a D+30 ou mais de 30 ("outros").
+Paridade coberta por tests/test_motor_looker.py.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Códigos da classificação (índices de ROTULOS_CLASSIFICACAO)
+SEM_NOTA, DETRATOR, NEUTRO, PROMOTOR = range(4)
+ROTULOS_CLASSIFICACAO = ('', '🔴 Detrator', '🟡 Neutro', '🟢 Promotor')
+
+# Colunas Looker das interações e janela (dias após a avaliação) do D+1/D+30
+COLUNA_INTERACAO_D1_D30 = 'Looker_Interacao_D1_D30'
+COLUNA_INTERACAO_OUTROS = 'Looker_Interacao_Outros'
+JANELA_INTERACAO = (1, 30)
+
+
+def classificar(notas):
+    """Notas (array float, NaN = sem nota) -> códigos de classificação int8"""
+    validas = (notas >= 0) & (notas <= 10)
+    return np.select(
+        [validas & (notas >= 9), validas & (notas >= 7), validas],
+        [PROMOTOR, NEUTRO, DETRATOR],
+        SEM_NOTA
+    ).astype(np.int8)
+
+
+def dias_ate(datas, referencia=None):
+    """Datas -> dias corridos até a referência (float, NaN = sem data)
+
+    Conta dias de calendário (hora ignorada); sem referência, usa a data
+    mais recente da própria coluna.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(datas):
+        datas = pd.to_datetime(datas, errors='coerce')
+    dias = datas.dt.normalize()
+    if referencia is None:
+        referencia = dias.max()
+    if pd.isna(referencia):
+        return np.full(len(datas), np.nan)
+    referencia = pd.Timestamp(referencia).normalize()
+    return (referencia - dias).dt.days.to_numpy(dtype=float, na_value=np.nan)
+
+
+def interacoes(dias):
+    """Dias após a avaliação -> (D+1 a D+30, depois de D+30) como arrays bool"""
+    inicio, fim = JANELA_INTERACAO
+    return (dias >= inicio) & (dias <= fim), dias > fim
+
+
+def _nps(contagens):
+    """Contagens [sem nota, detratores, neutros, promotores] -> resultado Looker"""
+    detratores, neutros, promotores = (int(valor) for valor in contagens[1:])
+    total = detratores + neutros + promotores
+
+    if total == 0:
+        return {
+            'status': 'sem_avaliacoes',
+            'nps_final': 0,
+            'total_avaliacoes': 0,
+            'promotores_count': 0,
+            'neutros_count': 0,
+            'detratores_count': 0,
+            'perc_promotores': 0,
+            'perc_neutros': 0,
+            'perc_detratores': 0
+        }
+
+    return {
+        'status': 'sucesso',
+        'nps_final': round((promotores - detratores) / total * 100, 1),
+        'total_avaliacoes': total,
+        'promotores_count': promotores,
+        'neutros_count': neutros,
+        'detratores_count': detratores,
+        'perc_promotores': round(promotores / total * 100, 1),
+        'perc_neutros': round(neutros / total * 100, 1),
+        'perc_detratores': round(detratores / total * 100, 1)
+    }
+
+
+class MotorLooker:
+    """Fórmulas Looker avaliadas sobre as colunas de um DataFrame"""
+
+    def __init__(self, dados, referencia=None):
+        """
+        Args:
+            dados: DataFrame com Avaliacao e Data (não é copiado)
+            referencia: data base das interações (padrão: Data mais recente)
+        """
+        self.dados = dados
+        if 'Avaliacao' in dados.columns:
+            notas = pd.to_numeric(dados['Avaliacao'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        else:
+            notas = np.full(len(dados), np.nan)
+
+        self.classificacao = classificar(notas)
+        if 'Data' in dados.columns:
+            dias = dias_ate(dados['Data'], referencia)
+        else:
+            dias = np.full(len(dados), np.nan)
+        self.interacao_d1_d30, self.interacao_outros = interacoes(dias)
+
+    @property
+    def avaliou(self):
+        return self.classificacao != SEM_NOTA
+
+    def _contagens(self, dimensao):
+        """(valores da dimensão, matriz grupos x classificação)"""
+        try:
+            codigos, valores = pd.factorize(self.dados[dimensao], sort=True)
+        except TypeError:
+            # Tipos misturados na coluna: mantém a ordem de aparição
+            codigos, valores = pd.factorize(self.dados[dimensao])
+
+        presentes = codigos >= 0
+        combinados = codigos[presentes].astype(np.int64) * 4 + self.classificacao[presentes]
+        matriz = np.bincount(combinados, minlength=len(valores) * 4).reshape(len(valores), 4)
+        return valores, matriz
+
+    def calcular(self, dimensoes=()):
+        """NPS geral, NPS por dimensão, interações e avaliações
+
+        Args:
+            dimensoes: colunas a analisar (ex.: ('Loja', 'Vendedor'))
+
+        Returns:
+            dict: 'geral', 'dimensoes' ({coluna: [{<coluna>, nps_looker, ...}]}),
+                'interacoes' e 'avaliacoes'
+        """
+        geral = np.bincount(self.classificacao, minlength=4)
+
+        por_dimensao = {}
+        for dimensao in dimensoes:
+            if dimensao not in self.dados.columns:
+                continue
+            valores, matriz = self._contagens(dimensao)
+            itens = []
+            for valor, contagens in zip(valores, matriz):
+                resultado = _nps(contagens)
+                itens.append({
+                    dimensao.lower(): valor,
+                    'nps_looker': resultado['nps_final'],
+                    'total_avaliacoes': resultado['total_avaliacoes'],
+                    'promotores_count': resultado['promotores_count'],
+                    'neutros_count': resultado['neutros_count'],
+                    'detratores_count': resultado['detratores_count']
+                })
+            por_dimensao[dimensao] = itens
+
+        avaliou = int(len(self.classificacao) - geral[SEM_NOTA])
+        return {
+            'geral': _nps(geral),
+            'dimensoes': por_dimensao,
+            'interacoes': {
+                'd1_d30_positivas': int(self.interacao_d1_d30.sum()),
+                'outros_periodos_positivas': int(self.interacao_outros.sum()),
+                'total_registros': len(self.classificacao)
+            },
+            'avaliacoes': {
+                'avaliou': avaliou,
+                'nao_avaliou': int(geral[SEM_NOTA]),
+                'total': len(self.classificacao)
+            }
+        }
+
+    def colunas(self):
+        """As quatro colunas Looker como Categorical (para materializar sob demanda)"""
+        sim_nao = pd.Index(['Não', 'Sim'])
+        return {
+            'Looker_Classificacao': pd.Categorical.from_codes(self.classificacao, ROTULOS_CLASSIFICACAO),
+            COLUNA_INTERACAO_D1_D30: pd.Categorical.from_codes(self.interacao_d1_d30.astype(np.int8), sim_nao),
+            COLUNA_INTERACAO_OUTROS: pd.Categorical.from_codes(self.interacao_outros.astype(np.int8), sim_nao),
+            'Looker_Avaliou': pd.Categorical.from_codes(self.avaliou.astype(np.int8), ['Não avaliou', 'Avaliou'])
+        }
+
+    def enriquecer(self):
+        """Cópia dos dados com as colunas Looker (só quando alguém pede as linhas)"""
+        return self.dados.assign(**self.colunas())
@@ -6,20 +6,285 @@ Data: 09/07/2025
 """
 
 import pandas as pd
+import numpy as np
 import gspread
 from google.oauth2.service_account import Credentials
-import requests
 from urllib.parse import urlparse
 import re
 from datetime import datetime
 import io
 import os
-from service_account_config import ServiceAccountConfig
+import codecs
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from sessao_http import obter_sessao, URL_BASE_DOCS
+from pool_clientes import obter_cliente
+from agregados_nps import AcumuladorNPS
+from esquema_colunas import assinatura, obter_esquema, registrar_formato_data
+from historico_nps import INCREMENTAL, abrir_historico, sincronizar
+from gspread.utils import rowcol_to_a1
+from instrumentacao import medir_etapa, submeter_com_contexto
+from prazo import timeout_prazo, verificar_prazo
 try:
     from auth_automatico import AuthAutomatico
 except ImportError:
     AuthAutomatico = None
 
+logger = logging.getLogger(__name__)
+
+
+# Correções de encoding comuns em cabeçalhos exportados
+CORRECOES_ENCODING = {
+    'AvaliaÃ§Ã£o': 'Avaliação',
+    'ComentÃ¡rio': 'Comentário',
+    'SituaÃ§Ã£o': 'Situação',
+    'ResouÃ§Ã£o': 'Resolução',
+    'InformaÃ§Ã£o': 'Informação',
+    'DescriÃ§Ã£o': 'Descrição',
+}
+
+# Formatos de data testados em ordem (padrão brasileiro primeiro)
+FORMATOS_DATA = (
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%H:%M:%S',
+    '%H:%M',
+)
+
+# Formatos dia/mês/ano que podem ser reordenados para ISO (parse vetorizado)
+FORMATOS_DIA_MES_ANO = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+# Tamanho da amostra usada para adivinhar o formato de data
+AMOSTRA_FORMATO_DATA = 50
+
+# Fração mínima da amostra que o formato adivinhado precisa converter
+TAXA_MINIMA_FORMATO_DATA = 0.9
+
+# Formato de data já identificado por nome de coluna
+_cache_formatos_data = {}
+
+# Encodings aceitos no export público, em ordem de preferência. cp1252 vem
+# antes de latin-1: latin-1 aceita qualquer byte e leria 0x80-0x9F (€, aspas
+# curvas, travessões) como caracteres de controle; cp1252 recusa 5 desses bytes
+ENCODINGS_SUPORTADOS = ('utf-8', 'cp1252', 'latin-1')
+
+# Bytes usados para detectar o encoding
+AMOSTRA_ENCODING = 64 * 1024
+
+# Encoding que funcionou por ID de planilha (as mais antigas saem acima do máximo)
+MAX_ENCODINGS_MEMORIZADOS = 1024
+_encoding_por_planilha = OrderedDict()
+_lock_encodings = threading.Lock()
+
+# Leitura paginada de abas grandes (gspread)
+LIMIAR_LINHAS_PAGINADO = int(os.environ.get('SHEETS_LIMIAR_PAGINADO', '20000'))
+LINHAS_POR_PAGINA = int(os.environ.get('SHEETS_LINHAS_POR_PAGINA', '5000'))
+PAGINAS_POR_REQUISICAO = 4   # ranges por chamada batch_get
+REQUISICOES_PARALELAS = 4
+
+
+@lru_cache(maxsize=1024)
+def _normalizar_nome_coluna(coluna):
+    """Normaliza um nome de coluna mantendo o nome original"""
+    col_limpa = str(coluna)
+    for original, corrigido in CORRECOES_ENCODING.items():
+        col_limpa = col_limpa.replace(original, corrigido)
+    
+    # split() também remove \n, \r, \t e espaços extras
+    return ' '.join(col_limpa.split())
+
+
+def _limpar_espacos(serie):
+    """Remove espaços das strings preservando valores ausentes e não-texto
+
+    Colunas de planilha repetem muito (loja, vendedor, nota), então o strip
+    é feito apenas sobre os valores únicos.
+    """
+    codigos, unicos = pd.factorize(serie)
+    if len(unicos) == 0:
+        return serie
+    
+    if len(unicos) > len(serie) // 2 and pd.api.types.infer_dtype(unicos, skipna=True) == 'string':
+        # Coluna quase sem repetição (datas com hora, ids): strip direto
+        return serie.str.strip()
+    
+    limpos = np.array(
+        [valor.strip() if isinstance(valor, str) else valor for valor in np.asarray(unicos, dtype=object)],
+        dtype=object
+    )
+    valores = limpos.take(codigos)
+    valores[codigos == -1] = None
+    
+    return pd.Series(valores, index=serie.index, dtype=serie.dtype, name=serie.name)
+
+
+def _adivinhar_formato_data(amostra):
+    """Retorna o formato que melhor converte a amostra, ou None"""
+    melhor_formato = None
+    melhor_taxa = 0
+    
+    for formato in FORMATOS_DATA:
+        taxa = pd.to_datetime(amostra, format=formato, errors='coerce').notna().mean()
+        if taxa == 1:
+            return formato
+        if taxa > melhor_taxa:
+            melhor_formato, melhor_taxa = formato, taxa
+    
+    # Tolera poucos valores inválidos na amostra (ex.: 31/02)
+    return melhor_formato if melhor_taxa >= TAXA_MINIMA_FORMATO_DATA else None
+
+
+def _converter_dia_mes_ano(serie, formato):
+    """Converte datas dd/mm/aaaa de largura fixa reordenando os bytes para ISO
+
+    O parse ISO do pandas é vetorizado, enquanto formatos como %d/%m/%Y
+    passam pelo strptime linha a linha. Retorna None se a coluna não tiver
+    largura fixa (o chamador usa o formato explícito).
+    """
+    largura = len(datetime(2000, 1, 1).strftime(formato))
+    validos = (serie.notna() & (serie != '')).to_numpy()
+    valores = serie[validos]
+    
+    if not (valores.str.len() == largura).all():
+        return None
+    
+    try:
+        matriz = valores.to_numpy(dtype=f'U{largura}').astype(f'S{largura}').view('S1').reshape(-1, largura)
+    except UnicodeEncodeError:
+        return None
+    
+    separador = np.full((len(matriz), 1), b'-')
+    iso = np.concatenate(
+        [matriz[:, 6:10], separador, matriz[:, 3:5], separador, matriz[:, 0:2], matriz[:, 10:]],
+        axis=1
+    ).view(f'S{largura}').ravel().astype(str)
+    
+    convertidas = pd.to_datetime(iso, format='ISO8601', errors='coerce')
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype=convertidas.dtype)
+    resultado[validos] = convertidas
+    return resultado
+
+
+def _converter_datas(serie, coluna, formato_conhecido=None):
+    """Converte uma coluna para datetime usando formato explícito em cache
+    
+    Returns:
+        tuple: (Series convertida, formato usado ou None se inferido pelo pandas)
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie, None
+    
+    amostra = serie.dropna()
+    amostra = amostra[amostra != ''].head(AMOSTRA_FORMATO_DATA)
+    
+    if len(amostra) == 0:
+        return pd.to_datetime(serie, errors='coerce', dayfirst=True), None
+    
+    formato = formato_conhecido or _cache_formatos_data.get(coluna)
+    if formato is None or pd.to_datetime(amostra, format=formato, errors='coerce').notna().mean() < TAXA_MINIMA_FORMATO_DATA:
+        formato = _adivinhar_formato_data(amostra)
+        if formato is None:
+            return _converter_datas_misturadas(serie), None
+    _cache_formatos_data[coluna] = formato
+    
+    if formato.startswith(FORMATOS_DIA_MES_ANO):
+        convertida = _converter_dia_mes_ano(serie, formato)
+        if convertida is not None:
+            return convertida, formato
+    
+    return pd.to_datetime(serie, format=formato, errors='coerce'), formato
+
+
+def _converter_datas_misturadas(serie):
+    """Formatos misturados: inferência do pandas valor a valor
+
+    Dia antes do mês como nas planilhas pt-BR (03/04 = 3 de abril); valores
+    ISO (aaaa-mm-dd) vão à parte, já que dayfirst também inverteria o ISO.
+    """
+    iso = serie.astype('string').str.match(r'\s*\d{4}-').fillna(False).to_numpy(dtype=bool)
+    convertida = pd.to_datetime(serie.where(~iso), errors='coerce', format='mixed', dayfirst=True)
+    if iso.any():
+        convertida[iso] = pd.to_datetime(serie[iso], errors='coerce', format='ISO8601')
+    return convertida
+
+
+def _converter_numero(serie):
+    """Converte a coluna para float se a amostra for numérica (senão mantém)"""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    
+    amostra = serie.dropna()
+    amostra = amostra[amostra != ''].head(AMOSTRA_FORMATO_DATA)
+    if len(amostra) == 0 or pd.to_numeric(amostra, errors='coerce').notna().mean() < TAXA_MINIMA_FORMATO_DATA:
+        return serie
+    
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def _detectar_encoding(conteudo, sheet_id=None):
+    """Detecta o encoding a partir de uma amostra dos bytes
+
+    UTF-8 estrito é sempre testado primeiro (uma amostra válida em UTF-8 é
+    conclusiva); depois o que já funcionou para a planilha (latin-1 quando o
+    cp1252 falhou antes) e então a ordem padrão.
+    """
+    if conteudo.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    
+    amostra = conteudo[:AMOSTRA_ENCODING]
+    with _lock_encodings:
+        conhecido = _encoding_por_planilha.get(sheet_id)
+    candidatos = ['utf-8'] + ([conhecido] if conhecido else []) + list(ENCODINGS_SUPORTADOS)
+    
+    for encoding in dict.fromkeys(candidatos):
+        try:
+            # final=False tolera caractere multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder(encoding)().decode(amostra, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    
+    return 'latin-1'
+
+
+def _lembrar_encoding(sheet_id, encoding):
+    """Memoriza o encoding da planilha (LRU limitado a MAX_ENCODINGS_MEMORIZADOS)"""
+    with _lock_encodings:
+        _encoding_por_planilha[sheet_id] = encoding
+        _encoding_por_planilha.move_to_end(sheet_id)
+        while len(_encoding_por_planilha) > MAX_ENCODINGS_MEMORIZADOS:
+            _encoding_por_planilha.popitem(last=False)
+
+
+def _ler_csv_bytes(conteudo, separador, encoding):
+    """Lê CSV/TSV direto do buffer de bytes"""
+    with medir_etapa('parse', bytes_lidos=len(conteudo)) as etapa:
+        dados = pd.read_csv(
+            io.BytesIO(conteudo),
+            sep=separador,
+            encoding=encoding,
+            na_values=['', 'NA', 'N/A', 'null', 'NULL'],
+            keep_default_na=True,
+            dtype=str  # Mantém como string para preservar dados
+        )
+        etapa.registrar(linhas=len(dados))
+    return dados
+
+
+def _batch_get_medido(worksheet, ranges):
+    """worksheet.batch_get registrado como etapa 'fetch'"""
+    with medir_etapa('fetch'):
+        return worksheet.batch_get(ranges)
+
 
 class NPSExtractor:
     """Classe para extrair dados NPS do Google Sheets"""
@@ -32,16 +297,18 @@ class NPSExtractor:
         """
         self.gc = None
         self.dados = None
+        self.historico = None
         self.auth_method = auth_method
         self.method_used = None
         
         # Configura autenticação
-        if auth_method == 'auto':
-            self._setup_auto_auth()
-        elif auth_method == 'service_account':
-            self._setup_service_account()
-        elif auth_method == 'oauth2':
-            self._setup_oauth2()
+        with medir_etapa('auth'):
+            if auth_method == 'auto':
+                self._setup_auto_auth()
+            elif auth_method == 'service_account':
+                self._setup_service_account()
+            elif auth_method == 'oauth2':
+                self._setup_oauth2()
         
     def conectar_sheets(self, url):
         """
@@ -53,18 +320,19 @@ class NPSExtractor:
         Returns:
             bool: True se conectado com sucesso
         """
+        verificar_prazo('fetch')
         try:
-            print(f"🔗 Conectando com: {url}")
+            logger.info("🔗 Conectando com: %s", url)
             
             # Usa método disponível
-            if self.gc and self.method_used in ['service_account', 'oauth2']:
+            if self.gc and self.method_used in ['service_account', 'auth_automatico', 'oauth2']:
                 return self._conectar_com_auth(url)
             
             # Fallback: método público
             return self._conectar_publico(url)
             
         except Exception as e:
-            print(f"❌ Erro na conexão: {str(e)}")
+            logger.error("❌ Erro na conexão: %s", e)
             return False
     
     def _setup_auto_auth(self):
@@ -80,50 +348,45 @@ class NPSExtractor:
                 return
         
         # Fallback: método público
-        print("⚠️ Usando método público (apenas planilhas públicas)")
+        logger.warning("⚠️ Usando método público (apenas planilhas públicas)")
         self.method_used = 'public'
     
     def _setup_service_account(self):
-        """Configura Service Account"""
+        """Configura Service Account (cliente reaproveitado do pool do processo)"""
         try:
             if os.path.exists('credentials/service-account.json'):
-                print("🔐 Configurando Service Account...")
-                config = ServiceAccountConfig()
-                if config.setup_credentials():
-                    self.gc = config.get_client()
+                gc = obter_cliente('service_account')
+                if gc is not None:
+                    self.gc = gc
                     self.method_used = 'service_account'
-                    print("✅ Service Account configurado!")
                     return True
                 else:
-                    print("⚠️ Erro na configuração Service Account")
+                    logger.warning("⚠️ Erro na configuração Service Account")
             else:
-                print("⚠️ Service Account não encontrado")
+                logger.warning("⚠️ Service Account não encontrado")
                 
         except Exception as e:
-            print(f"⚠️ Erro Service Account: {str(e)}")
+            logger.warning("⚠️ Erro Service Account: %s", e)
         
         return False
     
     def _setup_auth_automatico(self):
-        """Configura Auth Automático (suas credenciais automáticas)"""
+        """Configura Auth Automático (cliente reaproveitado do pool do processo)"""
         try:
             if AuthAutomatico is None:
-                print("⚠️ Auth Automático não disponível")
+                logger.warning("⚠️ Auth Automático não disponível")
                 return False
-                
-            print("🔑 Configurando Auth Automático (suas credenciais)...")
-            config = AuthAutomatico()
             
-            if config.conectar_automatico():
-                self.gc = config.get_client()
+            gc = obter_cliente('auth_automatico')
+            if gc is not None:
+                self.gc = gc
                 self.method_used = 'auth_automatico'
-                print("✅ Auth Automático configurado!")
                 return True
             else:
-                print("⚠️ Auth Automático não configurado")
+                logger.warning("⚠️ Auth Automático não configurado")
                 
         except Exception as e:
-            print(f"⚠️ Erro Auth Automático: {str(e)}")
+            logger.warning("⚠️ Erro Auth Automático: %s", e)
         
         return False
     
@@ -131,41 +394,43 @@ class NPSExtractor:
         """Conecta usando autenticação e extrai TODOS os dados disponíveis"""
         try:
             method_name = self._get_method_name()
-            print(f"🔐 Conectando com {method_name}...")
+            logger.info("🔐 Conectando com %s...", method_name)
             
             # Extrai ID da planilha
             sheet_id = self._extrair_sheet_id(url)
             if not sheet_id:
-                print("❌ ID da planilha não encontrado")
+                logger.error("❌ ID da planilha não encontrado")
                 return False
             
-            # Abre planilha
-            spreadsheet = self.gc.open_by_key(sheet_id)
-            
-            # Lista todas as abas disponíveis
-            worksheets = spreadsheet.worksheets()
-            print(f"📋 Encontradas {len(worksheets)} abas: {[ws.title for ws in worksheets]}")
+            # Abre planilha e lista todas as abas disponíveis
+            with medir_etapa('fetch'):
+                spreadsheet = self.gc.open_by_key(sheet_id)
+                worksheets = spreadsheet.worksheets()
+            logger.debug("📋 Encontradas %s abas: %s", len(worksheets), [ws.title for ws in worksheets])
             
             # Prioriza primeira aba ou aba com mais dados
             worksheet = self._selecionar_melhor_aba(worksheets)
-            print(f"📊 Usando aba: '{worksheet.title}'")
+            logger.debug("📊 Usando aba: '%s'", worksheet.title)
             
-            # Extração completa com múltiplos métodos
-            dados_completos = self._extrair_dados_completos(worksheet)
+            # Meses congelados do histórico + linhas novas; senão extração completa
+            dados_completos = self._extrair_incremental(worksheet, sheet_id)
+            if dados_completos is None:
+                dados_completos = self._extrair_dados_completos(worksheet)
             
             if dados_completos is None or len(dados_completos) == 0:
-                print("❌ Nenhum dado válido encontrado")
+                logger.error("❌ Nenhum dado válido encontrado")
                 return False
             
             self.dados = dados_completos
-            print(f"✅ {len(self.dados)} registros extraídos com {len(self.dados.columns)} colunas")
-            print(f"📋 Colunas: {list(self.dados.columns)}")
+            self.historico = sincronizar(sheet_id, self.dados)
+            logger.info("✅ %s registros extraídos com %s colunas", len(self.dados), len(self.dados.columns))
+            logger.debug("📋 Colunas: %s", list(self.dados.columns))
             
             return True
             
         except Exception as e:
-            print(f"❌ Erro {self._get_method_name()}: {str(e)}")
-            print("🔄 Tentando método público...")
+            logger.error("❌ Erro %s: %s", self._get_method_name(), e)
+            logger.debug("🔄 Tentando método público...")
             return self._conectar_publico(url)
     
     def _get_method_name(self):
@@ -182,208 +447,377 @@ class NPSExtractor:
         melhor_aba = worksheets[0]  # Padrão: primeira aba
         maior_linhas = 0
         
-        for ws in worksheets:
-            try:
-                # Conta linhas com dados (evita contar linhas vazias)
-                valores = ws.get_all_values()
-                linhas_com_dados = len([linha for linha in valores if any(cel.strip() for cel in linha)])
-                
-                print(f"📊 Aba '{ws.title}': {linhas_com_dados} linhas com dados")
-                
-                if linhas_com_dados > maior_linhas:
-                    maior_linhas = linhas_com_dados
-                    melhor_aba = ws
-                    
-            except Exception as e:
-                print(f"⚠️ Erro ao analisar aba '{ws.title}': {str(e)}")
-                continue
+        try:
+            # Uma única chamada com as primeiras colunas de cada aba, em vez de
+            # baixar todas as abas inteiras só para contar linhas
+            ranges = ["'{}'!A:C".format(ws.title.replace("'", "''")) for ws in worksheets]
+            with medir_etapa('fetch'):
+                resposta = worksheets[0].spreadsheet.values_batch_get(ranges)
+            valores_por_aba = [vr.get('values', []) for vr in resposta.get('valueRanges', [])]
+        except Exception as e:
+            logger.warning("⚠️ Erro ao analisar abas: %s", e)
+            return melhor_aba
+        
+        for ws, valores in zip(worksheets, valores_por_aba):
+            # Conta linhas com dados (evita contar linhas vazias)
+            linhas_com_dados = len([linha for linha in valores if any(str(cel).strip() for cel in linha)])
+            
+            logger.debug("📊 Aba '%s': %s linhas com dados", ws.title, linhas_com_dados)
+            
+            if linhas_com_dados > maior_linhas:
+                maior_linhas = linhas_com_dados
+                melhor_aba = ws
         
         return melhor_aba
     
     def _extrair_dados_completos(self, worksheet):
         """Extrai TODOS os dados usando múltiplos métodos"""
         try:
+            # Abas grandes: leitura paginada em vez de uma única resposta gigante
+            if worksheet.row_count > LIMIAR_LINHAS_PAGINADO:
+                logger.info("🔍 Aba com %s linhas: extração paginada...", worksheet.row_count)
+                try:
+                    paginas = list(self.iterar_paginas(worksheet))
+                    if paginas:
+                        df = pd.concat(paginas)
+                        df.attrs.update({'limpeza_completa': True, 'indice_planilha': True})
+                        logger.info("✅ Extração paginada: %s registros em %s páginas", len(df), len(paginas))
+                        return df
+                except Exception as e:
+                    logger.warning("⚠️ Extração paginada falhou: %s", e)
+            
             # Método 1: get_all_records (preserva tipos)
-            print("🔍 Tentando extração com get_all_records...")
+            logger.debug("🔍 Tentando extração com get_all_records...")
             try:
-                records = worksheet.get_all_records(empty_value='', head=1)
+                with medir_etapa('fetch'):
+                    records = worksheet.get_all_records(empty_value='', head=1)
                 if records:
-                    df = pd.DataFrame(records)
-                    print(f"✅ Método 1: {len(df)} registros extraídos")
+                    with medir_etapa('parse', linhas=len(records)):
+                        df = pd.DataFrame(records)
+                    df.attrs['indice_planilha'] = True
+                    logger.debug("✅ Método 1: %s registros extraídos", len(df))
                     return self._limpar_dados_completos(df)
             except Exception as e:
-                print(f"⚠️ Método 1 falhou: {str(e)}")
+                logger.warning("⚠️ Método 1 falhou: %s", e)
             
             # Método 2: get_all_values (matriz bruta)
-            print("🔍 Tentando extração com get_all_values...")
+            verificar_prazo('fetch')
+            logger.debug("🔍 Tentando extração com get_all_values...")
             try:
-                valores = worksheet.get_all_values()
+                with medir_etapa('fetch'):
+                    valores = worksheet.get_all_values()
                 if valores and len(valores) > 1:
                     # Primeira linha como cabeçalho
                     cabecalho = valores[0]
                     dados = valores[1:]
                     
-                    # Remove linhas completamente vazias
-                    dados_filtrados = [linha for linha in dados if any(cel.strip() for cel in linha)]
+                    # Remove linhas completamente vazias (índice = posição na planilha)
+                    posicoes = [numero for numero, linha in enumerate(dados) if any(cel.strip() for cel in linha)]
+                    dados_filtrados = [dados[numero] for numero in posicoes]
                     
-                    df = pd.DataFrame(dados_filtrados, columns=cabecalho)
-                    print(f"✅ Método 2: {len(df)} registros extraídos")
+                    with medir_etapa('parse', linhas=len(dados_filtrados)):
+                        df = pd.DataFrame(dados_filtrados, columns=cabecalho, index=posicoes)
+                    df.attrs['indice_planilha'] = True
+                    logger.debug("✅ Método 2: %s registros extraídos", len(df))
                     return self._limpar_dados_completos(df)
             except Exception as e:
-                print(f"⚠️ Método 2 falhou: {str(e)}")
+                logger.warning("⚠️ Método 2 falhou: %s", e)
             
             # Método 3: Range específico (última tentativa)
-            print("🔍 Tentando extração por range...")
+            verificar_prazo('fetch')
+            logger.debug("🔍 Tentando extração por range...")
             try:
                 # Detecta range de dados
-                range_dados = worksheet.get_all_values()
+                with medir_etapa('fetch'):
+                    range_dados = worksheet.get_all_values()
                 if range_dados:
                     df = pd.DataFrame(range_dados[1:], columns=range_dados[0])
                     df = df.dropna(how='all')  # Remove linhas completamente vazias
-                    print(f"✅ Método 3: {len(df)} registros extraídos")
+                    logger.debug("✅ Método 3: %s registros extraídos", len(df))
                     return self._limpar_dados_completos(df)
             except Exception as e:
-                print(f"⚠️ Método 3 falhou: {str(e)}")
+                logger.warning("⚠️ Método 3 falhou: %s", e)
             
             return None
             
         except Exception as e:
-            print(f"❌ Erro na extração completa: {str(e)}")
+            logger.error("❌ Erro na extração completa: %s", e)
             return None
     
-    def _limpar_dados_completos(self, df):
-        """Limpeza avançada mantendo TODOS os dados relevantes"""
+    def _extrair_incremental(self, worksheet, sheet_id):
+        """Meses congelados do histórico + linhas da planilha a partir do corte
+        
+        Returns:
+            pandas.DataFrame ou None (sem histórico utilizável: extração completa)
+        """
+        if not INCREMENTAL:
+            return None
+        historico = abrir_historico(sheet_id)
+        if historico is None or historico.linha_corte is None or not historico.congelados():
+            return None
+        
         try:
-            print(f"🧹 Limpando dados: {len(df)} registros, {len(df.columns)} colunas")
+            # Cabeçalho diferente do histórico: extração completa recria as partições
+            with medir_etapa('fetch'):
+                cabecalho = [_normalizar_nome_coluna(coluna) for coluna in worksheet.row_values(1)]
+            if assinatura(cabecalho) != historico.manifesto.get('assinatura'):
+                return None
             
-            # Remove apenas linhas completamente vazias
-            df = df.dropna(how='all')
+            paginas = list(self.iterar_paginas(worksheet, linha_inicial=historico.linha_corte + 2))
+            recentes = pd.concat(paginas) if paginas else None
+            dados = historico.juntar(recentes)
+            
+            logger.info("📚 Extração incremental: %s linha(s) a partir da linha %s + %s mês(es) do histórico",
+                        0 if recentes is None else len(recentes), historico.linha_corte + 2,
+                        len(historico.congelados()))
+            return dados
+            
+        except Exception as e:
+            logger.warning("⚠️ Extração incremental falhou, lendo a planilha inteira: %s", e)
+            return None
+    
+    def iterar_paginas(self, worksheet, linhas_por_pagina=None, linha_inicial=2):
+        """
+        Lê a aba em páginas de linhas, com requisições batch_get em paralelo
+        
+        Cada página é limpa e tipada assim que chega, então nunca existe a
+        matriz de strings da aba inteira em memória.
+        
+        Args:
+            worksheet: aba gspread
+            linhas_por_pagina: linhas por página (padrão LINHAS_POR_PAGINA)
+            linha_inicial: primeira linha de dados (1 é o cabeçalho)
+            
+        Yields:
+            pandas.DataFrame: página limpa, na ordem da planilha
+        """
+        linhas_por_pagina = linhas_por_pagina or LINHAS_POR_PAGINA
+        cabecalho = worksheet.row_values(1)
+        if not cabecalho:
+            return
+        
+        ultima_coluna = rowcol_to_a1(1, len(cabecalho)).rstrip('0123456789')
+        ultima_linha = worksheet.row_count
+        
+        # Agrupa os ranges das páginas em requisições batch_get
+        requisicoes = []
+        primeiras_linhas = []
+        for inicio in range(linha_inicial, ultima_linha + 1, linhas_por_pagina * PAGINAS_POR_REQUISICAO):
+            ranges = []
+            primeiras = []
+            for pagina in range(PAGINAS_POR_REQUISICAO):
+                de = inicio + pagina * linhas_por_pagina
+                if de > ultima_linha:
+                    break
+                ate = min(de + linhas_por_pagina - 1, ultima_linha)
+                ranges.append(f"A{de}:{ultima_coluna}{ate}")
+                primeiras.append(de)
+            requisicoes.append(ranges)
+            primeiras_linhas.append(primeiras)
+        
+        with ThreadPoolExecutor(max_workers=REQUISICOES_PARALELAS) as executor:
+            # Janela limitada de requisições em voo, consumidas em ordem
+            pendentes = []
+            proxima = 0
+            while proxima < len(requisicoes) or pendentes:
+                verificar_prazo('fetch')
+                while proxima < len(requisicoes) and len(pendentes) < REQUISICOES_PARALELAS:
+                    pendentes.append(submeter_com_contexto(executor, _batch_get_medido, worksheet, requisicoes[proxima]))
+                    proxima += 1
+                
+                primeiras = primeiras_linhas[proxima - len(pendentes)]
+                paginas = pendentes.pop(0).result()
+                vazias = 0
+                for valores, de in zip(paginas, primeiras):
+                    df = self._pagina_para_dataframe(valores, cabecalho, de)
+                    if df is None:
+                        vazias += 1
+                        continue
+                    yield df
+                
+                # Requisição inteira vazia: fim dos dados da aba
+                if vazias == len(paginas):
+                    for futuro in pendentes:
+                        futuro.cancel()
+                    return
+    
+    def _pagina_para_dataframe(self, valores, cabecalho, primeira_linha=2):
+        """Converte uma página de valores em DataFrame limpo (None se vazia)
+        
+        O índice é a posição da linha na planilha (0 = linha 2).
+        """
+        posicoes = [primeira_linha - 2 + numero for numero, linha in enumerate(valores)
+                    if any(str(cel).strip() for cel in linha)]
+        if not posicoes:
+            return None
+        
+        # A API omite células vazias no fim da linha
+        largura = len(cabecalho)
+        base = primeira_linha - 2
+        linhas = [valores[posicao - base] + [''] * (largura - len(valores[posicao - base])) for posicao in posicoes]
+        
+        with medir_etapa('parse', linhas=len(linhas)):
+            df = pd.DataFrame(linhas, columns=cabecalho, index=posicoes)
+        
+        return self._limpar_dados_completos(df)
+    
+    def calcular_metricas_paginadas(self, url, linhas_por_pagina=None):
+        """
+        Calcula as métricas de contagem lendo a planilha página a página
+        
+        Caminho para abas próximas do limite do Google Sheets: cada página é
+        contada e descartada, sem montar o DataFrame completo.
+        
+        Returns:
+            AcumuladorNPS: contagens acumuladas (None se falhar)
+        """
+        if not self.gc:
+            logger.error("❌ Leitura paginada requer autenticação (Service Account ou OAuth2)")
+            return None
+        
+        try:
+            sheet_id = self._extrair_sheet_id(url)
+            if not sheet_id:
+                logger.error("❌ ID da planilha não encontrado")
+                return None
+            
+            with medir_etapa('fetch'):
+                spreadsheet = self.gc.open_by_key(sheet_id)
+                worksheets = spreadsheet.worksheets()
+            worksheet = self._selecionar_melhor_aba(worksheets)
             
-            # Normaliza nomes de colunas (remove caracteres especiais)
-            df.columns = df.columns.str.strip()
-            df.columns = df.columns.str.replace('\n', ' ')
-            df.columns = df.columns.str.replace('\r', ' ')
+            acumulador = AcumuladorNPS()
+            for pagina in self.iterar_paginas(worksheet, linhas_por_pagina):
+                acumulador.adicionar_lote(pagina)
             
-            # EXTRAÇÃO UNIVERSAL - Mantém TODAS as colunas de QUALQUER planilha
-            colunas_corrigidas = {}
-            for col in df.columns:
-                col_limpa = col.strip()
+            logger.info("✅ %s registros contados em páginas", acumulador.total_linhas)
+            return acumulador
+            
+        except Exception as e:
+            logger.error("❌ Erro na leitura paginada: %s", e)
+            return None
+    
+    def _limpar_dados_completos(self, df):
+        """Limpeza avançada mantendo TODOS os dados relevantes
+
+        Etapa única guiada pelo esquema: as colunas são classificadas uma
+        vez, as datas usam formatos explícitos e as linhas inválidas são
+        removidas com uma única máscara combinada.
+        """
+        verificar_prazo('clean')
+        try:
+            logger.debug("🧹 Limpando dados: %s registros, %s colunas", len(df), len(df.columns))
+            
+            with medir_etapa('clean', linhas=len(df)):
+                # Normaliza nomes de colunas (remove caracteres especiais e corrige encoding)
+                df = df.set_axis([_normalizar_nome_coluna(col) for col in df.columns], axis=1)
+                
+                # Esquema do cabeçalho: inferido uma vez, depois vem do cache
+                esquema = obter_esquema(df.columns)
+                colunas_data, colunas_chave = esquema['datas'], esquema['chave']
+                
+                # Limpa espaços em strings (preserva NaN em vez de virar 'nan')
+                for col in df.select_dtypes(include=['object', 'string']).columns:
+                    df[col] = _limpar_espacos(df[col])
                 
-                # Remove apenas caracteres que causam problemas técnicos
-                col_limpa = col_limpa.replace('\n', ' ')
-                col_limpa = col_limpa.replace('\r', ' ')
-                col_limpa = col_limpa.replace('\t', ' ')
+                # Converte datas com formato explícito
+                for col in colunas_data:
+                    df[col], formato = _converter_datas(df[col], col, esquema['formatos_data'].get(col))
+                    registrar_formato_data(esquema, col, formato)
                 
-                # Corrige apenas encoding comum (mantém nomes originais)
-                col_limpa = col_limpa.replace('AvaliaÃ§Ã£o', 'Avaliação')
-                col_limpa = col_limpa.replace('ComentÃ¡rio', 'Comentário')
-                col_limpa = col_limpa.replace('SituaÃ§Ã£o', 'Situação')
-                col_limpa = col_limpa.replace('ResouÃ§Ã£o', 'Resolução')
-                col_limpa = col_limpa.replace('InformaÃ§Ã£o', 'Informação')
-                col_limpa = col_limpa.replace('DescriÃ§Ã£o', 'Descrição')
+                # Notas já tipadas (float) para as métricas
+                for col, tipo in esquema['tipos'].items():
+                    if tipo == 'float64' and col in df.columns:
+                        df[col] = _converter_numero(df[col])
                 
-                # Remove espaços extras mas MANTÉM o nome original
-                col_limpa = ' '.join(col_limpa.split())
+                # Máscara única: remove linhas completamente vazias e linhas
+                # onde a coluna principal está vazia
+                mascara = df.notna().any(axis=1).to_numpy(copy=True)
+                for col in colunas_chave:
+                    serie = df[col]
+                    mascara &= (serie.notna() & (serie != '')).to_numpy()
                 
-                colunas_corrigidas[col] = col_limpa
-            
-            df = df.rename(columns=colunas_corrigidas)
-            
-            # Converte datas automaticamente
-            for col in df.columns:
-                if any(palavra in col.lower() for palavra in ['data', 'date', 'timestamp', 'hora']):
-                    try:
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
-                    except:
-                        pass
-            
-            # Limpa espaços em strings
-            for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].astype(str).str.strip()
-                # Remove linhas onde a coluna principal está vazia
-                if col.lower() in ['nome', 'cliente', 'vendedor']:
-                    df = df[df[col] != '']
-            
-            print(f"✅ Dados limpos: {len(df)} registros válidos")
+                if not mascara.all():
+                    df = df.loc[mascara]
+                
+                df.attrs['limpeza_completa'] = True
+            
+            logger.debug("✅ Dados limpos: %s registros válidos", len(df))
             return df
             
         except Exception as e:
-            print(f"❌ Erro na limpeza: {str(e)}")
+            logger.error("❌ Erro na limpeza: %s", e)
             return df  # Retorna dados originais se limpeza falhar
     
     def _conectar_publico(self, url):
         """Conecta usando método público com extração robusta"""
         try:
-            print("🌐 Conectando com método público...")
+            logger.debug("🌐 Conectando com método público...")
             
             # Extrai ID da planilha
             sheet_id = self._extrair_sheet_id(url)
             if not sheet_id:
-                print("❌ Erro: ID da planilha não encontrado")
+                logger.error("❌ Erro: ID da planilha não encontrado")
                 return False
             
             # Tenta múltiplos formatos de export
             formatos = [
-                ('CSV', f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"),
-                ('TSV', f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=tsv"),
-                ('CSV com gid=0', f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=0")
+                ('CSV', f"{URL_BASE_DOCS}/spreadsheets/d/{sheet_id}/export?format=csv"),
+                ('TSV', f"{URL_BASE_DOCS}/spreadsheets/d/{sheet_id}/export?format=tsv"),
+                ('CSV com gid=0', f"{URL_BASE_DOCS}/spreadsheets/d/{sheet_id}/export?format=csv&gid=0")
             ]
             
             for formato, export_url in formatos:
+                verificar_prazo('fetch')
                 try:
-                    print(f"🔍 Tentando formato {formato}...")
+                    logger.debug("🔍 Tentando formato %s...", formato)
                     
-                    response = requests.get(export_url, timeout=30)
+                    with medir_etapa('fetch') as etapa:
+                        response = obter_sessao().get(export_url, timeout=timeout_prazo(30))
+                        etapa.registrar(bytes_lidos=len(response.content))
                     
-                    if response.status_code == 200 and response.text.strip():
-                        print(f"✅ Dados obtidos via {formato}")
+                    if response.status_code == 200 and response.content.strip():
+                        logger.debug("✅ Dados obtidos via %s", formato)
                         
                         # Detecta separador
                         separador = ',' if formato.startswith('CSV') else '\t'
                         
-                        # Múltiplos encodings
-                        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+                        # Encoding detectado uma vez por amostra de bytes
+                        encoding = _detectar_encoding(response.content, sheet_id)
+                        
+                        try:
+                            # Carrega dados direto do buffer de bytes em uma passada
+                            self.dados = _ler_csv_bytes(response.content, separador, encoding)
+                        except UnicodeDecodeError:
+                            # Byte inválido fora da amostra: latin-1 decodifica qualquer byte
+                            logger.warning("⚠️ Encoding %s falhou fora da amostra, usando latin-1", encoding)
+                            encoding = 'latin-1'
+                            self.dados = _ler_csv_bytes(response.content, separador, encoding)
+                        
+                        _lembrar_encoding(sheet_id, encoding)
+                        
+                        # Aplica limpeza robusta
+                        self.dados = self._limpar_dados_completos(self.dados)
                         
-                        for encoding in encodings:
-                            try:
-                                # Decodifica com encoding específico
-                                texto_decodificado = response.content.decode(encoding)
-                                
-                                # Carrega dados
-                                self.dados = pd.read_csv(
-                                    io.StringIO(texto_decodificado), 
-                                    sep=separador,
-                                    encoding=None,  # Já decodificado
-                                    na_values=['', 'NA', 'N/A', 'null', 'NULL'],
-                                    keep_default_na=True,
-                                    dtype=str  # Mantém como string para preservar dados
-                                )
-                                
-                                # Aplica limpeza robusta
-                                self.dados = self._limpar_dados_completos(self.dados)
-                                
-                                if len(self.dados) > 0:
-                                    print(f"✅ {len(self.dados)} registros extraídos via método público")
-                                    print(f"📋 Colunas encontradas: {list(self.dados.columns)}")
-                                    return True
-                                    
-                            except Exception as e:
-                                print(f"⚠️ Encoding {encoding} falhou: {str(e)[:50]}...")
-                                continue
+                        if len(self.dados) > 0:
+                            self.historico = sincronizar(sheet_id, self.dados)
+                            logger.info("✅ %s registros extraídos via método público (%s)", len(self.dados), encoding)
+                            logger.debug("📋 Colunas encontradas: %s", list(self.dados.columns))
+                            return True
                         
                     else:
-                        print(f"⚠️ {formato} retornou código {response.status_code}")
+                        logger.warning("⚠️ %s retornou código %s", formato, response.status_code)
                         
                 except Exception as e:
-                    print(f"⚠️ Erro em {formato}: {str(e)[:50]}...")
+                    logger.warning("⚠️ Erro em %s: %s...", formato, str(e)[:50])
                     continue
             
-            print("❌ Todos os métodos públicos falharam")
-            print("💡 Verifique se a planilha está pública e tente OAuth2")
+            logger.error("❌ Todos os métodos públicos falharam")
+            logger.info("💡 Verifique se a planilha está pública e tente OAuth2")
             return False
                 
         except Exception as e:
-            print(f"❌ Erro crítico na conexão pública: {str(e)}")
+            logger.error("❌ Erro crítico na conexão pública: %s", e)
             return False
     
     def extrair_avaliacoes(self):
@@ -394,11 +828,11 @@ class NPSExtractor:
             pandas.DataFrame: Todos os dados para análise IA
         """
         if self.dados is None:
-            print("❌ Erro: Dados não carregados")
+            logger.error("❌ Erro: Dados não carregados")
             return None
         
         try:
-            print("🔍 Extraindo TODOS os dados para análise pós-venda...")
+            logger.debug("🔍 Extraindo TODOS os dados para análise pós-venda...")
             
             # Retorna TODOS os dados sem filtros para análise completa
             dados_completos = self.dados.copy()
@@ -406,38 +840,22 @@ class NPSExtractor:
             # Apenas limpeza básica de dados
             dados_completos = self._limpar_dados_basicos(dados_completos)
             
-            print(f"✅ {len(dados_completos)} registros completos extraídos")
-            print(f"📋 Todas as colunas: {list(dados_completos.columns)}")
+            logger.info("✅ %s registros completos extraídos", len(dados_completos))
+            logger.debug("📋 Todas as colunas: %s", list(dados_completos.columns))
             
             return dados_completos
             
         except Exception as e:
-            print(f"❌ Erro na extração: {str(e)}")
+            logger.error("❌ Erro na extração: %s", e)
             return None
     
     def _limpar_dados_basicos(self, df):
         """Limpeza básica dos dados mantendo todas as informações"""
-        try:
-            # Remove linhas completamente vazias
-            df = df.dropna(how='all')
-            
-            # Converte datas se existir coluna de data
-            colunas_data = [col for col in df.columns if any(palavra in col.lower() for palavra in ['data', 'date', 'timestamp'])]
-            for col in colunas_data:
-                try:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                except:
-                    pass
-            
-            # Limpa espaços em branco
-            for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].astype(str).str.strip()
-            
-            return df
-            
-        except Exception as e:
-            print(f"⚠️ Erro na limpeza básica: {str(e)}")
+        # Dados vindos de conectar_sheets já passaram pela limpeza completa
+        if df.attrs.get('limpeza_completa'):
             return df
+        
+        return self._limpar_dados_completos(df)
     
     def _extrair_sheet_id(self, url):
         """Extrai ID da planilha da URL"""
@@ -449,42 +867,19 @@ class NPSExtractor:
             return None
     
     def _detectar_colunas(self):
-        """Detecta colunas automaticamente"""
-        colunas = {}
-        
-        print("🔍 Detectando colunas automaticamente...")
-        print(f"📋 Colunas disponíveis: {list(self.dados.columns)}")
-        
-        # Padrões para cada tipo de coluna
-        padroes = {
-            'data': ['data', 'date', 'timestamp', 'created', 'hora', 'time'],
-            'nome': ['nome', 'name', 'client', 'customer', 'cliente'],
-            'loja': ['loja', 'store', 'unidade', 'filial', 'shop'],
-            'vendedor': ['vendedor', 'atendente', 'funcionario', 'staff', 'seller', 'funcionário'],
-            'avaliacao': ['avaliacao', 'avaliação', 'nota', 'score', 'rating', 'nps', 'nota_nps', 'grade'],
-            'classificacao': ['classificacao', 'classificação', 'category', 'tipo', 'class']
-        }
-        
-        # Busca colunas
-        for tipo, palavras in padroes.items():
-            for coluna in self.dados.columns:
-                coluna_lower = coluna.lower().strip()
-                for palavra in palavras:
-                    if palavra in coluna_lower:
-                        colunas[tipo] = coluna
-                        print(f"   ✅ {tipo.upper()}: {coluna}")
-                        break
-                if tipo in colunas:
-                    break
-            
-            if tipo not in colunas:
-                print(f"   ❌ {tipo.upper()}: Não encontrada")
+        """Detecta colunas automaticamente (esquema em cache pelo cabeçalho)"""
+        logger.debug("🔍 Detectando colunas automaticamente...")
+        logger.debug("📋 Colunas disponíveis: %s", list(self.dados.columns))
+        
+        canonicas = obter_esquema(self.dados.columns)['canonicas']
+        colunas = {canonica.lower(): coluna for canonica, coluna in canonicas.items()}
+        logger.debug("   ✅ %s", colunas)
         
         # Verifica se tem pelo menos avaliação
         if 'avaliacao' not in colunas:
-            print("⚠️ ATENÇÃO: Coluna de avaliação não encontrada!")
-            print("💡 Certifique-se que sua planilha tem uma coluna com notas (0-10)")
-            print("📋 Nomes aceitos: avaliacao, avaliação, nota, score, rating, nps")
+            logger.warning("⚠️ ATENÇÃO: Coluna de avaliação não encontrada!")
+            logger.info("💡 Certifique-se que sua planilha tem uma coluna com notas (0-10)")
+            logger.info("📋 Nomes aceitos: avaliacao, avaliação, nota, score, rating, nps")
         
         return colunas
     
@@ -511,7 +906,7 @@ class NPSExtractor:
             return df
             
         except Exception as e:
-            print(f"⚠️ Erro na limpeza: {str(e)}")
+            logger.warning("⚠️ Erro na limpeza: %s", e)
             return df
 
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Perfilador opcional por requisição de análise
+Ativado pelo campo "perfil" da requisição ou pelo header X-Profile; sem
+o flag nenhum perfilador é criado
+"""
+
+import cProfile
+import logging
+import os
+import threading
+from datetime import datetime
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # sem pyinstrument: cProfile, um perfil por vez
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+
+# Pasta onde os perfis ficam junto dos PDFs
+PASTA_PERFIS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'relatorios')
+
+# Intervalo de amostragem do pyinstrument (segundos)
+INTERVALO_AMOSTRAGEM = float(os.environ.get('PERFIL_INTERVALO', '0.001'))
+
+VALORES_ATIVOS = ('1', 'true', 'sim', 'yes', 'on')
+
+# cProfile é global no processo (só um ativo por vez e registra todas as threads)
+_lock_cprofile = threading.Lock()
+
+
+def perfil_solicitado(valor_campo=None, valor_header=None):
+    """Indica se a requisição pediu perfil (campo "perfil" ou header X-Profile)"""
+    for valor in (valor_campo, valor_header):
+        if valor is True:
+            return True
+        if isinstance(valor, str) and valor.strip().lower() in VALORES_ATIVOS:
+            return True
+    return False
+
+
+class perfilar:
+    """Executa um bloco sob perfilador e salva o resultado em relatorios/
+
+    Usa pyinstrument (amostragem da thread da requisição, flamegraph HTML).
+    Sem pyinstrument, cai para cProfile (.pstats), um perfil por vez no
+    processo: com outro perfil em andamento, o bloco roda sem perfil.
+    Após o bloco, `arquivo` tem o nome do perfil salvo (None se não houve).
+
+    Uso:
+        with perfilar('analise') as perfil:
+            ...
+        resultado['perfil_url'] = f'/relatorios/{perfil.arquivo}'
+    """
+
+    def __init__(self, nome='analise'):
+        self.nome = nome.replace(' ', '_').replace('/', '_')
+        self.arquivo = None
+        self._perfilador = None
+
+    def __enter__(self):
+        if Profiler is not None:
+            self._perfilador = Profiler(interval=INTERVALO_AMOSTRAGEM)
+            self._perfilador.start()
+        elif _lock_cprofile.acquire(blocking=False):
+            try:
+                self._perfilador = cProfile.Profile()
+                self._perfilador.enable()
+            except ValueError as e:
+                # Outro perfilador/depurador ativo no processo
+                logger.warning("⚠️ Perfil não coletado: %s", e)
+                self._perfilador = None
+                _lock_cprofile.release()
+        else:
+            logger.warning("⚠️ Perfil não coletado: outro perfil cProfile em andamento")
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        if self._perfilador is None:
+            return False
+
+        try:
+            os.makedirs(PASTA_PERFIS, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+            if Profiler is not None:
+                self._perfilador.stop()
+                self.arquivo = f"perfil_{self.nome}_{timestamp}.html"
+                with open(os.path.join(PASTA_PERFIS, self.arquivo), 'w', encoding='utf-8') as f:
+                    f.write(self._perfilador.output_html())
+            else:
+                try:
+                    self._perfilador.disable()
+                finally:
+                    _lock_cprofile.release()
+                self.arquivo = f"perfil_{self.nome}_{timestamp}.pstats"
+                self._perfilador.dump_stats(os.path.join(PASTA_PERFIS, self.arquivo))
+
+            logger.info("🔬 Perfil salvo: %s", self.arquivo)
+
+        except Exception as e:
+            logger.warning("⚠️ Erro ao salvar perfil: %s", e)
+            self.arquivo = None
+
+        return False
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Pool de clientes gspread compartilhado pelo processo
+Cria cada cliente autenticado uma vez e o reaproveita entre requisições
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from google.auth.transport.requests import Request
+
+from sessao_http import redirecionar_sheets_api
+
+logger = logging.getLogger(__name__)
+
+
+# Arquivos de credenciais por método de autenticação
+ARQUIVOS_CREDENCIAIS = {
+    'service_account': 'credentials/service-account.json',
+    'auth_automatico': 'credentials/token_automatico.json'
+}
+
+# Intervalo mínimo entre verificações de saúde de um cliente (segundos)
+INTERVALO_VERIFICACAO = int(os.environ.get('GSPREAD_INTERVALO_VERIFICACAO', '60'))
+
+
+class PoolClientes:
+    """Clientes gspread por método de autenticação, seguros entre threads
+
+    O lock do pool protege só o dicionário; cada método tem o próprio lock
+    para a verificação de saúde e a criação do cliente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clientes = {}
+        self._pid = os.getpid()
+
+    def obter_cliente(self, metodo):
+        """Retorna cliente autenticado para o método (None se indisponível)
+
+        O cliente é recriado quando o arquivo de credenciais muda, quando
+        falha na verificação de saúde ou quando o processo foi bifurcado.
+        """
+        caminho = ARQUIVOS_CREDENCIAIS[metodo]
+        if not os.path.exists(caminho):
+            return None
+
+        with self._lock:
+            # Processo filho (fork): sessões HTTP herdadas não são reutilizáveis
+            if self._pid != os.getpid():
+                self._clientes = {}
+                self._pid = os.getpid()
+
+            entrada = self._clientes.setdefault(metodo, {'lock': threading.Lock(), 'gc': None})
+
+        # Verificação de saúde e autenticação fazem chamadas de rede: bloqueiam
+        # só a entrada do método, não o pool inteiro
+        with entrada['lock']:
+            if entrada['gc'] is not None and self._entrada_valida(metodo, entrada):
+                return entrada['gc']
+
+            gc = self._criar_cliente(metodo)
+            if gc is None:
+                entrada['gc'] = None
+                return None
+
+            entrada.update(
+                gc=gc,
+                mtime=os.path.getmtime(caminho),
+                impressao=_impressao_credenciais(metodo, caminho),
+                verificado_em=time.time()
+            )
+            return gc
+
+    def invalidar(self, metodo=None):
+        """Descarta um cliente (ou todos) para forçar nova autenticação"""
+        with self._lock:
+            if metodo is None:
+                self._clientes = {}
+            else:
+                self._clientes.pop(metodo, None)
+
+    def _entrada_valida(self, metodo, entrada):
+        """Confere se o arquivo mudou e se o cliente continua saudável"""
+        caminho = ARQUIVOS_CREDENCIAIS[metodo]
+        mtime = os.path.getmtime(caminho)
+        if mtime != entrada['mtime']:
+            # O token automático é regravado a cada renovação; só recria o
+            # cliente se a credencial de fato mudou
+            if _impressao_credenciais(metodo, caminho) != entrada['impressao']:
+                logger.info("🔄 Credenciais alteradas: recriando cliente %s", metodo)
+                return False
+            entrada['mtime'] = mtime
+
+        if time.time() - entrada['verificado_em'] < INTERVALO_VERIFICACAO:
+            return True
+
+        if not _cliente_saudavel(entrada['gc']):
+            logger.warning("⚠️ Cliente gspread sem credencial válida: recriando")
+            return False
+
+        entrada['verificado_em'] = time.time()
+        return True
+
+    def _criar_cliente(self, metodo):
+        """Autentica e cria um novo cliente gspread"""
+        try:
+            if metodo == 'service_account':
+                from service_account_config import ServiceAccountConfig
+                config = ServiceAccountConfig(ARQUIVOS_CREDENCIAIS[metodo])
+                gc = config.get_client()
+            else:
+                from auth_automatico import AuthAutomatico
+                config = AuthAutomatico()
+                gc = config.get_client() if config.conectar_automatico() else None
+
+            if gc is not None:
+                redirecionar_sheets_api(gc.http_client.session)
+            return gc
+
+        except Exception as e:
+            logger.warning("⚠️ Erro ao criar cliente %s: %s", metodo, e)
+            return None
+
+
+def _impressao_credenciais(metodo, caminho):
+    """Identifica a credencial do arquivo, ignorando campos que mudam sozinhos"""
+    try:
+        with open(caminho, 'r') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if metodo == 'service_account':
+        return (dados.get('client_email'), dados.get('private_key_id'))
+    return dados.get('refresh_token')
+
+
+def _cliente_saudavel(gc):
+    """Verifica (e renova se preciso) a credencial do cliente"""
+    try:
+        credenciais = gc.http_client.auth
+        if credenciais.valid:
+            return True
+        credenciais.refresh(Request())
+        return credenciais.valid
+    except Exception:
+        return False
+
+
+# Pool único do processo
+pool_clientes = PoolClientes()
+
+
+def obter_cliente(metodo):
+    """Atalho para pool_clientes.obter_cliente"""
+    return pool_clientes.obter_cliente(metodo)
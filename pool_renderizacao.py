@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Pool de processos para geração de PDFs
+matplotlib e ReportLab rodam fora do processo web: os workers sobem já
+com o backend Agg e as fontes/estilos carregados, recebem as métricas
+em pickle comprimido e devolvem apenas o caminho do arquivo gerado.
+Datasets vão como DatasetCompartilhado (só o descritor trafega; ver
+dataset_compartilhado). O prazo da requisição segue junto (limite
+absoluto): o worker degrada os gráficos e o servidor para de esperar.
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as EsperaEsgotada
+from concurrent.futures.process import BrokenProcessPool
+
+from dataset_compartilhado import DatasetCompartilhado
+from instrumentacao import medir_etapa
+from prazo import Prazo, PrazoEsgotado, limite_prazo, prazo_atual, usar_prazo
+
+logger = logging.getLogger(__name__)
+
+
+# Workers do pool (0 = gera no próprio processo, como antes)
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', str(min(os.cpu_count() or 1, 4))))
+# spawn evita herdar threads e sockets do servidor web
+PDF_INICIO_PROCESSO = os.environ.get('PDF_INICIO_PROCESSO', 'spawn')
+
+# Intervalo (s) entre verificações do prazo enquanto espera o PDF
+INTERVALO_ESPERA = 0.5
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+# ---------- Serialização das métricas ----------
+
+def serializar(dados):
+    """dict -> bytes (pickle comprimido)
+
+    Preserva o tipo das chaves (ex.: notas int em distribuicao_notas),
+    datas e DataFrames. Datasets compartilhados viajam só como descritor.
+    """
+    dados = {chave: valor.descritor if isinstance(valor, DatasetCompartilhado) else valor
+             for chave, valor in dados.items()}
+    return zlib.compress(pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def desserializar(conteudo):
+    return pickle.loads(zlib.decompress(conteudo))
+
+
+# ---------- Lado do worker ----------
+
+def _aquecer_worker():
+    """Inicializador dos workers: backend não interativo, fontes e estilos"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import reportlab.platypus  # noqa: F401
+
+    from configuracao_log import configurar_logging
+    from cache_renderizacao import estilos_pdf
+    configurar_logging()
+    estilos_pdf()
+
+
+def _pronto():
+    return os.getpid()
+
+
+def _gerar_executivo_simples(parametros):
+    """GeradorPDFExecutivoSimples -> caminho do PDF"""
+    from gerador_pdf_executivo_simples import GeradorPDFExecutivoSimples
+
+    gerador = GeradorPDFExecutivoSimples()
+    return gerador.gerar_pdf_executivo_simples(parametros['dados_pdf'], parametros['loja_nome'])
+
+
+def renderizar_relatorio_completo(metricas, titulo, nome_arquivo):
+    """GeradorRelatorioPDF -> caminho do PDF (None se falhar)"""
+    from gerador_relatorio_pdf import GeradorRelatorioPDF
+
+    gerador = GeradorRelatorioPDF(metricas)
+    if not gerador.gerar_relatorio_completo(titulo):
+        return None
+    return gerador.salvar_pdf(nome_arquivo)
+
+
+def _gerar_relatorio_completo(parametros):
+    return renderizar_relatorio_completo(parametros['metricas'], parametros['titulo'], parametros['nome_arquivo'])
+
+
+def _gerar_relatorio_loja(parametros):
+    """Métricas + PDF de uma loja do dataset compartilhado -> resumo da loja"""
+    from lote_relatorios import gerar_relatorio_loja
+    return gerar_relatorio_loja(**parametros)
+
+
+TAREFAS = {
+    'executivo_simples': _gerar_executivo_simples,
+    'relatorio_completo': _gerar_relatorio_completo,
+    'relatorio_loja': _gerar_relatorio_loja
+}
+
+
+def _executar_tarefa(tarefa, carga):
+    """Desserializa a carga e roda a tarefa sob o prazo da requisição (se houver)"""
+    parametros = desserializar(carga)
+    limite = parametros.pop('prazo', None)
+    prazo = prazo_atual() or (Prazo(limite=limite) if limite else None)
+    with usar_prazo(prazo):
+        return TAREFAS[tarefa](parametros)
+
+
+# ---------- Lado do servidor ----------
+
+def obter_pool():
+    """Pool compartilhado (None se PDF_WORKERS=0)"""
+    global _pool
+
+    if PDF_WORKERS <= 0:
+        return None
+
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context(PDF_INICIO_PROCESSO),
+                    initializer=_aquecer_worker
+                )
+                logger.info("🖨️ Pool de PDF: %s worker(s) (%s)", PDF_WORKERS, PDF_INICIO_PROCESSO)
+    return _pool
+
+
+def aquecer_pool():
+    """Sobe todos os workers já na inicialização do servidor"""
+    pool = obter_pool()
+    if pool is None:
+        return
+    for _ in range(PDF_WORKERS):
+        pool.submit(_pronto)
+
+
+def _descartar_pool(pool):
+    global _pool
+    if pool is None:
+        return
+    with _lock_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submeter_pdf(tarefa, **parametros):
+    """Agenda a geração e retorna um Future com o caminho do PDF
+
+    Datasets compartilhados nos parâmetros ficam vivos até a tarefa terminar.
+    """
+    limite = limite_prazo()
+    if limite is not None:
+        parametros['prazo'] = limite
+
+    datasets = [valor.adquirir() for valor in parametros.values() if isinstance(valor, DatasetCompartilhado)]
+    try:
+        futuro = _submeter(tarefa, serializar(parametros))
+    except BaseException:
+        for dataset in datasets:
+            dataset.liberar()
+        raise
+    for dataset in datasets:
+        futuro.add_done_callback(dataset.liberar)
+    return futuro
+
+
+def _submeter(tarefa, carga):
+    pool = obter_pool()
+
+    if pool is not None:
+        try:
+            return pool.submit(_executar_tarefa, tarefa, carga)
+        except BrokenProcessPool:
+            logger.warning("⚠️ Pool de PDF quebrado; recriando")
+            _descartar_pool(pool)
+            return obter_pool().submit(_executar_tarefa, tarefa, carga)
+
+    # Sem pool: executa aqui mesmo, com a mesma interface
+    from concurrent.futures import Future
+    futuro = Future()
+    try:
+        futuro.set_result(_executar_tarefa(tarefa, carga))
+    except Exception as e:
+        futuro.set_exception(e)
+    return futuro
+
+
+def aguardar_pdf(futuro):
+    """Resultado da tarefa; com prazo, desiste (e cancela se ainda na fila) quando vence"""
+    prazo = prazo_atual()
+    if prazo is None:
+        return futuro.result()
+
+    while True:
+        try:
+            prazo.verificar('pdf')
+        except PrazoEsgotado:
+            futuro.cancel()
+            raise
+        try:
+            return futuro.result(timeout=max(0.01, min(INTERVALO_ESPERA, prazo.restante())))
+        except EsperaEsgotada:
+            continue
+
+
+def gerar_pdf(tarefa, linhas=None, **parametros):
+    """Gera o PDF no pool e aguarda o caminho do arquivo"""
+    with medir_etapa('pdf', linhas=linhas):
+        futuro = submeter_pdf(tarefa, **parametros)
+        try:
+            return aguardar_pdf(futuro)
+        except BrokenProcessPool:
+            # Worker morreu no meio (ex.: OOM): descarta o pool para a próxima
+            _descartar_pool(_pool)
+            raise
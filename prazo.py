@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Prazo da requisição - tempo restante e cancelamento ao longo do pipeline
+O prazo fica em um ContextVar (como as etapas do job em instrumentacao):
+extração, métricas e PDF consultam o prazo atual sem recebê-lo por
+parâmetro. Etapas obrigatórias chamam verificar_prazo(); as opcionais
+(IA, gráficos, extras Looker) perguntam tem_tempo() e são puladas ou
+servidas do cache quando o prazo está curto. Cliente desconectado
+cancela o prazo.
+"""
+
+import contextvars
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# Prazo padrão das análises (s; 0 desativa) e folga reservada para a resposta
+PRAZO_ANALISE = float(os.environ.get('PRAZO_ANALISE', '110'))
+PRAZO_MARGEM = float(os.environ.get('PRAZO_MARGEM', '5'))
+# Intervalo entre verificações da conexão do cliente (s)
+INTERVALO_CONEXAO = 0.5
+
+_prazo_atual = contextvars.ContextVar('prazo_atual', default=None)
+
+
+class PrazoEsgotado(BaseException):
+    """Prazo vencido ou cliente desconectado
+
+    Deriva de BaseException (como asyncio.CancelledError) para não ser
+    engolida pelos `except Exception` que fazem fallback no pipeline.
+    """
+
+    def __init__(self, etapa=None, motivo='prazo'):
+        mensagem = 'Cliente desconectou' if motivo == 'cliente' else 'Prazo esgotado'
+        super().__init__(f'{mensagem} em {etapa}' if etapa else mensagem)
+        self.etapa = etapa
+        self.motivo = motivo
+
+    def __reduce__(self):
+        # Atravessa o pool de processos com etapa e motivo
+        return (PrazoEsgotado, (self.etapa, self.motivo))
+
+
+class Prazo:
+    """Limite absoluto (epoch, vale entre processos) + cancelamento"""
+
+    def __init__(self, segundos=None, limite=None):
+        self.limite = limite if limite is not None else time.time() + segundos
+        self.motivo = None
+        self._cancelado = threading.Event()
+
+    def restante(self):
+        return max(0.0, self.limite - time.time())
+
+    def cancelar(self, motivo='cliente'):
+        if not self._cancelado.is_set():
+            self.motivo = motivo
+            self._cancelado.set()
+            logger.info("⏹️ Análise cancelada: %s", motivo)
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    @property
+    def esgotado(self):
+        return self.cancelado or self.restante() <= 0
+
+    def verificar(self, etapa=None):
+        """Levanta PrazoEsgotado se o prazo venceu ou o cliente saiu"""
+        if self.cancelado:
+            raise PrazoEsgotado(etapa, self.motivo)
+        if self.restante() <= 0:
+            raise PrazoEsgotado(etapa)
+
+    def tem_tempo(self, etapa, padrao):
+        """Cabe a etapa no tempo restante? (média medida da etapa ou `padrao` em s)"""
+        if self.esgotado:
+            return False
+        return self.restante() - PRAZO_MARGEM >= estimar_duracao(etapa, padrao)
+
+    def timeout(self, padrao):
+        """Timeout de I/O limitado ao tempo restante"""
+        self.verificar()
+        return max(0.1, min(padrao, self.restante()))
+
+
+def estimar_duracao(etapa, padrao):
+    """Duração média da etapa no processo (instrumentacao) ou `padrao`"""
+    from instrumentacao import obter_registro
+
+    registro = obter_registro().get(etapa)
+    if not registro or not registro['contagem']:
+        return padrao
+    return registro['soma'] / registro['contagem']
+
+
+def segundos_da_requisicao(pedido=None):
+    """Prazo efetivo: PRAZO_ANALISE, reduzido pelo prazo informado pelo cliente (X-Prazo)"""
+    try:
+        pedido = float(pedido) if pedido else None
+    except (TypeError, ValueError):
+        pedido = None
+    if pedido and pedido > 0:
+        return min(pedido, PRAZO_ANALISE) if PRAZO_ANALISE > 0 else pedido
+    return PRAZO_ANALISE if PRAZO_ANALISE > 0 else None
+
+
+@contextmanager
+def usar_prazo(prazo):
+    """Torna `prazo` o prazo atual do bloco (None = sem prazo)"""
+    token = _prazo_atual.set(prazo)
+    try:
+        yield prazo
+    finally:
+        _prazo_atual.reset(token)
+
+
+def prazo_atual():
+    return _prazo_atual.get()
+
+
+def verificar_prazo(etapa=None):
+    """Atalho para o prazo atual (sem prazo: não faz nada)"""
+    prazo = _prazo_atual.get()
+    if prazo is not None:
+        prazo.verificar(etapa)
+
+
+def tem_tempo(etapa, padrao):
+    prazo = _prazo_atual.get()
+    return prazo is None or prazo.tem_tempo(etapa, padrao)
+
+
+def prazo_esgotado():
+    prazo = _prazo_atual.get()
+    return prazo is not None and prazo.esgotado
+
+
+def timeout_prazo(padrao):
+    prazo = _prazo_atual.get()
+    return padrao if prazo is None else prazo.timeout(padrao)
+
+
+def limite_prazo():
+    """Limite (epoch) do prazo atual para repassar a outro processo (None = sem prazo)"""
+    prazo = _prazo_atual.get()
+    if prazo is None:
+        return None
+    prazo.verificar()
+    return prazo.limite
+
+
+def _desconectado(conexao):
+    """True se o cliente fechou a conexão (EOF na leitura sem consumir dados)"""
+    try:
+        legivel, _, _ = select.select([conexao], [], [], 0)
+        if not legivel:
+            return False
+        return conexao.recv(1, socket.MSG_PEEK) == b''
+    except ValueError:
+        # Socket sem suporte a MSG_PEEK (ex.: TLS): não dá para saber
+        return False
+    except OSError:
+        return True
+
+
+@contextmanager
+def vigiar_conexao(conexao, prazo):
+    """Cancela o prazo quando o cliente desconecta (thread leve durante o bloco)"""
+    if conexao is None or prazo is None:
+        yield
+        return
+
+    fim = threading.Event()
+
+    def vigiar():
+        while not fim.wait(INTERVALO_CONEXAO):
+            if _desconectado(conexao):
+                prazo.cancelar('cliente')
+                return
+
+    thread = threading.Thread(target=vigiar, name='vigia-conexao', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        fim.set()
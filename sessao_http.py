@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Sessão HTTP compartilhada para os endpoints do Google
+Pool de conexões keep-alive, gzip, retry com backoff e métricas por requisição
+"""
+
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Configurações (variáveis de ambiente)
+POOL_CONEXOES = int(os.environ.get('HTTP_POOL_CONEXOES', '10'))   # hosts distintos mantidos no pool
+POOL_MAXIMO = int(os.environ.get('HTTP_POOL_MAXIMO', '20'))       # conexões por host
+MAX_TENTATIVAS = int(os.environ.get('HTTP_MAX_TENTATIVAS', '3'))
+FATOR_BACKOFF = float(os.environ.get('HTTP_FATOR_BACKOFF', '0.5'))
+TIMEOUT_PADRAO = float(os.environ.get('HTTP_TIMEOUT', '30'))
+
+# Base das URLs de export de planilhas (aponte para um servidor local em testes de carga)
+URL_BASE_DOCS = os.environ.get('SHEETS_EXPORT_BASE_URL', 'https://docs.google.com').rstrip('/')
+
+# Sheets API usada pelo gspread; SHEETS_API_BASE_URL redireciona para outro servidor
+URL_SHEETS_API = 'https://sheets.googleapis.com'
+URL_BASE_SHEETS_API = os.environ.get('SHEETS_API_BASE_URL', '').rstrip('/')
+
+# Status que disparam nova tentativa com backoff
+STATUS_RETRY = (429, 500, 502, 503, 504)
+
+_sessao = None
+_sessao_pid = None
+_lock = threading.Lock()
+
+_metricas = {}
+_lock_metricas = threading.Lock()
+
+
+def _registrar_metricas(response, tamanho):
+    """Acumula tempo, bytes (corpo descomprimido) e tentativas por host"""
+    host = urlparse(response.url).netloc
+    tempo = response.elapsed.total_seconds()
+
+    tentativas = 0
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None:
+        tentativas = len(retries.history)
+
+    with _lock_metricas:
+        m = _metricas.setdefault(host, {
+            'requisicoes': 0,
+            'erros': 0,
+            'tentativas_extras': 0,
+            'tempo_total': 0.0,
+            'tempo_max': 0.0,
+            'bytes': 0
+        })
+        m['requisicoes'] += 1
+        m['erros'] += 1 if response.status_code >= 400 else 0
+        m['tentativas_extras'] += tentativas
+        m['tempo_total'] += tempo
+        m['tempo_max'] = max(m['tempo_max'], tempo)
+        m['bytes'] += tamanho
+
+
+class _SessaoMedida(requests.Session):
+    """Session que registra as métricas depois de ler o corpo
+
+    Content-Length não serve: falta em respostas chunked e, com gzip, é o
+    tamanho comprimido. Com stream=True o corpo não é lido aqui (conta 0).
+    """
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        _registrar_metricas(response, 0 if kwargs.get('stream') else len(response.content))
+        return response
+
+
+def _criar_sessao():
+    """Cria sessão com pool de conexões e retry/backoff"""
+    retry = Retry(
+        total=MAX_TENTATIVAS,
+        backoff_factor=FATOR_BACKOFF,
+        status_forcelist=STATUS_RETRY,
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False  # Devolve a última resposta, como requests.get fazia
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONEXOES,
+        pool_maxsize=POOL_MAXIMO,
+        max_retries=retry
+    )
+
+    sessao = _SessaoMedida()
+    sessao.mount('https://', adapter)
+    sessao.mount('http://', adapter)
+    sessao.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return sessao
+
+
+def obter_sessao():
+    """Retorna a sessão HTTP do processo (recriada após fork)"""
+    global _sessao, _sessao_pid
+
+    pid = os.getpid()
+    if _sessao is None or _sessao_pid != pid:
+        with _lock:
+            if _sessao is None or _sessao_pid != pid:
+                # Conexões herdadas de outro processo não podem ser reutilizadas
+                _sessao = _criar_sessao()
+                _sessao_pid = pid
+
+    return _sessao
+
+
+class _AdaptadorRedirecionamento(HTTPAdapter):
+    """Reescreve o início da URL antes de enviar (ex.: Sheets API -> servidor local)"""
+
+    def __init__(self, origem, destino, **kwargs):
+        self.origem = origem
+        self.destino = destino
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if request.url.startswith(self.origem):
+            request.url = self.destino + request.url[len(self.origem):]
+        return super().send(request, **kwargs)
+
+
+def redirecionar_sheets_api(sessao):
+    """Aponta a sessão do gspread para SHEETS_API_BASE_URL (sem efeito se não configurada)"""
+    if not URL_BASE_SHEETS_API:
+        return sessao
+
+    sessao.mount(URL_SHEETS_API, _AdaptadorRedirecionamento(
+        URL_SHEETS_API, URL_BASE_SHEETS_API,
+        pool_connections=POOL_CONEXOES,
+        pool_maxsize=POOL_MAXIMO
+    ))
+    return sessao
+
+
+def obter_metricas():
+    """Retorna cópia das métricas HTTP por host (com tempo médio)"""
+    with _lock_metricas:
+        metricas = {host: dict(m) for host, m in _metricas.items()}
+
+    for m in metricas.values():
+        m['tempo_medio'] = m['tempo_total'] / m['requisicoes'] if m['requisicoes'] else 0.0
+
+    return metricas
+
+
+def fechar_sessao():
+    """Fecha a sessão compartilhada e libera as conexões do pool"""
+    global _sessao
+
+    with _lock:
+        if _sessao is not None:
+            _sessao.close()
+            _sessao = None
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(scope='session')
+def dados_nps():
+    """Dataset sintético já limpo pelo NPSExtractor"""
+    from benchmarks.dados_sinteticos import gerar_dataset
+    from nps_extractor import NPSExtractor
+
+    dados = gerar_dataset(3000, lojas=4, vendedores=20, meses=6)
+    return NPSExtractor(auth_method='public')._limpar_dados_completos(dados)
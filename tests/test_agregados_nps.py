@@ -0,0 +1,46 @@
+"""Rankings do cubo iguais aos do cálculo por linhas (inclusive nos empates)"""
+
+import pandas as pd
+
+from agregados_nps import AcumuladorNPS, CuboNPS
+
+
+def _ranking_por_linhas(dados, dimensao):
+    """Cálculo anterior: um filtro por valor, na ordem de unique()"""
+    ranking = []
+    for valor in dados[dimensao].unique():
+        notas = dados.loc[dados[dimensao] == valor, 'Avaliacao']
+        if len(notas) == 0:
+            continue
+        promotores = int(((notas >= 9) & (notas <= 10)).sum())
+        detratores = int(((notas >= 0) & (notas <= 6)).sum())
+        ranking.append({dimensao.lower(): valor,
+                        'nps_score': (promotores - detratores) / len(notas) * 100})
+    return sorted(ranking, key=lambda x: x['nps_score'], reverse=True)
+
+
+def test_empates_na_ordem_de_aparicao():
+    dados = pd.DataFrame({
+        'Loja': ['Zeta', 'Alfa', 'Meio', 'Zeta', 'Alfa', 'Meio', 'Beta'],
+        'Vendedor': ['Vera', 'Ana', 'Caio', 'Vera', 'Ana', 'Caio', 'Bia'],
+        'Avaliacao': [10, 10, 3, 5, 5, 10, 9],
+    })
+
+    for dimensao in ('Loja', 'Vendedor'):
+        esperado = [item[dimensao.lower()] for item in _ranking_por_linhas(dados, dimensao)]
+        assert [item[dimensao.lower()] for item in CuboNPS.de_dados(dados).ranking(dimensao)] == esperado
+
+    assert [item['loja'] for item in CuboNPS.de_dados(dados).ranking('Loja')] == ['Beta', 'Zeta', 'Alfa', 'Meio']
+
+
+def test_ranking_em_lotes_igual_ao_por_linhas(dados_nps, tmp_path):
+    acumulador = AcumuladorNPS()
+    for inicio in range(0, len(dados_nps), 700):
+        acumulador.adicionar_lote(dados_nps.iloc[inicio:inicio + 700])
+    caminho = CuboNPS.de_dados(dados_nps).salvar(str(tmp_path / 'cubo.json'))
+
+    for dimensao in ('Loja', 'Vendedor'):
+        esperado = _ranking_por_linhas(dados_nps, dimensao)
+        chave = dimensao.lower()
+        for ranking in (acumulador.ranking(dimensao), CuboNPS.carregar(caminho).ranking(dimensao)):
+            assert [item[chave] for item in ranking] == [item[chave] for item in esperado]
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+import api_consultas
+from agregados_nps import CuboNPS
+
+
+@pytest.fixture
+def pasta_cubos(tmp_path, monkeypatch, dados_nps):
+    monkeypatch.setattr(api_consultas, 'PASTA_CUBOS', str(tmp_path))
+    CuboNPS.de_dados(dados_nps).salvar(os.path.join(str(tmp_path), 'planilha_gid0.cubo.json'))
+    return tmp_path
+
+
+def test_origem_por_id(pasta_cubos, dados_nps):
+    status, resposta = api_consultas.consultar('kpis', {'origem': 'planilha_gid0'})
+    assert status == 200
+    assert resposta['total_avaliacoes'] == len(dados_nps)
+
+
+@pytest.mark.parametrize('origem', ['../planilha_gid0', '/etc/passwd', 'dados.csv', 'a b'])
+def test_origem_fora_da_pasta_recusada(pasta_cubos, origem):
+    status, _ = api_consultas.consultar('kpis', {'origem': origem})
+    assert status == 400
@@ -0,0 +1,56 @@
+"""Cache de gráficos em disco: acertos contados à parte e poda por tamanho/idade"""
+
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+from cache_renderizacao import CacheGraficos
+
+
+def _renderizar(dados):
+    import matplotlib.pyplot as plt
+    figura, eixo = plt.subplots(figsize=(1, 1))
+    eixo.bar(range(len(dados)), dados)
+    return figura
+
+
+def test_acerto_em_disco_nao_conta_como_falha(tmp_path):
+    CacheGraficos(pasta=str(tmp_path)).obter('barras', [1, 2], _renderizar, dpi=50)
+
+    cache = CacheGraficos(pasta=str(tmp_path))
+    cache.obter('barras', [1, 2], _renderizar, dpi=50)
+    cache.obter('barras', [1, 2], _renderizar, dpi=50)
+
+    assert cache.estatisticas() == {'itens': 1, 'acertos': 1, 'acertos_disco': 1, 'falhas': 0}
+
+
+def test_poda_remove_os_usados_ha_mais_tempo(tmp_path):
+    cache = CacheGraficos(pasta=str(tmp_path))
+    for numero in range(3):
+        cache.obter('barras', [numero + 1], _renderizar, dpi=50)
+    arquivos = sorted(os.listdir(tmp_path))
+    tamanho = max(os.path.getsize(tmp_path / nome) for nome in arquivos)
+
+    # Mais antigo primeiro; o limite só comporta dois PNGs
+    for idade, nome in enumerate(arquivos):
+        modificado = time.time() - 100 * (len(arquivos) - idade)
+        os.utime(tmp_path / nome, (modificado, modificado))
+    cache.max_bytes_disco = 2 * tamanho
+    cache._podar_disco()
+
+    assert sorted(os.listdir(tmp_path)) == arquivos[1:]
+
+
+def test_png_vencido_e_renderizado_de_novo(tmp_path):
+    CacheGraficos(pasta=str(tmp_path)).obter('barras', [3], _renderizar, dpi=50)
+    (nome,) = os.listdir(tmp_path)
+    vencido = time.time() - 2 * 86400
+    os.utime(tmp_path / nome, (vencido, vencido))
+
+    cache = CacheGraficos(pasta=str(tmp_path), validade_dias_disco=1)
+    cache.obter('barras', [3], _renderizar, dpi=50)
+
+    assert cache.estatisticas()['falhas'] == 1
+    assert time.time() - os.path.getmtime(tmp_path / nome) < 60
@@ -0,0 +1,45 @@
+"""Comentários e detratores classificados pelo Looker chegam ao prompt da IA"""
+
+from types import SimpleNamespace
+
+import pandas as pd
+
+from calculadora_metricas import CalculadoraMetricas
+
+
+class _OpenAIFalso:
+    """Registra as mensagens enviadas em vez de chamar a API"""
+
+    def __init__(self):
+        self.mensagens = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._criar))
+
+    def _criar(self, messages, **kwargs):
+        self.mensagens.extend(messages)
+        resposta = SimpleNamespace(message=SimpleNamespace(content='relatorio'))
+        return SimpleNamespace(choices=[resposta])
+
+
+def test_comentarios_chegam_ao_prompt(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    dados = pd.DataFrame({
+        'Avaliacao': [10, 9, 3, 0, 8],
+        'Loja': ['Centro'] * 5,
+        'Vendedor': ['Ana', 'Ana', 'Bruno', 'Bruno', 'Ana'],
+        'Nome': ['Carla', 'Davi', 'Elis', 'Fabio', 'Gil'],
+        'Comentario': ['Atendimento excelente', 'Muito rápido', 'Demorou demais',
+                       'Não resolveram', 'Ok'],
+        'Data': ['2024-05-02'] * 5,
+    })
+    calc = CalculadoraMetricas(dados)
+    calc.openai_client = _OpenAIFalso()
+
+    assert calc.calcular_metricas_looker()['analise_ia_socialzap'] == 'relatorio'
+    assert [c['nome'] for c in calc._extrair_comentarios_positivos()] == ['Carla', 'Davi']
+    assert [d['nome'] for d in calc._analisar_detratores()] == ['Elis', 'Fabio']
+
+    prompt = calc.openai_client.mensagens[-1]['content']
+    assert '- Atendimento excelente (Carla)' in prompt
+    assert '- Demorou demais (Elis)' in prompt
+    assert '- Não resolveram (Fabio)' in prompt
+    assert 'Ok (Gil)' not in prompt
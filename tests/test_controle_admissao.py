@@ -0,0 +1,33 @@
+import threading
+import time
+
+import pytest
+
+from controle_admissao import ControleAdmissao
+from prazo import Prazo, PrazoEsgotado, usar_prazo
+
+
+@pytest.fixture
+def ocupado():
+    """Controle com a única vaga ocupada"""
+    controle = ControleAdmissao(simultaneas=1, fila=4, espera_maxima=30, memoria_mb=1024)
+    vaga = controle.admitir(1)
+    yield controle
+    vaga.liberar()
+
+
+def test_fila_respeita_prazo(ocupado):
+    inicio = time.monotonic()
+    with usar_prazo(Prazo(0.3)), pytest.raises(PrazoEsgotado):
+        ocupado.admitir(1)
+    assert time.monotonic() - inicio < 2
+    assert ocupado.obter_metricas()['fila'] == 0
+
+
+def test_cliente_desconectado_sai_da_fila(ocupado):
+    prazo = Prazo(60)
+    threading.Timer(0.2, prazo.cancelar).start()
+    with usar_prazo(prazo), pytest.raises(PrazoEsgotado) as erro:
+        ocupado.admitir(1)
+    assert erro.value.motivo == 'cliente'
+    assert ocupado.obter_metricas()['fila'] == 0
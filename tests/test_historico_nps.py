@@ -0,0 +1,22 @@
+"""Recorte por período em memória igual ao das partições do histórico"""
+
+import pandas as pd
+
+from historico_nps import HistoricoNPS, filtrar_periodo
+
+
+def test_filtrar_periodo_igual_ao_historico(dados_nps, tmp_path):
+    historico = HistoricoNPS('planilha-teste', pasta=str(tmp_path))
+    assert historico.sincronizar(dados_nps) > 0
+
+    do_historico = historico.carregar(desde='2024-02', ate='2024-04')
+    em_memoria = filtrar_periodo(dados_nps, desde='2024-02', ate='2024-04')
+
+    assert len(em_memoria) == len(do_historico)
+    assert sorted(em_memoria.index) == sorted(do_historico.index)
+    assert em_memoria['Data'].min() >= pd.Timestamp('2024-02-01')
+    assert em_memoria['Data'].max() < pd.Timestamp('2024-05-01')
+
+
+def test_filtrar_periodo_sem_coluna_de_data():
+    assert filtrar_periodo(pd.DataFrame({'Avaliacao': [10, 3]}), desde='2024-01') is None
@@ -0,0 +1,57 @@
+"""Paridade do motor_looker com as regras Looker
+
+Os valores de fixtures/motor_looker.json foram calculados à mão a partir das
+regras (classificação 0-6/7-8/9-10, D+1 a D+30 e "outros" contados da Data
+mais recente), não gerados pelo próprio motor.
+"""
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from motor_looker import MotorLooker
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'motor_looker.json')
+
+
+@pytest.fixture(scope='module')
+def caso():
+    with open(FIXTURE, encoding='utf-8') as f:
+        caso = json.load(f)
+    return MotorLooker(pd.DataFrame(caso['entrada'])), caso['esperado']
+
+
+def test_calcular(caso):
+    motor, esperado = caso
+    resultado = motor.calcular(dimensoes=('Loja', 'Vendedor'))
+    assert json.loads(json.dumps(resultado, ensure_ascii=False)) == esperado['calcular']
+
+
+@pytest.mark.parametrize('coluna', ['Looker_Classificacao', 'Looker_Interacao_D1_D30',
+                                    'Looker_Interacao_Outros', 'Looker_Avaliou'])
+def test_colunas_derivadas(caso, coluna):
+    motor, esperado = caso
+    assert [str(valor) for valor in motor.colunas()[coluna]] == esperado['colunas'][coluna]
+
+
+def test_enriquecer_preserva_dados(caso):
+    motor, esperado = caso
+    enriquecido = motor.enriquecer()
+    assert list(enriquecido.columns[:4]) == ['Avaliacao', 'Loja', 'Vendedor', 'Data']
+    assert set(esperado['colunas']) <= set(enriquecido.columns)
+
+
+def test_interacoes_com_referencia(caso):
+    motor, esperado = caso
+    referencia = esperado['referencia']
+    colunas = MotorLooker(motor.dados, referencia=referencia['data']).colunas()
+    for coluna, valores in referencia['colunas'].items():
+        assert [str(valor) for valor in colunas[coluna]] == valores
+
+
+def test_interacoes_sem_data():
+    colunas = MotorLooker(pd.DataFrame({'Avaliacao': [10, 5]})).colunas()
+    assert list(colunas['Looker_Interacao_D1_D30']) == ['Não', 'Não']
+    assert list(colunas['Looker_Interacao_Outros']) == ['Não', 'Não']
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+import nps_extractor
+from nps_extractor import _cache_formatos_data, _converter_datas, _detectar_encoding, _lembrar_encoding
+
+
+def test_datas_misturadas_dia_antes_do_mes():
+    serie = pd.Series(['03/04/2024', '05/06/2024 10:30', '2024-07-08', '11/12/2024 08:00:00', '', None])
+    _cache_formatos_data.pop('Data_mista', None)
+
+    convertida, formato = _converter_datas(serie, 'Data_mista')
+
+    assert formato is None
+    assert list(convertida.dt.month[:4]) == [4, 6, 7, 12]
+    assert list(convertida.dt.day[:4]) == [3, 5, 8, 11]
+    assert convertida[4:].isna().all()
+
+
+def test_formato_unico_dia_antes_do_mes():
+    serie = pd.Series(['03/04/2024', '01/02/2024', '12/11/2024'])
+    _cache_formatos_data.pop('Data_unica', None)
+
+    convertida, formato = _converter_datas(serie, 'Data_unica')
+
+    assert formato == '%d/%m/%Y'
+    assert list(convertida.dt.month) == [4, 2, 11]
+
+
+def test_encoding_cp1252_antes_de_latin1():
+    conteudo = 'Comentario\n“Ótimo” – custou 10 €\n'.encode('cp1252')
+
+    encoding = _detectar_encoding(conteudo, 'planilha-cp1252')
+
+    assert encoding == 'cp1252'
+    assert conteudo.decode(encoding) == 'Comentario\n“Ótimo” – custou 10 €\n'
+    # Byte indefinido no cp1252 (0x81): só latin-1 decodifica
+    assert _detectar_encoding(b'Coment\x81rio\n', 'planilha-latin1') == 'latin-1'
+
+
+def test_encodings_memorizados_limitados(monkeypatch):
+    monkeypatch.setattr(nps_extractor, 'MAX_ENCODINGS_MEMORIZADOS', 3)
+    monkeypatch.setattr(nps_extractor, '_encoding_por_planilha', OrderedDict())
+
+    for numero in range(5):
+        _lembrar_encoding(f'planilha-{numero}', 'cp1252')
+    _lembrar_encoding('planilha-2', 'latin-1')
+
+    assert list(nps_extractor._encoding_por_planilha) == ['planilha-3', 'planilha-4', 'planilha-2']
@@ -0,0 +1,36 @@
+import math
+
+import pandas as pd
+
+from calculadora_metricas import CalculadoraMetricas
+from pool_renderizacao import desserializar, serializar
+
+
+def _iguais(a, b):
+    """Igualdade estrita: mesmo tipo (inclusive das chaves) e NaN == NaN"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return (list(a) == list(b) and all(type(x) is type(y) for x, y in zip(a, b))
+                and all(_iguais(a[chave], b[chave]) for chave in a))
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_iguais(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and math.isnan(a):
+        return math.isnan(b)
+    if isinstance(a, pd.DataFrame):
+        return a.equals(b)
+    return a == b
+
+
+def test_chaves_int_preservadas():
+    metricas = {'distribuicao_notas': {0: 3, 10: 7}, 'notas_altas': {8: 1.5}}
+    assert _iguais(desserializar(serializar({'metricas': metricas}))['metricas'], metricas)
+
+
+def test_ida_e_volta_metricas_reais(dados_nps, monkeypatch):
+    monkeypatch.setattr(CalculadoraMetricas, 'gerar_analise_ia_socialzap', lambda self, r: 'analise')
+    metricas = CalculadoraMetricas(dados_nps).calcular_todas_metricas()
+    assert metricas
+
+    parametros = {'metricas': metricas, 'titulo': 'Loja', 'nome_arquivo': 'x.pdf'}
+    assert _iguais(desserializar(serializar(parametros)), parametros)